@@ -1,15 +1,17 @@
-from time import sleep
 from typing import Any
 from unicodedata import normalize
 
 import orjson
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.exceptions import ValidationError as ModelError
 from django.core.files.storage import default_storage
-from django.core.paginator import InvalidPage, Paginator
-from django.db.models import Prefetch, Q, QuerySet, prefetch_related_objects
+from django.db import transaction
+from django.db.models import Q
 from django.forms import modelform_factory
-from django.http import HttpRequest
+from django.template.defaultfilters import filesizeformat
+from django.http import HttpRequest, HttpResponse
 from django.utils import timezone
 from ninja import Form, NinjaAPI
 from ninja.errors import ValidationError as PydanticError
@@ -18,18 +20,34 @@ from ninja.renderers import BaseRenderer
 from ninja.responses import Response
 from ninja.security import django_auth
 
-from .models import Comment, Post, User
+from . import conditional, feed_cache, images, search, serializers, tags
+from .models import Comment, Post, Suggestion, User
+from .pagination import (
+    InvalidCursor,
+    aposts_cursor_pager,
+    aposts_pager,
+    posts_cursor_pager,
+    posts_pager,
+    prepare_posts,
+)
+from .routers import primary_reads, replica_reads
 from .schemas import (
+    FOLLOW_ACTIONS,
+    LIKE_ACTIONS,
+    BatchIn,
+    BatchOut,
     CommentIn,
     EditedPost,
     FollowOut,
     PaginatedPosts,
     PostIn,
     PostOut,
+    SuggestionOut,
     UserOut,
     UserProfileIn,
     UserProfileOut,
 )
+from .tasks import run_in_background
 
 
 class ORJSONParser(Parser):
@@ -74,6 +92,11 @@ def django_model_validation(request: HttpRequest, exc):
     return api.create_response(request, exc.message_dict, status=400)
 
 
+@api.exception_handler(InvalidCursor)
+def invalid_cursor(request: HttpRequest, exc):
+    return api.create_response(request, {"errors": str(exc)}, status=400)
+
+
 @api.exception_handler(PydanticError)
 def pydantic_validation(request: HttpRequest, exc):
     for obj in exc.errors:
@@ -83,6 +106,198 @@ def pydantic_validation(request: HttpRequest, exc):
     return api.create_response(request, errors, status=400)
 
 
+# endregion
+
+# -----------
+# region Async API Views
+# -----------
+# Registered in place of their sync counterparts when NETWORK_ASYNC_API is
+# enabled, so a single ASGI worker doesn't tie up a thread per request. They
+# must take the same parameters and return the same data as the sync views.
+
+
+def async_variant(async_view):
+    """
+    Register "async_view" instead of the decorated view when NETWORK_ASYNC_API
+    is enabled.
+    """
+
+    def decorator(view):
+        return async_view if getattr(settings, "NETWORK_ASYNC_API", False) else view
+
+    return decorator
+
+
+async def get_all_posts_async(request: HttpRequest, response: HttpResponse, page: int):
+    async def all_posts_page():
+        posts = Post.objects.fetch_all_posts()
+
+        if not await posts.aexists():
+            return Response({"posts": []})
+
+        return await aposts_pager(posts, page, request.user)
+
+    if not request.user.is_authenticated:
+        return await acached_response(request, f"page:{page}", all_posts_page)
+
+    posts = Post.objects.fetch_all_posts()
+    not_modified = await conditional.anot_modified(request, posts, page=page)
+    if not_modified:
+        return not_modified
+
+    data = await all_posts_page()
+    if not isinstance(data, HttpResponse):
+        conditional.set_validators(request, response, data)
+    return posts_page_response(request, response, data)
+
+
+async def get_all_posts_cursor_async(
+    request: HttpRequest, response: HttpResponse, cursor: str | None = None
+):
+    posts = Post.objects.fetch_all_posts()
+
+    async def all_posts_page():
+        return await aposts_cursor_pager(posts, request.user, cursor)
+
+    if not request.user.is_authenticated:
+        return await acached_response(request, f"cursor:{cursor or ''}", all_posts_page)
+
+    not_modified = await conditional.anot_modified(request, posts, cursor=cursor)
+    if not_modified:
+        return not_modified
+
+    data = await all_posts_page()
+    conditional.set_validators(request, response, data)
+    return posts_page_response(request, response, data)
+
+
+async def following_posts_async(
+    request: AuthHttpRequest, response: HttpResponse, page: int
+):
+    # Merged from several index reads, which have no async API
+    posts = Post.objects.fetch_following_posts(request.user)
+
+    not_modified = await sync_to_async(conditional.not_modified)(
+        request, posts, page=page
+    )
+    if not_modified:
+        return not_modified
+
+    data = await sync_to_async(posts_pager)(posts, page, request.user)
+    conditional.set_validators(request, response, data)
+    return posts_page_response(request, response, data)
+
+
+async def following_posts_cursor_async(
+    request: AuthHttpRequest, response: HttpResponse, cursor: str | None = None
+):
+    posts = Post.objects.fetch_following_posts(request.user)
+
+    not_modified = await sync_to_async(conditional.not_modified)(
+        request, posts, cursor=cursor
+    )
+    if not_modified:
+        return not_modified
+
+    data = await sync_to_async(posts_cursor_pager)(posts, request.user, cursor)
+    conditional.set_validators(request, response, data)
+    return posts_page_response(request, response, data)
+
+
+async def profile_async(
+    request: AuthHttpRequest, response: HttpResponse, username: str, page: int
+):
+    profile_user = await User.objects.aget(username=username)
+    profile_user.is_following = await User.objects.ais_following(
+        request.user, profile_user
+    )
+    posts = Post.objects.fetch_user_posts(profile_user)
+
+    watermark = conditional.profile_watermark(profile_user)
+    not_modified = await conditional.anot_modified(
+        request, posts, page=page, extra=watermark
+    )
+    if not_modified:
+        return not_modified
+
+    profile_user.posts_data = await aposts_pager(posts, page, request.user)
+    conditional.set_validators(request, response, profile_user.posts_data, watermark)
+    return profile_response(request, response, profile_user)
+
+
+async def profile_cursor_async(
+    request: AuthHttpRequest,
+    response: HttpResponse,
+    username: str,
+    cursor: str | None = None,
+):
+    profile_user = await User.objects.aget(username=username)
+    profile_user.is_following = await User.objects.ais_following(
+        request.user, profile_user
+    )
+    posts = Post.objects.fetch_user_posts(profile_user)
+
+    watermark = conditional.profile_watermark(profile_user)
+    not_modified = await conditional.anot_modified(
+        request, posts, cursor=cursor, extra=watermark
+    )
+    if not_modified:
+        return not_modified
+
+    profile_user.posts_data = await aposts_cursor_pager(posts, request.user, cursor)
+    conditional.set_validators(request, response, profile_user.posts_data, watermark)
+    return profile_response(request, response, profile_user)
+
+
+async def search_posts_async(
+    request: HttpRequest, response: HttpResponse, q: str, cursor: str | None = None
+):
+    # The ranking query goes through a raw cursor, which has no async API
+    data = await sync_to_async(search.search_posts)(q, request.user, cursor)
+    return posts_page_response(request, response, data)
+
+
+async def tag_posts_async(
+    request: HttpRequest, response: HttpResponse, name: str, cursor: str | None = None
+):
+    posts = Post.objects.fetch_tag_posts(name)
+
+    data = await aposts_cursor_pager(posts, request.user, cursor)
+    return posts_page_response(request, response, data)
+
+
+async def mention_posts_async(
+    request: AuthHttpRequest, response: HttpResponse, cursor: str | None = None
+):
+    posts = Post.objects.fetch_mention_posts(request.user)
+
+    data = await aposts_cursor_pager(posts, request.user, cursor)
+    return posts_page_response(request, response, data)
+
+
+async def like_post_async(request: AuthHttpRequest, post_id: int):
+    post: Post = await Post.objects.aget(id=post_id)
+    # Transactions can't span awaits, toggle the like in a worker thread
+    liked = await sync_to_async(Post.objects.toggle_like)(post, request.user)
+    feed_cache.bump_generation()
+
+    return {"id": post.id, "likes": post.like_count, "likedByUser": liked}
+
+
+async def follow_async(request: AuthHttpRequest, username: str):
+    user = await User.objects.aget(username=username)
+
+    if await User.objects.ahas_follow(request.user, user):
+        await request.user.following.aremove(user)
+        return {
+            "message": f"You are no longer following {username}",
+            "is_following": False,
+        }
+
+    await request.user.following.aadd(user)
+    return {"message": f"You are now following {username}", "is_following": True}
+
+
 # endregion
 
 # -----------
@@ -93,14 +308,14 @@ def new_post(request: AuthHttpRequest, new_post: PostIn):
     """
     Create a new post.
     """
-    post = Post.objects.create(user=request.user, text=new_post.text)
-    post.liked_by.add(request.user)
+    with transaction.atomic():
+        post = Post.objects.create(user=request.user, text=new_post.text, like_count=1)
+        post.liked_by.add(request.user)
+        tags.index_post(post, created=True)
     post.is_owner = True
     post.is_following = False
-    post.likes = 1
     post.liked_by_user = True
-
-    sleep(1)
+    feed_cache.bump_generation()
 
     return post
 
@@ -124,24 +339,25 @@ def edit_post(request: AuthHttpRequest, edited_post: PostIn):
     post.text = edited_post.text
     post.last_modified = timezone.now()
     post.edited = True
-    post.save()
+    with transaction.atomic():
+        post.save()
+        tags.index_post(post)
+    feed_cache.bump_generation()
 
-    sleep(1)  # Simulate a slow network connection
     return post
 
 
 @api.patch("like_post/{int:post_id}", url_name="like_post")
+@async_variant(like_post_async)
 def like_post(request: AuthHttpRequest, post_id: int):
     """
     Like a post by ID.
     """
     post: Post = Post.objects.get(id=post_id)
-    if post in request.user.liked_posts.all():
-        request.user.liked_posts.remove(post)
-        return {"id": post.id, "likes": post.liked_by.count(), "likedByUser": False}
+    liked = Post.objects.toggle_like(post, request.user)
+    feed_cache.bump_generation()
 
-    request.user.liked_posts.add(post)
-    return {"id": post.id, "likes": post.liked_by.count(), "likedByUser": True}
+    return {"id": post.id, "likes": post.like_count, "likedByUser": liked}
 
 
 @api.post("new_comment", url_name="new_comment", response=PostOut)
@@ -158,26 +374,19 @@ def new_comment(request: AuthHttpRequest, new_comment: CommentIn):
         parent_comment = None
         reply = False
 
-    Comment.objects.create(
-        post=post,
-        user=request.user,
-        text=new_comment.text,
-        reply=reply,
-        parent_comment=parent_comment,
-    )
+    with transaction.atomic():
+        comment = Comment.objects.create(
+            post=post,
+            user=request.user,
+            text=new_comment.text,
+            reply=reply,
+            parent_comment=parent_comment,
+        )
+        tags.index_comment(comment, created=True)
+    feed_cache.bump_generation()
     post.refresh_from_db()
-    prefetch_related_objects(
-        [post],
-        Prefetch(
-            "comments", queryset=Comment.objects.select_related().filter(reply=False)
-        ),
-    )
-    post.is_owner = post.user.id == request.user.id
-    post.is_following = request.user in post.user.followers.all()
-    post.likes = post.liked_by.count()
-    post.liked_by_user = request.user in post.liked_by.all()
+    prepare_posts([post], request.user)
 
-    sleep(1)
     return post
 
 
@@ -187,26 +396,118 @@ def new_comment(request: AuthHttpRequest, new_comment: CommentIn):
     auth=None,
     response=PaginatedPosts,
 )
-def get_all_posts(request: HttpRequest, page: int):
+@replica_reads
+@async_variant(get_all_posts_async)
+def get_all_posts(request: HttpRequest, response: HttpResponse, page: int):
     """
     Fetch all posts from the database. These posts can be shown to unauthenticated users.
     """
 
-    posts = Post.objects.fetch_all_posts(request_user=request.user)
+    def all_posts_page():
+        posts = Post.objects.fetch_all_posts()
 
-    if posts is None or posts.exists() is False:
-        return Response({"posts": []})
+        if posts is None or posts.exists() is False:
+            return Response({"posts": []})
 
-    # sleep(3)
+        # sleep(3)
+
+        return posts_pager(posts, page, request.user)
+
+    if not request.user.is_authenticated:
+        # Anonymous users all see the same pages
+        return cached_response(request, f"page:{page}", all_posts_page)
+
+    posts = Post.objects.fetch_all_posts()
+    not_modified = conditional.not_modified(request, posts, page=page)
+    if not_modified:
+        return not_modified
+
+    data = all_posts_page()
+    if not isinstance(data, HttpResponse):
+        conditional.set_validators(request, response, data)
+    return posts_page_response(request, response, data)
 
-    return posts_pager(posts, page)
+
+@api.get(
+    "all_posts",
+    url_name="all_posts_cursor",
+    auth=None,
+    response=PaginatedPosts,
+)
+@replica_reads
+@async_variant(get_all_posts_cursor_async)
+def get_all_posts_cursor(
+    request: HttpRequest, response: HttpResponse, cursor: str | None = None
+):
+    """
+    Fetch all posts using cursor pagination. Omit the cursor to get the first page.
+    """
+    posts = Post.objects.fetch_all_posts()
+
+    def all_posts_page():
+        return posts_cursor_pager(posts, request.user, cursor)
+
+    if not request.user.is_authenticated:
+        return cached_response(request, f"cursor:{cursor or ''}", all_posts_page)
+
+    not_modified = conditional.not_modified(request, posts, cursor=cursor)
+    if not_modified:
+        return not_modified
+
+    data = all_posts_page()
+    conditional.set_validators(request, response, data)
+    return posts_page_response(request, response, data)
+
+
+@api.get("search", url_name="search", auth=None, response=PaginatedPosts)
+@async_variant(search_posts_async)
+def search_posts(
+    request: HttpRequest, response: HttpResponse, q: str, cursor: str | None = None
+):
+    """
+    Search posts and their comments, best matches first. Paginated by cursor.
+    """
+    data = search.search_posts(q, request.user, cursor)
+    return posts_page_response(request, response, data)
+
+
+@api.get("tags/{str:name}", url_name="tag_posts", auth=None, response=PaginatedPosts)
+@async_variant(tag_posts_async)
+def tag_posts(
+    request: HttpRequest, response: HttpResponse, name: str, cursor: str | None = None
+):
+    """
+    Fetch the posts tagged with "#name" in their text or comments, paginated by
+    cursor.
+    """
+    posts = Post.objects.fetch_tag_posts(name)
+
+    data = posts_cursor_pager(posts, request.user, cursor)
+    return posts_page_response(request, response, data)
+
+
+@api.get("mentions", url_name="mention_posts", response=PaginatedPosts)
+@async_variant(mention_posts_async)
+def mention_posts(
+    request: AuthHttpRequest, response: HttpResponse, cursor: str | None = None
+):
+    """
+    Fetch the posts mentioning the requesting user in their text or comments,
+    paginated by cursor.
+    """
+    posts = Post.objects.fetch_mention_posts(request.user)
+
+    data = posts_cursor_pager(posts, request.user, cursor)
+    return posts_page_response(request, response, data)
 
 
 @api.post("follow/{str:username}", url_name="follow", response=FollowOut)
+@async_variant(follow_async)
 def follow(request: AuthHttpRequest, username: str):
     user = User.objects.get(username=username)
 
-    if user in request.user.following.all():
+    # Not from the follow graph, a stale answer would toggle the wrong way
+    if User.objects.has_follow(request.user, user):
         request.user.following.remove(user)
         return {
             "message": f"You are no longer following {username}",
@@ -217,27 +518,171 @@ def follow(request: AuthHttpRequest, username: str):
     return {"message": f"You are now following {username}", "is_following": True}
 
 
+@api.post("batch", url_name="batch", response=BatchOut, exclude_none=True)
+def batch(request: AuthHttpRequest, batch: BatchIn):
+    """
+    Apply a list of like, unlike, follow and unfollow actions in one
+    transaction.
+
+    When several actions target the same post or user, the last one wins.
+    Every action gets a result with the final state of its target, or an
+    error if the target can't be found.
+    """
+    likes = {a.post_id: a.type == "like" for a in batch.actions if a.type in LIKE_ACTIONS}
+    follows = {
+        a.username: a.type == "follow" for a in batch.actions if a.type in FOLLOW_ACTIONS
+    }
+
+    post_ids = set(Post.objects.filter(id__in=likes).values_list("id", flat=True))
+    user_ids = dict(
+        User.objects.filter(username__in=follows)
+        .exclude(id=request.user.id)
+        .values_list("username", "id")
+    )
+
+    with transaction.atomic():
+        liked_changed = Post.objects.set_likes(
+            request.user,
+            {post_id for post_id in post_ids if likes[post_id]},
+            {post_id for post_id in post_ids if not likes[post_id]},
+        )
+
+        # The related manager inserts and deletes in bulk, and sends the
+        # m2m_changed signals that keep follow counts and timelines in sync
+        follow_ids = [user_ids[name] for name in user_ids if follows[name]]
+        unfollow_ids = [user_ids[name] for name in user_ids if not follows[name]]
+        if follow_ids:
+            request.user.following.add(*follow_ids)
+        if unfollow_ids:
+            request.user.following.remove(*unfollow_ids)
+
+    if liked_changed:
+        feed_cache.bump_generation()
+
+    like_counts = dict(
+        Post.objects.filter(id__in=post_ids).values_list("id", "like_count")
+    )
+
+    results = []
+    for action in batch.actions:
+        if action.type in LIKE_ACTIONS:
+            result = {"type": action.type, "postID": action.post_id}
+            if action.post_id in post_ids:
+                result.update(
+                    ok=True,
+                    likes=like_counts[action.post_id],
+                    likedByUser=likes[action.post_id],
+                )
+            else:
+                result.update(ok=False, error="The requested post does not exist.")
+        else:
+            result = {"type": action.type, "username": action.username}
+            if action.username in user_ids:
+                result.update(ok=True, isFollowing=follows[action.username])
+            elif action.username == request.user.username:
+                result.update(ok=False, error="You can't follow yourself.")
+            else:
+                result.update(ok=False, error="The requested user does not exist.")
+        results.append(result)
+
+    return {"results": results}
+
+
 @api.get(
     "following_posts/{int:page}", url_name="following_posts", response=PaginatedPosts
 )
-def following_posts(request: AuthHttpRequest, page: int):
+@replica_reads
+@async_variant(following_posts_async)
+def following_posts(request: AuthHttpRequest, response: HttpResponse, page: int):
 
     posts = Post.objects.fetch_following_posts(request.user)
 
-    return posts_pager(posts, page)
+    not_modified = conditional.not_modified(request, posts, page=page)
+    if not_modified:
+        return not_modified
+
+    data = posts_pager(posts, page, request.user)
+    conditional.set_validators(request, response, data)
+    return posts_page_response(request, response, data)
+
+
+@api.get("following_posts", url_name="following_posts_cursor", response=PaginatedPosts)
+@replica_reads
+@async_variant(following_posts_cursor_async)
+def following_posts_cursor(
+    request: AuthHttpRequest, response: HttpResponse, cursor: str | None = None
+):
+
+    posts = Post.objects.fetch_following_posts(request.user)
+
+    not_modified = conditional.not_modified(request, posts, cursor=cursor)
+    if not_modified:
+        return not_modified
+
+    data = posts_cursor_pager(posts, request.user, cursor)
+    conditional.set_validators(request, response, data)
+    return posts_page_response(request, response, data)
 
 
 @api.get("profile/{str:username}/{int:page}", url_name="profile", response=UserOut)
-def profile(request: AuthHttpRequest, username: str, page: int):
+@replica_reads
+@async_variant(profile_async)
+def profile(request: AuthHttpRequest, response: HttpResponse, username: str, page: int):
+
+    profile_user = User.objects.fetch_profile(username)
 
-    profile_user = User.objects.fetch_profile(request.user, username)
+    profile_user.is_following = User.objects.is_following(request.user, profile_user)
+    posts = Post.objects.fetch_user_posts(profile_user)
 
-    profile_user.is_following = request.user in profile_user.followers.all()
-    profile_user.posts_data = posts_pager(profile_user.posts.all(), page)
+    watermark = conditional.profile_watermark(profile_user)
+    not_modified = conditional.not_modified(request, posts, page=page, extra=watermark)
+    if not_modified:
+        return not_modified
+
+    profile_user.posts_data = posts_pager(posts, page, request.user)
+    conditional.set_validators(request, response, profile_user.posts_data, watermark)
 
     # sleep(3)
 
-    return profile_user
+    return profile_response(request, response, profile_user)
+
+
+@api.get("profile/{str:username}", url_name="profile_cursor", response=UserOut)
+@replica_reads
+@async_variant(profile_cursor_async)
+def profile_cursor(
+    request: AuthHttpRequest,
+    response: HttpResponse,
+    username: str,
+    cursor: str | None = None,
+):
+    """
+    Fetch a user profile with its posts paginated by cursor.
+    """
+    profile_user = User.objects.fetch_profile(username)
+
+    profile_user.is_following = User.objects.is_following(request.user, profile_user)
+    posts = Post.objects.fetch_user_posts(profile_user)
+
+    watermark = conditional.profile_watermark(profile_user)
+    not_modified = conditional.not_modified(
+        request, posts, cursor=cursor, extra=watermark
+    )
+    if not_modified:
+        return not_modified
+
+    profile_user.posts_data = posts_cursor_pager(posts, request.user, cursor)
+    conditional.set_validators(request, response, profile_user.posts_data, watermark)
+    return profile_response(request, response, profile_user)
+
+
+@api.get("suggestions", url_name="suggestions", response=list[SuggestionOut])
+@replica_reads
+def suggestions(request: AuthHttpRequest):
+    """
+    Accounts to follow, ranked ahead of time by network/suggestions.py.
+    """
+    return Suggestion.objects.fetch_suggestions(request.user)
 
 
 @api.post("update_profile", url_name="update_profile", response=UserProfileOut)
@@ -257,6 +702,10 @@ def update_profile(request: AuthHttpRequest, profile: UserProfileIn = Form(...))
     ):
         errors["email"] = f"{profile.email} is already in use."
 
+    if "photo" in getattr(request, "oversized_files", ()):
+        max_size = filesizeformat(settings.NETWORK_MAX_UPLOAD_SIZE)
+        errors["photo"] = f"File size must not be greater than {max_size}."
+
     previous_image_path = None
     if request.user.photo:
         previous_image_path = request.user.photo.path
@@ -267,7 +716,15 @@ def update_profile(request: AuthHttpRequest, profile: UserProfileIn = Form(...))
     if not errors and form.is_valid():
         if form.cleaned_data["photo"] and previous_image_path:
             default_storage.delete(previous_image_path)
+        photo_changed = "photo" in form.changed_data
+        if photo_changed:
+            # Variants of the previous photo, new ones are built in background
+            form.instance.photo_variants = {}
         user = form.save()
+        if photo_changed and user.photo:
+            run_in_background(images.build_variants, user.id)
+        # Usernames are shown in the cached feed
+        feed_cache.bump_generation()
         return user
     else:
         if form.errors.get("photo"):
@@ -285,28 +742,65 @@ def update_profile(request: AuthHttpRequest, profile: UserProfileIn = Form(...))
 # -----------
 # region Functions
 # -----------
-def posts_pager(posts: QuerySet[Post], page: int):
-    p = Paginator(posts, 10)
 
-    p_page = p.get_page(page)
 
-    try:
-        next_page = p_page.next_page_number()
-    except InvalidPage:
-        next_page = None
+def cached_response(request: HttpRequest, key: str, get_page) -> HttpResponse:
+    """
+    Serve a PaginatedPosts page from the anonymous feed cache, building and
+    rendering it with "get_page" on a miss.
 
-    try:
-        previous_page = p_page.previous_page_number()
-    except InvalidPage:
-        previous_page = None
-
-    # Cast "QuerySet" to "list" to be parsed by Pydantic Model
-    return {
-        "numPages": p.num_pages,
-        "nextPage": next_page,
-        "previousPage": previous_page,
-        "posts": list(p_page.object_list),
-    }
+    Misses are built from the primary: anonymous clients are never pinned to
+    it, and a page read from a lagging replica would stay cached for the
+    whole NETWORK_FEED_CACHE_TTL.
+    """
+
+    def render():
+        with primary_reads():
+            return render_posts_page(request, get_page())
+
+    content = feed_cache.cached_page(key, render)
+    response = HttpResponse(content, content_type=api.get_content_type())
+    return conditional.check_content(request, response)
+
+
+async def acached_response(request: HttpRequest, key: str, get_page) -> HttpResponse:
+    async def render():
+        with primary_reads():
+            return render_posts_page(request, await get_page())
+
+    content = await feed_cache.acached_page(key, render)
+    response = HttpResponse(content, content_type=api.get_content_type())
+    return conditional.check_content(request, response)
+
+
+def render_posts_page(request: HttpRequest, data) -> bytes:
+    if isinstance(data, HttpResponse):
+        # Already rendered, bypassing the response schema
+        return data.content
+    if serializers.fast_serialization():
+        page = serializers.dump_posts_page(data)
+    else:
+        page = PaginatedPosts.from_orm(data).dict()
+    return api.renderer.render(request, page, response_status=200)
+
+
+def posts_page_response(request: HttpRequest, response: HttpResponse, data):
+    """
+    Render a PaginatedPosts page with the fast serializer into the temporal
+    "response", keeping the headers set on it. With NETWORK_FAST_SERIALIZATION
+    disabled, "data" is returned as is for the response schema.
+    """
+    if isinstance(data, HttpResponse) or not serializers.fast_serialization():
+        return data
+    page = serializers.dump_posts_page(data)
+    return api.create_response(request, page, temporal_response=response)
+
+
+def profile_response(request: HttpRequest, response: HttpResponse, profile_user: User):
+    if not serializers.fast_serialization():
+        return profile_user
+    profile = serializers.dump_profile(profile_user)
+    return api.create_response(request, profile, temporal_response=response)
 
 
 # endregion
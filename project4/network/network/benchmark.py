@@ -0,0 +1,404 @@
+"""
+Load tests, see "manage.py benchmark_api" and "manage.py benchmark_sqlite".
+
+For the API, each worker thread logs in as a generated user. It then sends
+requests drawn from a workload mix over a keep-alive connection until the
+duration runs out. The report gives throughput, latency percentiles and the
+queries per request read from the "X-Query-Count" header
+(middleware.query_count), per operation and overall, so runs can be compared
+across commits.
+
+The database benchmark runs the same kind of mix straight on the ORM, to
+measure how concurrent reads and writes contend on SQLite locks.
+"""
+from __future__ import annotations
+
+import math
+import os
+import random
+import socket
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from http.client import HTTPConnection, HTTPException, HTTPResponse
+from http.cookies import SimpleCookie
+from statistics import fmean
+from urllib.parse import urlencode
+
+import orjson
+from django.conf import settings
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.urls import reverse
+
+from .models import Comment, Post, User
+from .pagination import POSTS_PER_PAGE
+from .testdata import Generator
+
+# Operation weights of each workload
+WORKLOADS = {
+    "read": {"all_posts": 4, "following_posts": 3, "profile": 3},
+    "write": {"like_post": 1, "new_comment": 1},
+    "mixed": {
+        "all_posts": 3,
+        "following_posts": 3,
+        "profile": 2,
+        "like_post": 1,
+        "new_comment": 1,
+    },
+}
+
+# Operation weights of the database benchmark. "write" starts its transaction
+# by writing, "follow" reads first
+DATABASE_WORKLOAD = {"read": 4, "write": 1, "follow": 1}
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def all_posts(rng: random.Random, data: dict):
+    return "GET", reverse("network:api:all_posts", args=[rng.randint(1, 10)]), None
+
+
+def following_posts(rng: random.Random, data: dict):
+    return "GET", reverse("network:api:following_posts_cursor"), None
+
+
+def profile(rng: random.Random, data: dict):
+    username = rng.choice(data["usernames"])
+    return "GET", reverse("network:api:profile_cursor", args=[username]), None
+
+
+def like_post(rng: random.Random, data: dict):
+    post_id = rng.choice(data["post_ids"])
+    return "PATCH", reverse("network:api:like_post", args=[post_id]), None
+
+
+def new_comment(rng: random.Random, data: dict):
+    payload = {"text": "Benchmark comment", "postID": rng.choice(data["post_ids"])}
+    return "POST", reverse("network:api:new_comment"), payload
+
+
+OPERATIONS = {
+    "all_posts": all_posts,
+    "following_posts": following_posts,
+    "profile": profile,
+    "like_post": like_post,
+    "new_comment": new_comment,
+}
+
+
+class Client:
+    """
+    A keep-alive HTTP connection holding a user session.
+    """
+
+    def __init__(self, host: str, port: int, timeout: float = 30):
+        self.connection = HTTPConnection(host, port, timeout=timeout)
+        self.cookies = SimpleCookie()
+
+    def request(self, method: str, path: str, payload=None, headers=None) -> HTTPResponse:
+        headers = dict(headers or {})
+        body = payload
+        if payload is not None and not isinstance(payload, str):
+            body = orjson.dumps(payload)
+            headers["Content-Type"] = "application/json"
+        if self.cookies:
+            headers["Cookie"] = "; ".join(
+                f"{name}={morsel.value}" for name, morsel in self.cookies.items()
+            )
+        if method != "GET" and "csrftoken" in self.cookies:
+            headers["X-CSRFToken"] = self.cookies["csrftoken"].value
+
+        try:
+            self.connection.request(method, path, body, headers)
+            response = self.connection.getresponse()
+            # Read the whole body, so the connection can be reused
+            response.read()
+        except (OSError, HTTPException):
+            # Reconnects on the next request
+            self.connection.close()
+            raise
+
+        for cookie in response.headers.get_all("Set-Cookie") or []:
+            self.cookies.load(cookie)
+        return response
+
+    def login(self, username: str, password: str):
+        login_url = reverse("network:login")
+        self.request("GET", login_url)
+        if "csrftoken" not in self.cookies:
+            raise BenchmarkError("The login page didn't set a CSRF cookie.")
+
+        form = {
+            "username": username,
+            "password": password,
+            "csrfmiddlewaretoken": self.cookies["csrftoken"].value,
+        }
+        self.request(
+            "POST",
+            login_url,
+            urlencode(form),
+            {"Content-Type": "application/x-www-form-urlencoded"},
+        )
+        if "sessionid" not in self.cookies:
+            raise BenchmarkError(f"Couldn't log in as {username}.")
+
+
+def run(
+    host: str,
+    port: int,
+    workload: str,
+    data: dict,
+    *,
+    concurrency: int = 8,
+    duration: float = 30,
+    warmup: float = 3,
+    seed: int = 0,
+) -> dict:
+    """
+    Drive "workload" with "concurrency" logged-in workers and return the report
+    of the requests sent after the warmup.
+
+    "data" comes from prepare_database: the "usernames" workers log in as
+    (password "password"), and the "post_ids" the operations pick from.
+    """
+    if len(data["usernames"]) < concurrency:
+        raise BenchmarkError("Not enough users for the requested concurrency.")
+
+    clients = []
+    for username in data["usernames"][:concurrency]:
+        client = Client(host, port)
+        client.login(username, "password")
+        clients.append(client)
+
+    def step(index: int, operation: str, rng: random.Random):
+        method, path, payload = OPERATIONS[operation](rng, data)
+        try:
+            response = clients[index].request(method, path, payload)
+        except (OSError, HTTPException):
+            return True, None
+
+        queries = response.getheader("X-Query-Count")
+        return response.status >= 400, None if queries is None else int(queries)
+
+    return drive(
+        len(clients),
+        WORKLOADS[workload],
+        step,
+        duration=duration,
+        warmup=warmup,
+        seed=seed,
+    )
+
+
+def run_database(
+    data: dict,
+    *,
+    persistent: bool,
+    concurrency: int = 8,
+    duration: float = 10,
+    warmup: float = 1,
+    seed: int = 0,
+) -> dict:
+    """
+    Run feed page reads, like toggles and follow toggles straight on the
+    database from "concurrency" threads, with the current
+    NETWORK_SQLITE_PRAGMAS.
+
+    Without "persistent", every operation opens a new connection, as requests
+    do with CONN_MAX_AGE = 0. Operations failing with "database is locked"
+    count as errors.
+    """
+    users = list(
+        User.objects.filter(username__in=data["usernames"][:concurrency]).order_by("id")
+    )
+    if len(users) < concurrency:
+        raise BenchmarkError("Not enough users for the requested concurrency.")
+
+    def step(index: int, operation: str, rng: random.Random):
+        try:
+            if operation == "read":
+                posts = list(Post.objects.fetch_all_posts()[:POSTS_PER_PAGE])
+                Comment.objects.attach_trees(posts)
+                Post.objects.attach_viewer_state(posts, users[index])
+            elif operation == "write":
+                post = Post(id=rng.choice(data["post_ids"]))
+                Post.objects.toggle_like(post, users[index])
+            else:
+                # As the follow API operation does
+                followed = User(id=rng.choice(data["user_ids"]))
+                if User.objects.has_follow(users[index], followed):
+                    users[index].following.remove(followed.id)
+                else:
+                    users[index].following.add(followed.id)
+            return False, None
+        except OperationalError:
+            return True, None
+        finally:
+            if not persistent:
+                connection.close()
+
+    return drive(
+        concurrency,
+        DATABASE_WORKLOAD,
+        step,
+        duration=duration,
+        warmup=warmup,
+        seed=seed,
+    )
+
+
+def drive(
+    workers: int, weights: dict, step, *, duration: float, warmup: float, seed: int
+) -> dict:
+    """
+    Call "step(worker index, operation, rng)" in a loop from "workers" threads,
+    with operations drawn from "weights", and summarize the calls made after
+    the warmup. "step" returns whether the call failed, and the number of
+    queries it ran if known.
+    """
+    start = time.perf_counter()
+    measured_from = start + warmup
+    deadline = measured_from + duration
+    samples: list[list[tuple]] = [[] for _ in range(workers)]
+
+    def worker(index: int):
+        rng = random.Random(f"{seed}-{index}")
+        operations, operation_weights = list(weights), list(weights.values())
+
+        try:
+            while time.perf_counter() < deadline:
+                (operation,) = rng.choices(operations, operation_weights)
+                sent = time.perf_counter()
+                error, queries = step(index, operation, rng)
+                elapsed = time.perf_counter() - sent
+
+                if sent >= measured_from:
+                    samples[index].append((operation, elapsed, error, queries))
+        finally:
+            # Database connections are per thread
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, args=[i]) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    all_samples = [sample for worker_samples in samples for sample in worker_samples]
+    return {
+        "overall": summarize(all_samples, duration),
+        "operations": {
+            operation: summarize(
+                [sample for sample in all_samples if sample[0] == operation], duration
+            )
+            for operation in weights
+        },
+    }
+
+
+def summarize(samples: list[tuple], duration: float) -> dict:
+    """
+    Statistics of (operation, seconds, error, queries) samples.
+    """
+    latencies = sorted(elapsed * 1000 for _, elapsed, _, _ in samples)
+    queries = [count for _, _, _, count in samples if count is not None]
+
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for _, _, error, _ in samples if error),
+        "requests_per_second": round(len(samples) / duration, 2),
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "mean": round(fmean(latencies), 3) if latencies else None,
+            "max": round(latencies[-1], 3) if latencies else None,
+        },
+        "queries_per_request": round(fmean(queries), 2) if queries else None,
+    }
+
+
+def percentile(ordered: list[float], percent: float) -> float | None:
+    # Nearest-rank method
+    if not ordered:
+        return None
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return round(ordered[rank - 1], 3)
+
+
+def prepare_database(users: int, posts_per_user: float, seed: int) -> dict:
+    """
+    Migrate the benchmark database, seed it with a synthetic network unless it
+    already has one, and return the usernames, user ids and latest post ids
+    the operations pick from.
+    """
+    call_command("migrate", verbosity=0)
+    generated = User.objects.filter(username__regex=r"^user[0-9]+$")
+    if not generated.exists():
+        Generator(users=users, posts_per_user=posts_per_user, seed=seed).generate()
+
+    return {
+        "usernames": list(generated.order_by("id").values_list("username", flat=True)),
+        "user_ids": list(generated.order_by("id").values_list("id", flat=True)),
+        "post_ids": list(
+            Post.objects.order_by("-id").values_list("id", flat=True)[:1000]
+        ),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def serve(command: list[str], host: str, port: int, timeout: float = 30):
+    """
+    Run the server "command" with the current settings module until the block
+    exits, once it accepts connections on "port".
+    """
+    env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE}
+    process = subprocess.Popen(
+        command,
+        cwd=settings.BASE_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            if process.poll() is not None:
+                raise BenchmarkError(f"The server exited with code {process.returncode}.")
+            try:
+                socket.create_connection((host, port), timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise BenchmarkError("The server didn't start in time.")
+                time.sleep(0.2)
+        yield
+    finally:
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
@@ -0,0 +1,250 @@
+"""
+Conditional GET for the feed and profile endpoints.
+
+ETags of a page are computed from watermarks instead of its rendered body:
+the id, author, last_modified and like_count of the posts on the page, the
+number, latest id and date of their comments, the usernames of the post and
+comment authors, and the requesting user's likes and follows among them.
+
+When a request carries If-None-Match, not_modified reads these watermarks
+with a few indexed queries and answers 304 before the page is built.
+Otherwise, set_validators takes them from the page that was just built,
+without extra queries. Both must produce the same values.
+
+There's no Last-Modified: likes, follows, deletions and renamed authors
+aren't timestamped, so If-Modified-Since would answer 304 for stale pages.
+
+Anonymous pages are already rendered by the feed cache; their ETag is a hash
+of the cached body.
+"""
+from __future__ import annotations
+
+from hashlib import sha1
+
+import orjson
+from django.core.paginator import Paginator
+from django.db.models import Count, Max, Q, QuerySet
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import get_conditional_response, set_response_etag
+
+from .models import Comment, Post, User
+from .pagination import POSTS_PER_PAGE, cursor_page_query
+
+WATERMARK_FIELDS = ("id", "user_id", "last_modified", "like_count")
+
+
+def profile_watermark(profile_user: User) -> tuple:
+    """
+    Fields of the profile that are part of the UserOut response.
+    """
+    return (
+        profile_user.id,
+        profile_user.username,
+        profile_user.email,
+        profile_user.about,
+        profile_user.photo.name,
+        profile_user.photo_variants,
+        profile_user.last_login,
+        profile_user.following_count,
+        profile_user.followers_count,
+        profile_user.is_following,
+    )
+
+
+def is_conditional(request: HttpRequest) -> bool:
+    return "If-None-Match" in request.headers
+
+
+def not_modified(
+    request: HttpRequest,
+    posts: QuerySet[Post],
+    page: int | None = None,
+    cursor: str | None = None,
+    extra: tuple = (),
+) -> HttpResponse | None:
+    """
+    Return a 304 response if the client's copy of the requested page of
+    "posts" is still current.
+
+    Pass "page" for page number pagination, "cursor" otherwise. "extra" holds
+    any other watermark of the response, like the profile fields.
+    """
+    if not is_conditional(request):
+        return None
+
+    if page is not None:
+        p = Paginator(posts.values_list(*WATERMARK_FIELDS), POSTS_PER_PAGE)
+        p_page = p.get_page(page)
+        rows = list(p_page.object_list)
+        pages = (p.num_pages, p_page.number)
+    else:
+        rows = list(cursor_page_query(posts.values_list(*WATERMARK_FIELDS), cursor))
+        # Whether there is a next page
+        pages = len(rows) > POSTS_PER_PAGE
+        rows = rows[:POSTS_PER_PAGE]
+
+    comments, authors, liked = _watermark_queries(rows, request.user)
+    comments = comments.aggregate(**COMMENTS_WATERMARK)
+    authors = list(authors)
+    liked = sorted(liked)
+    followed = []
+    if request.user.is_authenticated and rows:
+        followed = sorted(
+            User.objects.followed_among(request.user, {row[1] for row in rows})
+        )
+
+    return _not_modified_response(
+        request, rows, pages, comments, authors, liked, followed, extra
+    )
+
+
+async def anot_modified(
+    request: HttpRequest,
+    posts: QuerySet[Post],
+    page: int | None = None,
+    cursor: str | None = None,
+    extra: tuple = (),
+) -> HttpResponse | None:
+    if not is_conditional(request):
+        return None
+
+    if page is not None:
+        p = Paginator(posts.values_list(*WATERMARK_FIELDS), POSTS_PER_PAGE)
+        # Paginator counts synchronously, so prime its cached count
+        p.__dict__["count"] = await posts.acount()
+        p_page = p.get_page(page)
+        rows = [row async for row in p_page.object_list]
+        pages = (p.num_pages, p_page.number)
+    else:
+        query = cursor_page_query(posts.values_list(*WATERMARK_FIELDS), cursor)
+        rows = [row async for row in query]
+        pages = len(rows) > POSTS_PER_PAGE
+        rows = rows[:POSTS_PER_PAGE]
+
+    comments, authors, liked = _watermark_queries(rows, request.user)
+    comments = await comments.aaggregate(**COMMENTS_WATERMARK)
+    authors = [author async for author in authors]
+    liked = sorted([post_id async for post_id in liked])
+    followed = []
+    if request.user.is_authenticated and rows:
+        followed = sorted(
+            await User.objects.afollowed_among(request.user, {row[1] for row in rows})
+        )
+
+    return _not_modified_response(
+        request, rows, pages, comments, authors, liked, followed, extra
+    )
+
+
+def set_validators(
+    request: HttpRequest, response: HttpResponse, data: dict, extra: tuple = ()
+):
+    """
+    Set the validators of a page built by posts_pager or posts_cursor_pager
+    on "response".
+    """
+    posts: list[Post] = data["posts"]
+    rows = [tuple(getattr(post, field) for field in WATERMARK_FIELDS) for post in posts]
+
+    if data.get("numPages") is not None:
+        pages = (data["numPages"], (data["previousPage"] or 0) + 1)
+    else:
+        pages = data.get("nextCursor") is not None
+
+    comments = {"count": 0, "last_id": None, "last_date": None}
+    authors = {post.user_id: post.user.username for post in posts}
+    for comment in _walk_comments(posts):
+        authors[comment.user_id] = comment.user.username
+        comments["count"] += 1
+        if comments["last_id"] is None or comment.id > comments["last_id"]:
+            comments["last_id"] = comment.id
+        if (
+            comments["last_date"] is None
+            or comment.publication_date > comments["last_date"]
+        ):
+            comments["last_date"] = comment.publication_date
+
+    liked = sorted(post.id for post in posts if post.liked_by_user)
+    followed = sorted({post.user_id for post in posts if post.is_following})
+
+    response.headers["ETag"] = _etag(
+        request, rows, pages, comments, sorted(authors.items()), liked, followed, extra
+    )
+
+
+def check_content(request: HttpRequest, response: HttpResponse) -> HttpResponse:
+    """
+    Set an ETag hashed from the body of an already rendered response, and
+    return a 304 response instead if the client's copy is still current.
+    """
+    set_response_etag(response)
+    return (
+        get_conditional_response(
+            request, etag=response.headers["ETag"], response=response
+        )
+        or response
+    )
+
+
+COMMENTS_WATERMARK = {
+    "count": Count("id"),
+    "last_id": Max("id"),
+    "last_date": Max("publication_date"),
+}
+
+
+def _watermark_queries(rows: list[tuple], request_user):
+    post_ids = [row[0] for row in rows]
+    comments = Comment.objects.filter(post_id__in=post_ids)
+    # Usernames are rendered with every post and comment
+    authors = (
+        User.objects.filter(
+            Q(id__in={row[1] for row in rows}) | Q(id__in=comments.values("user_id"))
+        )
+        .order_by("id")
+        .values_list("id", "username")
+    )
+
+    if not (request_user.is_authenticated and rows):
+        return comments, authors, Post.liked_by.through.objects.none()
+
+    liked = Post.liked_by.through.objects.filter(
+        user_id=request_user.id, post_id__in=post_ids
+    ).values_list("post_id", flat=True)
+
+    return comments, authors, liked
+
+
+def _walk_comments(posts: list[Post]):
+    # Trees attached by CommentManager.attach_trees
+    stack = [comment for post in posts for comment in post.comments.all()]
+    while stack:
+        comment = stack.pop()
+        stack.extend(comment.replies.all())
+        yield comment
+
+
+def _etag(request: HttpRequest, rows, pages, comments, authors, liked, followed, extra):
+    watermarks = [
+        request.user.id,
+        pages,
+        rows,
+        [comments["count"], comments["last_id"], comments["last_date"]],
+        [list(author) for author in authors],
+        liked,
+        followed,
+        extra,
+    ]
+    return f'W/"{sha1(orjson.dumps(watermarks, default=str)).hexdigest()}"'
+
+
+def _not_modified_response(
+    request: HttpRequest, rows, pages, comments, authors, liked, followed, extra
+) -> HttpResponse | None:
+    etag = _etag(request, rows, pages, comments, authors, liked, followed, extra)
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        # 304 responses must carry the same validator as the full response
+        response.headers["ETag"] = etag
+
+    return response
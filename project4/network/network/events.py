@@ -0,0 +1,197 @@
+"""
+Live feed events, streamed to browsers with server-sent events.
+
+Writes publish small hints ("post", "comment", "likes") once their transaction
+commits, and every open stream receives them through the broker set in
+NETWORK_EVENTS_BROKER. Clients then fetch what they need from the API instead
+of polling it.
+
+InProcessBroker only reaches streams served by the same process. With several
+ASGI workers, use RedisBroker (requires the "redis" package) so events
+published by one worker reach the streams of the others.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncIterator
+
+import orjson
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class Broker(ABC):
+    """
+    Interface of the event brokers.
+    """
+
+    # Events kept for a stream that doesn't keep up, newer ones are dropped
+    queue_size = 100
+
+    @abstractmethod
+    def publish(self, event: dict):
+        """
+        Send "event" to every subscriber. Called from any thread.
+        """
+
+    @abstractmethod
+    def subscribe(self) -> AsyncIterator[asyncio.Queue]:
+        """
+        Async context manager yielding a queue that receives the published
+        events until the context exits.
+        """
+
+
+class InProcessBroker(Broker):
+    def __init__(self):
+        self._subscribers: set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = set()
+        self._lock = threading.Lock()
+
+    def publish(self, event: dict):
+        with self._lock:
+            subscribers = list(self._subscribers)
+
+        for loop, queue in subscribers:
+            try:
+                # Queues aren't thread safe, hand the event to their loop
+                loop.call_soon_threadsafe(_put, queue, event)
+            except RuntimeError:
+                # Loop closed without unsubscribing
+                with self._lock:
+                    self._subscribers.discard((loop, queue))
+
+    @asynccontextmanager
+    async def subscribe(self):
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(self.queue_size))
+        with self._lock:
+            self._subscribers.add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
+
+
+class RedisBroker(Broker):
+    """
+    Publish events on a Redis channel, set with NETWORK_EVENTS_REDIS_URL.
+
+    Each process listens to the channel with a single connection and hands
+    the events to its local streams.
+    """
+
+    channel = "network:events"
+
+    def __init__(self):
+        try:
+            import redis
+        except ImportError as error:
+            raise ImproperlyConfigured(
+                "RedisBroker requires the redis package."
+            ) from error
+
+        self._url = getattr(
+            settings, "NETWORK_EVENTS_REDIS_URL", "redis://localhost:6379/0"
+        )
+        self._redis = redis.Redis.from_url(self._url)
+        self._local = InProcessBroker()
+        self._listener: asyncio.Task | None = None
+
+    def publish(self, event: dict):
+        self._redis.publish(self.channel, orjson.dumps(event))
+
+    @asynccontextmanager
+    async def subscribe(self):
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+        async with self._local.subscribe() as queue:
+            yield queue
+
+    async def _listen(self):
+        from redis import asyncio as aioredis
+
+        client = aioredis.Redis.from_url(self._url)
+        try:
+            async with client.pubsub() as pubsub:
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._local.publish(orjson.loads(message["data"]))
+        except Exception:
+            # Restarted by the next subscriber
+            logger.exception("Lost the connection to the events channel")
+        finally:
+            await client.close()
+
+
+def _put(queue: asyncio.Queue, event: dict):
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        # Events are only hints, a slow stream can miss some
+        pass
+
+
+@lru_cache(maxsize=None)
+def get_broker() -> Broker:
+    return import_string(
+        getattr(settings, "NETWORK_EVENTS_BROKER", "network.events.InProcessBroker")
+    )()
+
+
+def publish(event_type: str, **data):
+    """
+    Send an event to the open streams once the current transaction commits.
+    """
+    event = {"type": event_type, **data}
+
+    def send():
+        try:
+            get_broker().publish(event)
+        except Exception:
+            # The write already succeeded, don't fail the request
+            logger.exception("Failed to publish %s event", event_type)
+
+    transaction.on_commit(send)
+
+
+def format_event(event: dict) -> str:
+    data = {key: value for key, value in event.items() if key != "type"}
+    return f"event: {event['type']}\ndata: {orjson.dumps(data).decode()}\n\n"
+
+
+async def stream() -> AsyncIterator[str]:
+    """
+    Server-sent events stream of the published events.
+
+    A comment is sent every NETWORK_EVENTS_KEEPALIVE seconds to keep proxies
+    from closing the connection. The stream ends after NETWORK_EVENTS_MAX_AGE
+    seconds and the browser reconnects, so streams left open by clients that
+    went away don't pile up.
+    """
+    keepalive = getattr(settings, "NETWORK_EVENTS_KEEPALIVE", 15)
+    deadline = time.monotonic() + getattr(settings, "NETWORK_EVENTS_MAX_AGE", 300)
+
+    async with get_broker().subscribe() as queue:
+        # Reconnection delay for EventSource, in milliseconds
+        yield "retry: 3000\n\n"
+
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                event = await asyncio.wait_for(queue.get(), min(keepalive, remaining))
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+
+            yield format_event(event)
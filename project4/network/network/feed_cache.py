@@ -0,0 +1,109 @@
+"""
+Response cache for the anonymous feed.
+
+Rendered pages are stored under the current feed generation. Writes that
+change what anonymous users see call bump_generation(), which makes every
+cached page unreachable at once instead of deleting keys one by one. Stale
+generations simply expire with their TTL.
+
+The default LocMemCache is per process. Point CACHES at a shared backend
+(Redis, Memcached) to share pages between workers.
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from django.conf import settings
+from django.core.cache import cache
+
+GENERATION_KEY = "network:feed:generation"
+
+
+def ttl() -> int:
+    return getattr(settings, "NETWORK_FEED_CACHE_TTL", 30)
+
+
+def lock_timeout() -> float:
+    return getattr(settings, "NETWORK_FEED_CACHE_LOCK_TIMEOUT", 5)
+
+
+def generation() -> int:
+    # Seeding with the current time keeps generations increasing if the key
+    # gets evicted, so pages cached before the eviction are never served.
+    cache.add(GENERATION_KEY, time.time_ns(), timeout=None)
+    return cache.get(GENERATION_KEY) or 0
+
+
+async def ageneration() -> int:
+    await cache.aadd(GENERATION_KEY, time.time_ns(), timeout=None)
+    return await cache.aget(GENERATION_KEY) or 0
+
+
+def bump_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        # Key was evicted, a new seed is already greater than the old value
+        generation()
+
+
+def cached_page(key: str, render: Callable[[], bytes]) -> bytes:
+    """
+    Return the cached rendering of "key" for the current generation, calling
+    "render" on a miss.
+
+    Only the worker holding the page lock recomputes it; others wait for its
+    result for up to NETWORK_FEED_CACHE_LOCK_TIMEOUT seconds before giving up
+    and rendering the page themselves.
+    """
+    page_key = f"network:feed:{generation()}:{key}"
+    content = cache.get(page_key)
+    if content is not None:
+        return content
+
+    lock_key = f"{page_key}:lock"
+    if cache.add(lock_key, True, timeout=lock_timeout()):
+        try:
+            content = render()
+            cache.set(page_key, content, timeout=ttl())
+        finally:
+            cache.delete(lock_key)
+        return content
+
+    deadline = time.monotonic() + lock_timeout()
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        content = cache.get(page_key)
+        if content is not None:
+            return content
+
+    return render()
+
+
+async def acached_page(key: str, render: Callable[[], Awaitable[bytes]]) -> bytes:
+    """
+    Async version of cached_page, waiting for the page lock without blocking
+    the event loop.
+    """
+    page_key = f"network:feed:{await ageneration()}:{key}"
+    content = await cache.aget(page_key)
+    if content is not None:
+        return content
+
+    lock_key = f"{page_key}:lock"
+    if await cache.aadd(lock_key, True, timeout=lock_timeout()):
+        try:
+            content = await render()
+            await cache.aset(page_key, content, timeout=ttl())
+        finally:
+            await cache.adelete(lock_key)
+        return content
+
+    deadline = time.monotonic() + lock_timeout()
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        content = await cache.aget(page_key)
+        if content is not None:
+            return content
+
+    return await render()
@@ -0,0 +1,237 @@
+"""
+In-process follow graph.
+
+With NETWORK_FOLLOW_GRAPH enabled, every process keeps the follow table in
+memory as two sorted arrays of user ids per user (who they follow, who follows
+them), 8 bytes per follow and side. Follow checks and following lists on the
+feed and profile paths are then answered without querying the follow table:
+
+- it's loaded on the task pool when the first request comes in, until then
+  the callers fall back to queries (see current()),
+- the m2m_changed receiver in signals.py applies follows and unfollows once
+  their transaction commits, so rolled back changes never show up,
+- follows made by other processes are picked up by reloading the graph every
+  NETWORK_FOLLOW_GRAPH_MAX_AGE seconds. Until then they can be missing from
+  this process, set it lower (or keep the graph disabled) when that matters.
+
+Nothing tells a process that another one changed the follow table, so the
+graph is only exact when a single process serves the site. With several
+workers, treat its answers as up to NETWORK_FOLLOW_GRAPH_MAX_AGE seconds old.
+Writes never depend on it: the follow operation decides between following and
+unfollowing from the follow table (CustomUserManager.has_follow).
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections.abc import Iterable
+
+from django.conf import settings
+
+from . import tasks
+
+# Follow pairs, as (follower id, followed id)
+Pairs = Iterable[tuple[int, int]]
+
+EMPTY = array("q")
+
+
+def enabled() -> bool:
+    return getattr(settings, "NETWORK_FOLLOW_GRAPH", False)
+
+
+def max_age() -> float:
+    return getattr(settings, "NETWORK_FOLLOW_GRAPH_MAX_AGE", 300)
+
+
+def _contains(ids: array, user_id: int) -> bool:
+    i = bisect_left(ids, user_id)
+    return i < len(ids) and ids[i] == user_id
+
+
+def _insert(adjacency: dict[int, array], user_id: int, other_id: int):
+    ids = adjacency.setdefault(user_id, array("q"))
+    i = bisect_left(ids, other_id)
+    if i == len(ids) or ids[i] != other_id:
+        ids.insert(i, other_id)
+
+
+def _delete(adjacency: dict[int, array], user_id: int, other_id: int):
+    ids = adjacency.get(user_id, EMPTY)
+    i = bisect_left(ids, other_id)
+    if i < len(ids) and ids[i] == other_id:
+        del ids[i]
+        if not ids:
+            del adjacency[user_id]
+
+
+class Adjacency:
+    """
+    Sorted following and followers id arrays per user, and the ids of the
+    celebrity accounts (see timeline.py).
+    """
+
+    def __init__(self, following: dict[int, array], followers: dict[int, array]):
+        self.following = following
+        self.followers = followers
+        self.celebrities: set[int] = set()
+
+    def add(self, pairs: Pairs):
+        from .timeline import celebrity_threshold
+
+        for follower_id, followed_id in pairs:
+            if follower_id == followed_id:
+                continue
+            _insert(self.following, follower_id, followed_id)
+            _insert(self.followers, followed_id, follower_id)
+            # Mirrors timeline.update_celebrities, the flag is never cleared
+            if len(self.followers[followed_id]) > celebrity_threshold():
+                self.celebrities.add(followed_id)
+
+    def remove(self, pairs: Pairs):
+        for follower_id, followed_id in pairs:
+            _delete(self.following, follower_id, followed_id)
+            _delete(self.followers, followed_id, follower_id)
+
+
+class FollowGraph:
+    def __init__(self):
+        self._adjacency: Adjacency | None = None
+        self.loaded_at: float | None = None
+        # Changes committed while loading, replayed on the new adjacency
+        self._pending: list | None = None
+        self._scheduled = False
+        # Guards changes to the adjacency arrays, reads don't take it
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._adjacency is not None
+
+    def is_stale(self) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > max_age()
+
+    def load(self):
+        """
+        Read the whole follow table and the celebrity flags.
+        """
+        from .models import User
+
+        with self._load_lock:
+            with self._lock:
+                self._pending = []
+
+            try:
+                following: dict[int, array] = {}
+                followers: dict[int, array] = {}
+                rows = (
+                    User.following.through.objects.order_by("from_user_id", "to_user_id")
+                    .values_list("from_user_id", "to_user_id")
+                    .iterator(chunk_size=10_000)
+                )
+                for from_user_id, to_user_id in rows:
+                    following.setdefault(from_user_id, array("q")).append(to_user_id)
+                    followers.setdefault(to_user_id, array("q")).append(from_user_id)
+                # Sorted by follower id while building following, sort the other side
+                for user_id, ids in followers.items():
+                    followers[user_id] = array("q", sorted(ids))
+
+                adjacency = Adjacency(following, followers)
+                adjacency.celebrities.update(
+                    User.objects.filter(celebrity=True).values_list("id", flat=True)
+                )
+            except BaseException:
+                with self._lock:
+                    self._pending = None
+                raise
+
+            with self._lock:
+                for method, args in self._pending:
+                    getattr(adjacency, method)(*args)
+                self._adjacency = adjacency
+                self.loaded_at = time.monotonic()
+                self._pending = None
+
+    def refresh(self):
+        """
+        Schedule a load on the task pool when the graph is missing or older
+        than NETWORK_FOLLOW_GRAPH_MAX_AGE. The current one is used meanwhile.
+        """
+        with self._lock:
+            if self._scheduled or not self.is_stale():
+                return
+            self._scheduled = True
+        tasks.submit(self._scheduled_load)
+
+    def _scheduled_load(self):
+        try:
+            self.load()
+        finally:
+            self._scheduled = False
+
+    def reset(self):
+        with self._lock:
+            self._adjacency = None
+            self.loaded_at = None
+
+    # region Changes
+
+    def add(self, pairs: Pairs):
+        self._change("add", list(pairs))
+
+    def remove(self, pairs: Pairs):
+        self._change("remove", list(pairs))
+
+    def _change(self, method: str, *args):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((method, args))
+            if self._adjacency is not None:
+                getattr(self._adjacency, method)(*args)
+
+    # endregion
+
+    # region Reads
+
+    def is_following(self, follower_id: int, followed_id: int) -> bool:
+        return _contains(self._following(follower_id), followed_id)
+
+    def following_ids(self, user_id: int) -> list[int]:
+        return self._following(user_id).tolist()
+
+    def followed_among(self, follower_id: int, user_ids: Iterable[int]) -> set[int]:
+        following = self._following(follower_id)
+        return {user_id for user_id in user_ids if _contains(following, user_id)}
+
+    def followed_celebrities(self, follower_id: int) -> list[int]:
+        following = self._following(follower_id)
+        celebrities = self._adjacency.celebrities if self._adjacency else set()
+        # Usually a handful of celebrities and a longer following list
+        if len(celebrities) < len(following):
+            return sorted(id_ for id_ in celebrities if _contains(following, id_))
+        return [id_ for id_ in following if id_ in celebrities]
+
+    def following_count(self, user_id: int) -> int:
+        return len(self._following(user_id))
+
+    def _following(self, user_id: int) -> array:
+        adjacency = self._adjacency
+        return adjacency.following.get(user_id, EMPTY) if adjacency else EMPTY
+
+    # endregion
+
+
+graph = FollowGraph()
+
+
+def current() -> FollowGraph | None:
+    """
+    Return the follow graph if it's enabled and loaded, or None when callers
+    should query the follow table. Schedules a load when it's missing or old.
+    """
+    if not enabled():
+        return None
+
+    graph.refresh()
+    return graph if graph.loaded else None
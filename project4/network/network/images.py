@@ -0,0 +1,82 @@
+"""
+Resized variants of profile photos.
+
+After an upload, build_variants runs on the worker pool and stores square
+WebP and JPEG renditions of the photo for every size in
+NETWORK_PHOTO_VARIANT_SIZES. Variant filenames are derived from the SHA-256
+of the original, so uploading the same picture twice (or two users uploading
+the same one) reuses the files already in storage. For the same reason,
+variants are never deleted along with the original photo.
+"""
+from hashlib import sha256
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .models import User
+from .utility import app_name
+
+# Extension -> Pillow format and save options
+VARIANT_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 85, "optimize": True, "progressive": True}),
+}
+
+
+def variant_sizes() -> tuple[int, ...]:
+    return getattr(settings, "NETWORK_PHOTO_VARIANT_SIZES", (48, 128, 512))
+
+
+def variant_path(digest: str, size: int, extension: str) -> str:
+    return f"{app_name}/variants/{digest[:2]}/{digest}_{size}.{extension}"
+
+
+def render_variant(image: Image.Image, size: int, image_format: str, options) -> bytes:
+    variant = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+    buffer = BytesIO()
+    variant.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def build_variants(user_id: int):
+    """
+    Generate the missing variants of a user's photo and store their paths in
+    "photo_variants".
+    """
+    user = User.objects.get(id=user_id)
+    if not user.photo:
+        return
+
+    with user.photo.open("rb") as photo:
+        data = photo.read()
+
+    digest = sha256(data).hexdigest()
+    image = None
+    variants: dict[str, dict[str, str]] = {}
+
+    for size in variant_sizes():
+        for extension, (image_format, options) in VARIANT_FORMATS.items():
+            path = variant_path(digest, size, extension)
+
+            if not default_storage.exists(path):
+                if image is None:
+                    # Decode only when a variant is actually missing
+                    image = ImageOps.exif_transpose(Image.open(BytesIO(data)))
+                    image = image.convert("RGB")
+                content = render_variant(image, size, image_format, options)
+                path = default_storage.save(path, ContentFile(content))
+
+            variants.setdefault(str(size), {})[extension] = path
+
+    # Skip the update if another photo was uploaded in the meantime
+    User.objects.filter(id=user_id, photo=user.photo.name).update(photo_variants=variants)
+
+
+def variant_urls(variants: dict[str, dict[str, str]]) -> dict[str, dict[str, str]]:
+    return {
+        size: {extension: default_storage.url(path) for extension, path in paths.items()}
+        for size, paths in variants.items()
+    }
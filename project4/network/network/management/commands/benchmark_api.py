@@ -0,0 +1,130 @@
+import shlex
+import sys
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import orjson
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from network import benchmark
+from network.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test the API over HTTP and report throughput, latency percentiles "
+        "and queries per request. Run it with project4.settings_benchmark, which "
+        "seeds and serves its own database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workload", choices=sorted(benchmark.WORKLOADS), default="mixed"
+        )
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument(
+            "--duration", type=float, default=30, help="Measured seconds."
+        )
+        parser.add_argument(
+            "--warmup", type=float, default=3, help="Seconds sent before measuring."
+        )
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=1000,
+            help="Users to seed an empty database with.",
+        )
+        parser.add_argument("--posts-per-user", type=float, default=10)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--server-command",
+            help=(
+                'Command serving the site on "{port}", e.g. '
+                '"uvicorn project4.asgi:application --port {port}". '
+                "Defaults to runserver, a threaded WSGI server."
+            ),
+        )
+        parser.add_argument(
+            "--url",
+            help="Benchmark an already running server, e.g. http://127.0.0.1:8000.",
+        )
+        parser.add_argument("--output", help="Also write the report to this JSON file.")
+
+    def handle(self, *args, **options):
+        if not getattr(settings, "NETWORK_BENCHMARK", False):
+            raise CommandError(
+                "The benchmark writes to its database, run it with "
+                "DJANGO_SETTINGS_MODULE=project4.settings_benchmark."
+            )
+
+        self.stdout.write("Preparing the benchmark database...")
+        data = benchmark.prepare_database(
+            options["users"], options["posts_per_user"], options["seed"]
+        )
+
+        if options["url"]:
+            url = urlsplit(options["url"])
+            host, port = url.hostname, url.port or 80
+            command = None
+            server = nullcontext()
+        else:
+            host, port = "127.0.0.1", benchmark.free_port()
+            if options["server_command"]:
+                command = shlex.split(options["server_command"].format(port=port))
+            else:
+                command = [
+                    sys.executable,
+                    "manage.py",
+                    "runserver",
+                    "--noreload",
+                    f"{host}:{port}",
+                ]
+            server = benchmark.serve(command, host, port)
+
+        self.stdout.write(
+            f"Running the {options['workload']} workload with "
+            f"{options['concurrency']} workers for {options['duration']:g}s..."
+        )
+        try:
+            with server:
+                results = benchmark.run(
+                    host,
+                    port,
+                    options["workload"],
+                    data,
+                    concurrency=options["concurrency"],
+                    duration=options["duration"],
+                    warmup=options["warmup"],
+                    seed=options["seed"],
+                )
+        except benchmark.BenchmarkError as error:
+            raise CommandError(error) from error
+
+        report = {
+            "commit": benchmark.git_commit(),
+            "date": datetime.now(timezone.utc),
+            "workload": options["workload"],
+            "concurrency": options["concurrency"],
+            "duration": options["duration"],
+            "server": shlex.join(command) if command else options["url"],
+            "users": len(data["usernames"]),
+            "posts": Post.objects.count(),
+            **results,
+        }
+        output = orjson.dumps(report, option=orjson.OPT_INDENT_2)
+        if options["output"]:
+            Path(options["output"]).write_bytes(output)
+        self.stdout.write(output.decode())
+
+        overall = results["overall"]
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{overall['requests_per_second']:g} requests/s, "
+                f"p50 {overall['latency_ms']['p50']}ms, "
+                f"p99 {overall['latency_ms']['p99']}ms, "
+                f"{overall['errors']} errors."
+            )
+        )
@@ -0,0 +1,114 @@
+from datetime import datetime, timezone
+from pathlib import Path
+
+import orjson
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+
+from network import benchmark
+from network.sqlite import apply_pragmas, read_pragmas, sqlite_pragmas
+
+# SQLite's own defaults. The journal mode is stored in the database file, so
+# it has to be reset explicitly after a tuned run.
+STOCK_PRAGMAS = {"journal_mode": "DELETE", "synchronous": "FULL"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare concurrent feed reads, like toggles and follow toggles on the "
+        "stock SQLite configuration, with a connection per operation, against "
+        "NETWORK_SQLITE_PRAGMAS with persistent connections. Run it with "
+        "project4.settings_benchmark."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument(
+            "--duration", type=float, default=10, help="Measured seconds per run."
+        )
+        parser.add_argument(
+            "--warmup", type=float, default=1, help="Seconds run before measuring."
+        )
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=1000,
+            help="Users to seed an empty database with.",
+        )
+        parser.add_argument("--posts-per-user", type=float, default=10)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Also write the report to this JSON file.")
+
+    def handle(self, *args, **options):
+        if not getattr(settings, "NETWORK_BENCHMARK", False):
+            raise CommandError(
+                "The benchmark writes to its database, run it with "
+                "DJANGO_SETTINGS_MODULE=project4.settings_benchmark."
+            )
+        if connection.vendor != "sqlite":
+            raise CommandError("The default database isn't SQLite.")
+
+        self.stdout.write("Preparing the benchmark database...")
+        data = benchmark.prepare_database(
+            options["users"], options["posts_per_user"], options["seed"]
+        )
+
+        runs = {
+            "stock": (STOCK_PRAGMAS, False),
+            "tuned": (sqlite_pragmas(), True),
+        }
+        results = {}
+        for name, (pragmas, persistent) in runs.items():
+            self.stdout.write(
+                f"Running the {name} configuration with {options['concurrency']} "
+                f"workers for {options['duration']:g}s..."
+            )
+            with override_settings(NETWORK_SQLITE_PRAGMAS=pragmas):
+                # The journal mode can only change without other connections
+                connection.close()
+                connection.ensure_connection()
+                apply_pragmas(connection)
+                try:
+                    results[name] = {
+                        "pragmas": read_pragmas(connection, pragmas),
+                        "persistent_connections": persistent,
+                        **benchmark.run_database(
+                            data,
+                            persistent=persistent,
+                            concurrency=options["concurrency"],
+                            duration=options["duration"],
+                            warmup=options["warmup"],
+                            seed=options["seed"],
+                        ),
+                    }
+                except benchmark.BenchmarkError as error:
+                    raise CommandError(error) from error
+                finally:
+                    connection.close()
+
+        report = {
+            "commit": benchmark.git_commit(),
+            "date": datetime.now(timezone.utc),
+            "concurrency": options["concurrency"],
+            "duration": options["duration"],
+            **results,
+        }
+        output = orjson.dumps(report, option=orjson.OPT_INDENT_2)
+        if options["output"]:
+            Path(options["output"]).write_bytes(output)
+        self.stdout.write(output.decode())
+
+        for name, result in results.items():
+            overall, writes = result["overall"], result["operations"]["write"]
+            follows = result["operations"]["follow"]
+            self.stdout.write(
+                f"{name}: {overall['requests_per_second']:g} operations/s, "
+                f"write p99 {writes['latency_ms']['p99']}ms, {overall['errors']} errors "
+                f"({writes['errors']} like and {follows['errors']} follow toggles)"
+            )
+        stock, tuned = (results[name]["overall"] for name in runs)
+        if stock["requests_per_second"]:
+            speedup = tuned["requests_per_second"] / stock["requests_per_second"]
+            self.stdout.write(self.style.SUCCESS(f"Tuned throughput: {speedup:.2f}x."))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from network.images import build_variants
+from network.models import User
+
+
+class Command(BaseCommand):
+    help = "Generate the resized variants of every profile photo."
+
+    def handle(self, *args, **options):
+        user_ids = (
+            User.objects.exclude(photo="")
+            .exclude(photo=None)
+            .values_list("id", flat=True)
+        )
+        for user_id in user_ids:
+            build_variants(user_id)
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {len(user_ids)} photo(s)."))
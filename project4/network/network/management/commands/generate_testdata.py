@@ -0,0 +1,69 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from network.testdata import Generator
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic network with power-law distributed followers, "
+        "likes, posts and comments. The same seed generates the same network."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--posts-per-user", type=float, default=10)
+        parser.add_argument("--follows-per-user", type=float, default=20)
+        parser.add_argument("--likes-per-post", type=float, default=5)
+        parser.add_argument("--comments-per-post", type=float, default=2)
+        parser.add_argument(
+            "--reply-ratio",
+            type=float,
+            default=0.5,
+            help="Share of comments replying to an earlier comment of the thread.",
+        )
+        parser.add_argument(
+            "--alpha",
+            type=float,
+            default=1.5,
+            help="Power-law exponent, greater than 1. The lower, the more skewed.",
+        )
+        parser.add_argument(
+            "--days", type=int, default=365, help="Posts are spread over this many days."
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--prefix",
+            default="user",
+            help='Users are named "<prefix>0" to "<prefix><users - 1>".',
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        start = perf_counter()
+        try:
+            generator = Generator(
+                users=options["users"],
+                posts_per_user=options["posts_per_user"],
+                follows_per_user=options["follows_per_user"],
+                likes_per_post=options["likes_per_post"],
+                comments_per_post=options["comments_per_post"],
+                reply_ratio=options["reply_ratio"],
+                alpha=options["alpha"],
+                days=options["days"],
+                seed=options["seed"],
+                prefix=options["prefix"],
+                batch_size=options["batch_size"],
+            )
+            counts = generator.generate()
+        except ValueError as error:
+            raise CommandError(error) from error
+
+        for table, count in counts.items():
+            self.stdout.write(f"{count:>12,} {table}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated {sum(counts.values()):,} rows in {perf_counter() - start:.1f}s."
+            )
+        )
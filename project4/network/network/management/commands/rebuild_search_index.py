@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from network.search import rebuild
+
+
+class Command(BaseCommand):
+    help = "Refill the full-text search table from every post and comment."
+
+    def handle(self, *args, **options):
+        rebuild()
+        with connection.cursor() as db:
+            db.execute("SELECT COUNT(*) FROM network_search")
+            (rows,) = db.fetchone()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {rows} posts and comments."))
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from network.suggestions import rebuild_suggestions, refresh_stale_suggestions
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the "who to follow" suggestions of every user from the follow '
+        "graph and recent posts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            help="Recompute again every this many seconds, until interrupted.",
+        )
+        parser.add_argument(
+            "--stale",
+            action="store_true",
+            help=(
+                "Only recompute the suggestions of the users who followed or "
+                "unfollowed someone since, cheap enough to run every few seconds."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            if options["stale"]:
+                refreshed = refresh_stale_suggestions()
+                self.stdout.write(
+                    self.style.SUCCESS(f"Refreshed the suggestions of {refreshed} users.")
+                )
+            else:
+                saved = rebuild_suggestions()
+                self.stdout.write(self.style.SUCCESS(f"Saved {saved} suggestions."))
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
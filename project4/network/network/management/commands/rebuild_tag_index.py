@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from network.models import Hashtag, Mention
+from network.tags import rebuild
+
+
+class Command(BaseCommand):
+    help = "Index the hashtags and mentions of every post and comment from scratch."
+
+    def handle(self, *args, **options):
+        rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Indexed {Hashtag.objects.count()} hashtags and "
+                f"{Mention.objects.count()} mentions."
+            )
+        )
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from network.models import TimelineEntry
+from network.timeline import rebuild_timelines
+
+
+class Command(BaseCommand):
+    help = "Recompute celebrity flags and every home timeline from the follow graph."
+
+    def handle(self, *args, **options):
+        rebuild_timelines()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {TimelineEntry.objects.count()} timeline entries."
+            )
+        )
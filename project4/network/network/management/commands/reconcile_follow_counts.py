@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from network.models import User
+
+
+class Command(BaseCommand):
+    help = "Fix users whose stored follow counts drifted from the follow table."
+
+    def handle(self, *args, **options):
+        fixed = User.objects.reconcile_follow_counts()
+        self.stdout.write(self.style.SUCCESS(f"Reconciled {fixed} user(s)."))
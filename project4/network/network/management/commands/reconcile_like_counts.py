@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from network.models import Post
+
+
+class Command(BaseCommand):
+    help = "Fix posts whose stored like_count drifted from the liked_by table."
+
+    def handle(self, *args, **options):
+        fixed = Post.objects.reconcile_like_counts()
+        self.stdout.write(self.style.SUCCESS(f"Reconciled {fixed} post(s)."))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from network.replication import replicate
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database into the NETWORK_READ_REPLICAS files, "
+        "a stand-in for replication when trying out read replicas locally."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            help="Copy again every this many seconds, until interrupted.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                replicas = replicate()
+            except ValueError as error:
+                raise CommandError(error) from error
+            if not replicas:
+                raise CommandError("NETWORK_READ_REPLICAS is empty.")
+
+            self.stdout.write(
+                self.style.SUCCESS(f"Replicated to {', '.join(replicas)}."),
+            )
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
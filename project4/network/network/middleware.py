@@ -0,0 +1,143 @@
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils.decorators import sync_and_async_middleware
+
+from .routers import PIN_COOKIE, pin_seconds, read_replicas, request_writes
+
+# Queries run so far by the current request, None outside of requests. A
+# context variable follows async views into their sync_to_async threads.
+request_queries: ContextVar[list[int] | None] = ContextVar(
+    "request_queries", default=None
+)
+
+
+@sync_and_async_middleware
+def load_user(get_response):
+    """
+    Resolve the lazy "request.user" before async API operations run.
+
+    Ninja runs authentication checks synchronously, which would otherwise
+    query the session and user tables from the event loop. Only enabled with
+    NETWORK_ASYNC_API, and must come after AuthenticationMiddleware.
+    """
+    if not getattr(settings, "NETWORK_ASYNC_API", False):
+        raise MiddlewareNotUsed()
+
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            await sync_to_async(lambda: request.user.is_authenticated)()
+            return await get_response(request)
+
+    else:
+
+        def middleware(request):
+            return get_response(request)
+
+    return middleware
+
+
+@sync_and_async_middleware
+def query_count(get_response):
+    """
+    Report the number of SQL queries run by each request in an "X-Query-Count"
+    header, read by "manage.py benchmark_api". Only enabled with
+    NETWORK_QUERY_COUNT_HEADER.
+    """
+    if not getattr(settings, "NETWORK_QUERY_COUNT_HEADER", False):
+        raise MiddlewareNotUsed()
+
+    connection_created.connect(install_query_counter)
+    for connection in connections.all(initialized_only=True):
+        install_query_counter(None, connection)
+
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            token = request_queries.set([0])
+            try:
+                response = await get_response(request)
+                response["X-Query-Count"] = request_queries.get()[0]
+            finally:
+                request_queries.reset(token)
+            return response
+
+    else:
+
+        def middleware(request):
+            token = request_queries.set([0])
+            try:
+                response = get_response(request)
+                response["X-Query-Count"] = request_queries.get()[0]
+            finally:
+                request_queries.reset(token)
+            return response
+
+    return middleware
+
+
+@sync_and_async_middleware
+def replica_pinning(get_response):
+    """
+    Pin clients to the primary database for NETWORK_REPLICA_PIN_SECONDS after
+    a request that wrote to it, see routers.py. Only enabled with
+    NETWORK_READ_REPLICAS.
+    """
+    if not read_replicas():
+        raise MiddlewareNotUsed()
+
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            token = request_writes.set([False])
+            try:
+                response = await get_response(request)
+                wrote = request_writes.get()[0]
+            finally:
+                request_writes.reset(token)
+            return pin(response, wrote)
+
+    else:
+
+        def middleware(request):
+            token = request_writes.set([False])
+            try:
+                response = get_response(request)
+                wrote = request_writes.get()[0]
+            finally:
+                request_writes.reset(token)
+            return pin(response, wrote)
+
+    return middleware
+
+
+def pin(response, wrote: bool):
+    if wrote:
+        seconds = pin_seconds()
+        response.set_cookie(
+            PIN_COOKIE,
+            str(int(time.time()) + seconds),
+            max_age=seconds,
+            httponly=True,
+            samesite="Lax",
+        )
+    return response
+
+
+def install_query_counter(sender, connection, **kwargs):
+    # Connections are reopened on the same wrapper, which keeps its wrappers
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+def count_query(execute, sql, params, many, context):
+    queries = request_queries.get()
+    if queries is not None:
+        queries[0] += 1
+    return execute(sql, params, many, context)
@@ -0,0 +1,31 @@
+# Generated by Django 4.0.6 on 2026-10-18 18:10
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+
+
+def populate_like_count(apps, schema_editor):
+    Post = apps.get_model("network", "Post")
+    likes = (
+        Post.liked_by.through.objects.filter(post_id=OuterRef("id"))
+        .values("post_id")
+        .annotate(total=Count("user_id"))
+        .values("total")
+    )
+    Post.objects.filter(liked_by__isnull=False).update(like_count=Subquery(likes))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0005_alter_user_managers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_like_count, migrations.RunPython.noop),
+    ]
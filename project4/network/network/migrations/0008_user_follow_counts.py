@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:20
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_follow_counts(apps, schema_editor):
+    User = apps.get_model("network", "User")
+    Follow = User.following.through
+
+    def follow_count(user_field):
+        follows = (
+            Follow.objects.filter(**{user_field: OuterRef("id")})
+            .values(user_field)
+            .annotate(total=Count("id"))
+            .values("total")
+        )
+        return Coalesce(Subquery(follows), 0)
+
+    User.objects.update(
+        following_count=follow_count("from_user_id"),
+        followers_count=follow_count("to_user_id"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0007_timeline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_follow_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,90 @@
+from django.db import migrations
+
+# Posts are stored at rowid "id * 2" and comments at "id * 2 + 1", so the
+# triggers update and delete rows by rowid.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE network_search USING fts5(
+        text,
+        post_id UNINDEXED,
+        tokenize = 'porter unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER network_search_post_insert AFTER INSERT ON network_post BEGIN
+        INSERT INTO network_search (rowid, text, post_id)
+        VALUES (new.id * 2, new.text, new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER network_search_post_update AFTER UPDATE OF text ON network_post
+    BEGIN
+        UPDATE network_search SET text = new.text WHERE rowid = new.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER network_search_post_delete AFTER DELETE ON network_post BEGIN
+        DELETE FROM network_search WHERE rowid = old.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER network_search_comment_insert AFTER INSERT ON network_comment
+    BEGIN
+        INSERT INTO network_search (rowid, text, post_id)
+        VALUES (new.id * 2 + 1, new.text, new.post_id);
+    END
+    """,
+    """
+    CREATE TRIGGER network_search_comment_update
+    AFTER UPDATE OF text, post_id ON network_comment BEGIN
+        UPDATE network_search SET text = new.text, post_id = new.post_id
+        WHERE rowid = new.id * 2 + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER network_search_comment_delete AFTER DELETE ON network_comment
+    BEGIN
+        DELETE FROM network_search WHERE rowid = old.id * 2 + 1;
+    END
+    """,
+    """
+    INSERT INTO network_search (rowid, text, post_id)
+    SELECT id * 2, text, id FROM network_post
+    """,
+    """
+    INSERT INTO network_search (rowid, text, post_id)
+    SELECT id * 2 + 1, text, post_id FROM network_comment
+    """,
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS network_search_post_insert",
+    "DROP TRIGGER IF EXISTS network_search_post_update",
+    "DROP TRIGGER IF EXISTS network_search_post_delete",
+    "DROP TRIGGER IF EXISTS network_search_comment_insert",
+    "DROP TRIGGER IF EXISTS network_search_comment_update",
+    "DROP TRIGGER IF EXISTS network_search_comment_delete",
+    "DROP TABLE IF EXISTS network_search",
+]
+
+
+def run_sql(statements):
+    def run(apps, schema_editor):
+        # FTS5 is specific to SQLite
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("network", "0009_user_photo_variants"),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sql(CREATE_SQL), run_sql(DROP_SQL)),
+    ]
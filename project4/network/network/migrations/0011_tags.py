@@ -0,0 +1,133 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:35
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from network.tags import extract_hashtags, extract_mentions
+
+
+def index_tags(apps, schema_editor):
+    User = apps.get_model("network", "User")
+    Post = apps.get_model("network", "Post")
+    Comment = apps.get_model("network", "Comment")
+    Hashtag = apps.get_model("network", "Hashtag")
+    Mention = apps.get_model("network", "Mention")
+
+    user_ids = dict(User.objects.values_list("username", "id"))
+    hashtags, mentions = [], []
+
+    def index(post_id, comment_id, text):
+        for name in extract_hashtags(text):
+            hashtags.append(Hashtag(name=name, post_id=post_id, comment_id=comment_id))
+        for username in extract_mentions(text):
+            if username in user_ids:
+                mentions.append(
+                    Mention(
+                        user_id=user_ids[username], post_id=post_id, comment_id=comment_id
+                    )
+                )
+
+    for post_id, text in Post.objects.values_list("id", "text").iterator():
+        index(post_id, None, text)
+    for comment_id, post_id, text in Comment.objects.values_list(
+        "id", "post_id", "text"
+    ).iterator():
+        index(post_id, comment_id, text)
+
+    Hashtag.objects.bulk_create(hashtags, batch_size=1000)
+    Mention.objects.bulk_create(mentions, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("network", "0010_search"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Mention",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "comment",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="network.comment",
+                    ),
+                ),
+                (
+                    "post",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="mentions",
+                        to="network.post",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="mentions",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["user", "post"], name="mention_user_post_idx")
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="Hashtag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=64)),
+                (
+                    "comment",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="network.comment",
+                    ),
+                ),
+                (
+                    "post",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="hashtags",
+                        to="network.post",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["name", "post"], name="hashtag_name_post_idx")
+                ],
+            },
+        ),
+        migrations.RunPython(index_tags, migrations.RunPython.noop),
+    ]
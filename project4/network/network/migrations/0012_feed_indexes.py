@@ -0,0 +1,92 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Single column foreign key indexes made redundant by a composite index
+# starting with the same column. Altering db_index would have SQLite remake
+# the post and comment tables, dropping the search triggers of 0010_search,
+# so the indexes are dropped directly.
+REDUNDANT_INDEXES = [
+    ("network_post_user_id_71f03c1e", "network_post", "user_id"),
+    ("network_comment_post_id_ac255610", "network_comment", "post_id"),
+    ("network_post_liked_by_user_id_752d241c", "network_post_liked_by", "user_id"),
+    (
+        "network_user_following_to_user_id_b3ac1028",
+        "network_user_following",
+        "to_user_id",
+    ),
+]
+
+# The auto-created through tables can't declare Meta.indexes. Their unique
+# index covers lookups by post and by follower, these ones cover the reverse
+# direction (posts liked by a user, followers of a user) without reading rows.
+REVERSE_INDEXES = [
+    ("post_liked_by_user_post_idx", "network_post_liked_by", "user_id, post_id"),
+    ("user_following_to_from_idx", "network_user_following", "to_user_id, from_user_id"),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("network", "0011_tags"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["post", "-publication_date"], name="comment_post_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(fields=["-publication_date", "-id"], name="post_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["user", "-publication_date", "-id"], name="post_user_date_idx"
+            ),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name="comment",
+                    name="post",
+                    field=models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="comments",
+                        to="network.post",
+                    ),
+                ),
+                migrations.AlterField(
+                    model_name="post",
+                    name="user",
+                    field=models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="posts",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+    ]
+    operations += [
+        migrations.RunSQL(
+            f'CREATE INDEX "{name}" ON "{table}" ({columns})',
+            f'DROP INDEX "{name}"',
+        )
+        for name, table, columns in REVERSE_INDEXES
+    ]
+    operations += [
+        migrations.RunSQL(
+            f'DROP INDEX IF EXISTS "{name}"',
+            f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ("{column}")',
+        )
+        for name, table, column in REDUNDANT_INDEXES
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("network", "0013_suggestions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="timeline_complete_since",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
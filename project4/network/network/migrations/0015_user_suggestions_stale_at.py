@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("network", "0014_timeline_complete_since"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="suggestions_stale_at",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -5,19 +5,19 @@ from typing import TYPE_CHECKING
 from django.contrib.auth.models import UserManager
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
 from django.db.models import (
-    Case,
     Count,
-    Exists,
+    F,
     OuterRef,
-    Prefetch,
+    Q,
     QuerySet,
-    Value,
-    When,
+    Subquery,
 )
+from django.db.models.functions import Coalesce
 from django.forms import ValidationError
 
+from . import events, graph
 from .utility import FileValidator, upload_path
 
 file_validator = FileValidator(max_size=2.5, content_types=("image/jpeg", "image/png"))
@@ -25,72 +25,341 @@ file_validator = FileValidator(max_size=2.5, content_types=("image/jpeg", "image
 if TYPE_CHECKING:
     from django.db.models.manager import RelatedManager
 
+    from .timeline import FollowingFeed
+
 # region Managers
 
 
 class CustomUserManager(UserManager):
-    def fetch_profile(self, request_user: User, username: str):
-        # select_related() only works with foreign key and one-to-one
-        # fields
-        is_owner = Case(When(user__id=request_user.id, then=True), default=False)
-        is_following = Exists(request_user.following.filter(id=OuterRef("user__id")))
-        liked_by_user = Exists(request_user.liked_posts.filter(id=OuterRef("id")))
-
-        return self.prefetch_related(
-            Prefetch(
-                "posts",
-                queryset=Post.objects.select_related()
-                .prefetch_related(
-                    Prefetch(
-                        "comments",
-                        queryset=Comment.objects.select_related().filter(reply=False),
-                    ),  # filter related "comments" inside the post QuerySet
-                )
-                .order_by("-publication_date")
-                .annotate(is_following=is_following)
-                .annotate(is_owner=is_owner)
-                .annotate(likes=Count("liked_by"))
-                .annotate(liked_by_user=liked_by_user),
+    def fetch_profile(self, username: str):
+        # Posts are paginated separately with Post.objects.fetch_user_posts,
+        # so only the page being shown is loaded
+        return self.get(username=username)
+
+    def is_following(self, follower: User, followed: User) -> bool:
+        """
+        Answered by the in-process follow graph when it's loaded, otherwise a
+        single lookup on the (from_user, to_user) unique index of the follow
+        table, instead of loading the whole following list.
+        """
+        follow_graph = graph.current()
+        if follow_graph is not None:
+            return follow_graph.is_following(follower.id, followed.id)
+        return self._follow(follower, followed).exists()
+
+    async def ais_following(self, follower: User, followed: User) -> bool:
+        follow_graph = graph.current()
+        if follow_graph is not None:
+            return follow_graph.is_following(follower.id, followed.id)
+        return await self._follow(follower, followed).aexists()
+
+    def has_follow(self, follower: User, followed: User) -> bool:
+        """
+        Like is_following, but always read from the follow table. For writes,
+        which can't trust an in-process graph lagging behind other processes.
+        """
+        return self._follow(follower, followed).exists()
+
+    async def ahas_follow(self, follower: User, followed: User) -> bool:
+        return await self._follow(follower, followed).aexists()
+
+    def followed_among(self, follower: User, user_ids: set[int]) -> set[int]:
+        """
+        Ids among "user_ids" that "follower" follows.
+        """
+        follow_graph = graph.current()
+        if follow_graph is not None:
+            return follow_graph.followed_among(follower.id, user_ids)
+        return set(self._followed_among(follower, user_ids))
+
+    async def afollowed_among(self, follower: User, user_ids: set[int]) -> set[int]:
+        follow_graph = graph.current()
+        if follow_graph is not None:
+            return follow_graph.followed_among(follower.id, user_ids)
+        return {user_id async for user_id in self._followed_among(follower, user_ids)}
+
+    def _followed_among(self, follower: User, user_ids: set[int]):
+        return User.following.through.objects.filter(
+            from_user_id=follower.id, to_user_id__in=user_ids
+        ).values_list("to_user_id", flat=True)
+
+    def _follow(self, follower: User, followed: User):
+        return User.following.through.objects.filter(
+            from_user_id=follower.id, to_user_id=followed.id
+        )
+
+    def update_follow_counts(self, user: User, other_ids, reverse: bool, delta: int):
+        """
+        Apply "delta" to the stored counters after "user" followed (or
+        unfollowed) every user in "other_ids", or after they followed "user"
+        when the change was made through the reverse "followers" side.
+        """
+        user_field, other_field = "following_count", "followers_count"
+        if reverse:
+            user_field, other_field = other_field, user_field
+
+        self.filter(id=user.id).update(
+            **{user_field: F(user_field) + delta * len(other_ids)}
+        )
+        self.filter(id__in=other_ids).update(**{other_field: F(other_field) + delta})
+
+    def _follow_count(self, user_field: str):
+        follows = (
+            User.following.through.objects.filter(**{user_field: OuterRef("id")})
+            .values(user_field)
+            .annotate(total=Count("id"))
+            .values("total")
+        )
+        return Coalesce(Subquery(follows), 0)
+
+    def reconcile_follow_counts(self) -> int:
+        """
+        Recompute following_count and followers_count from the follow table for
+        every user whose stored values drifted. Return the number of fixed users.
+        """
+        # One subquery per side, joining both M2M sides at once would build
+        # the cross product of followers and followed users
+        drifted = (
+            self.annotate(
+                actual_following=self._follow_count("from_user_id"),
+                actual_followers=self._follow_count("to_user_id"),
+            )
+            .exclude(
+                following_count=F("actual_following"),
+                followers_count=F("actual_followers"),
             )
-        ).get(username=username)
+            .values_list("id", "actual_following", "actual_followers")
+        )
+
+        fixed = 0
+        with transaction.atomic():
+            for user_id, following, followers in drifted:
+                self.filter(id=user_id).update(
+                    following_count=following, followers_count=followers
+                )
+                fixed += 1
+
+        return fixed
 
 
 class PostManager(models.Manager):
-    def request_data(self, request_user):
-        liked_by_user = Value(False)
-        is_following = Value(False)
-        is_owner = Case(When(user__id=request_user.id, then=True), default=False)
+    def fetch_all_posts(self) -> QuerySet[Post]:
+        # Comments are attached per page by Comment.objects.attach_trees and
+        # viewer flags by Post.objects.attach_viewer_state
+        return self.select_related().order_by("-publication_date")
 
-        if request_user.is_authenticated:
-            # Check if the user has liked the post in each row of the query
-            liked_by_user = Exists(request_user.liked_posts.filter(id=OuterRef("id")))
-            is_following = Exists(request_user.following.filter(id=OuterRef("user__id")))
+    def fetch_user_posts(self, user: User) -> QuerySet[Post]:
+        return self.fetch_all_posts().filter(user=user)
 
-        return is_owner, liked_by_user, is_following
+    def fetch_following_posts(self, request_user: User) -> FollowingFeed:
+        # Posts are pushed to followers' timelines when published, except
+        # those from celebrity accounts, which are pulled at read time. Pages
+        # merge both, see timeline.py
+        from .timeline import FollowingFeed
 
-    def fetch_all_posts(self, request_user) -> QuerySet[Post]:
-        is_owner, liked_by_user, is_following = self.request_data(request_user)
+        return FollowingFeed(request_user)
 
-        return (
-            self.select_related()
-            .prefetch_related(
-                Prefetch(
-                    "comments",
-                    queryset=Comment.objects.select_related().filter(reply=False),
-                ),  # filter related "comments" inside the post QuerySet
+    def fetch_tag_posts(self, name: str) -> QuerySet[Post]:
+        tagged = Hashtag.objects.filter(name=name.lower()).values("post_id")
+        return self.fetch_all_posts().filter(id__in=tagged)
+
+    def fetch_mention_posts(self, user: User) -> QuerySet[Post]:
+        mentioned = Mention.objects.filter(user=user).values("post_id")
+        return self.fetch_all_posts().filter(id__in=mentioned)
+
+    def attach_viewer_state(self, posts: list[Post], request_user) -> list[Post]:
+        """
+        Set the "is_owner", "liked_by_user" and "is_following" flags of "posts"
+        for the requesting user.
+
+        Instead of a correlated subquery per row, the user's likes among the
+        page posts and follows among their authors are loaded in two set
+        lookups.
+        """
+        liked_ids: set[int] = set()
+        followed_ids: set[int] = set()
+
+        if request_user.is_authenticated and posts:
+            liked_ids = set(self._viewer_likes(posts, request_user))
+            followed_ids = User.objects.followed_among(
+                request_user, {post.user_id for post in posts}
+            )
+
+        return self._set_viewer_state(posts, request_user, liked_ids, followed_ids)
+
+    async def aattach_viewer_state(self, posts: list[Post], request_user) -> list[Post]:
+        liked_ids: set[int] = set()
+        followed_ids: set[int] = set()
+
+        if request_user.is_authenticated and posts:
+            liked = self._viewer_likes(posts, request_user)
+            liked_ids = {post_id async for post_id in liked}
+            followed_ids = await User.objects.afollowed_among(
+                request_user, {post.user_id for post in posts}
             )
-            .order_by("-publication_date")
-            .annotate(is_following=is_following)
-            .annotate(is_owner=is_owner)
-            .annotate(likes=Count("liked_by"))
-            .annotate(liked_by_user=liked_by_user)
+
+        return self._set_viewer_state(posts, request_user, liked_ids, followed_ids)
+
+    def _viewer_likes(self, posts: list[Post], request_user):
+        return Post.liked_by.through.objects.filter(
+            user_id=request_user.id, post_id__in=[post.id for post in posts]
+        ).values_list("post_id", flat=True)
+
+    def _set_viewer_state(self, posts, request_user, liked_ids, followed_ids):
+        for post in posts:
+            post.is_owner = post.user_id == request_user.id
+            post.liked_by_user = post.id in liked_ids
+            post.is_following = post.user_id in followed_ids
+
+        return posts
+
+    def toggle_like(self, post: Post, user: User) -> bool:
+        """
+        Like or unlike "post" on behalf of "user" and return whether the post is
+        now liked.
+
+        The stored like_count is updated with F() expressions in the same
+        transaction as the liked_by row, so concurrent toggles don't lose
+        updates.
+        """
+        through = Post.liked_by.through
+
+        with transaction.atomic():
+            deleted, _ = through.objects.filter(post_id=post.id, user_id=user.id).delete()
+            if deleted:
+                self.filter(id=post.id).update(like_count=F("like_count") - 1)
+                liked = False
+            else:
+                through.objects.create(post_id=post.id, user_id=user.id)
+                self.filter(id=post.id).update(like_count=F("like_count") + 1)
+                liked = True
+
+        post.refresh_from_db(fields=["like_count"])
+        events.publish("likes", id=post.id, likes=post.like_count)
+        return liked
+
+    def set_likes(self, user: User, like_ids: set[int], unlike_ids: set[int]) -> set[int]:
+        """
+        Like the posts in "like_ids" and unlike the ones in "unlike_ids" on
+        behalf of "user", with one insert and one delete on the liked_by table.
+        Return the ids of the posts whose state changed.
+
+        like_count is recomputed from the liked_by table for the changed posts
+        only, in a single UPDATE.
+        """
+        through = Post.liked_by.through
+
+        with transaction.atomic():
+            existing = set(
+                through.objects.filter(
+                    user_id=user.id, post_id__in=like_ids | unlike_ids
+                ).values_list("post_id", flat=True)
+            )
+            added = like_ids - existing
+            removed = unlike_ids & existing
+
+            through.objects.bulk_create(
+                [through(post_id=post_id, user_id=user.id) for post_id in added],
+                ignore_conflicts=True,
+            )
+            through.objects.filter(user_id=user.id, post_id__in=removed).delete()
+
+            changed = added | removed
+            if changed:
+                self.filter(id__in=changed).update(like_count=self._like_count())
+                for post_id, likes in self.filter(id__in=changed).values_list(
+                    "id", "like_count"
+                ):
+                    events.publish("likes", id=post_id, likes=likes)
+
+        return changed
+
+    def _like_count(self):
+        likes = (
+            Post.liked_by.through.objects.filter(post_id=OuterRef("id"))
+            .values("post_id")
+            .annotate(total=Count("id"))
+            .values("total")
+        )
+        return Coalesce(Subquery(likes), 0)
+
+    def reconcile_like_counts(self) -> int:
+        """
+        Recompute like_count from the liked_by table for every post whose stored
+        value drifted. Return the number of fixed posts.
+        """
+        drifted = self.annotate(actual_likes=Count("liked_by")).exclude(
+            like_count=F("actual_likes")
         )
 
-    def fetch_following_posts(self, request_user: User) -> QuerySet[Post]:
-        return self.fetch_all_posts(request_user).filter(
-            user__in=request_user.following.all()
+        fixed = 0
+        with transaction.atomic():
+            for post_id, actual_likes in drifted.values_list("id", "actual_likes"):
+                self.filter(id=post_id).update(like_count=actual_likes)
+                fixed += 1
+
+        return fixed
+
+
+class CommentManager(models.Manager):
+    def attach_trees(self, posts: list[Post]) -> list[Post]:
+        """
+        Load every comment of "posts" in a single query and build the reply
+        trees in memory.
+
+        Top-level comments are stored as the prefetched "comments" of each
+        post and replies as the prefetched "replies" of their parent, so
+        serializing the posts doesn't issue any further query, no matter how
+        deep the threads go.
+        """
+        if not posts:
+            return posts
+
+        return self._build_trees(posts, list(self._posts_comments(posts)))
+
+    async def aattach_trees(self, posts: list[Post]) -> list[Post]:
+        if not posts:
+            return posts
+
+        comments = [comment async for comment in self._posts_comments(posts)]
+        return self._build_trees(posts, comments)
+
+    def _posts_comments(self, posts: list[Post]) -> QuerySet[Comment]:
+        # Read in comment_post_date_idx order, which spares a sort of the
+        # whole result
+        return (
+            self.select_related("user")
+            .filter(post_id__in=[post.id for post in posts])
+            .order_by("post_id", "-publication_date")
         )
 
+    def _build_trees(self, posts: list[Post], comments: list[Comment]) -> list[Post]:
+        top_level: dict[int, list[Comment]] = {post.id: [] for post in posts}
+        replies: dict[int, list[Comment]] = {comment.id: [] for comment in comments}
+
+        # Comments come newest first within each post, which is kept in each list
+        for comment in comments:
+            if comment.parent_comment_id is None:
+                top_level[comment.post_id].append(comment)
+            elif comment.parent_comment_id in replies:
+                replies[comment.parent_comment_id].append(comment)
+
+        for comment in comments:
+            cache = comment.__dict__.setdefault("_prefetched_objects_cache", {})
+            cache["replies"] = replies[comment.id]
+
+        for post in posts:
+            cache = post.__dict__.setdefault("_prefetched_objects_cache", {})
+            cache["comments"] = top_level[post.id]
+
+        return posts
+
+
+class SuggestionManager(models.Manager):
+    def fetch_suggestions(self, user: User) -> QuerySet[Suggestion]:
+        # A range of suggestion_user_rank_idx, joined with the suggested users
+        return self.filter(user=user).select_related("suggested").order_by("rank")
+
 
 # endregion
 
@@ -111,10 +380,25 @@ class User(AbstractUser):
         upload_to=upload_path,
         validators=[file_validator],
     )
+    # Paths of the resized photos by size and extension, see images.py
+    photo_variants = models.JSONField(default=dict, blank=True)
 
     following = models.ManyToManyField(
         "self", related_name="followers", symmetrical=False
     )
+    # Accounts with too many followers don't fan out their posts, see timeline.py
+    celebrity = models.BooleanField(default=False)
+    # Denormalized follow counts, maintained by the m2m_changed handlers in
+    # signals.py
+    following_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    # Set when a follow backfill was capped at NETWORK_TIMELINE_BACKFILL posts:
+    # followed posts up to this date may be missing from the timeline, so
+    # they are pulled at read time. Null when the timeline is complete.
+    timeline_complete_since = models.DateTimeField(null=True, blank=True)
+    # Date of the latest follow change not reflected in the user's suggestions
+    # yet, see suggestions.py. Null when they are current.
+    suggestions_stale_at = models.DateTimeField(null=True, blank=True, db_index=True)
 
     objects: CustomUserManager = CustomUserManager()
 
@@ -139,8 +423,12 @@ class Post(models.Model):
     user_id: int
     comments: RelatedManager[Comment]
 
+    # Indexed by post_user_date_idx
     user = models.ForeignKey(
-        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="posts"
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="posts",
+        db_index=False,
     )
     text = models.CharField(max_length=200)
     publication_date = models.DateTimeField(auto_now_add=True)
@@ -149,6 +437,8 @@ class Post(models.Model):
     liked_by = models.ManyToManyField(
         settings.AUTH_USER_MODEL, related_name="liked_posts", blank=True
     )
+    # Denormalized liked_by count, maintained by PostManager.toggle_like
+    like_count = models.PositiveIntegerField(default=0)
 
     # Related Fields
     # comments = ManyToOne("Comment", related_name="post")
@@ -157,6 +447,13 @@ class Post(models.Model):
 
     class Meta:
         ordering = ["-publication_date"]
+        # Feed pages are read by date, "id" breaking ties for cursor pagination
+        indexes = [
+            models.Index(fields=["-publication_date", "-id"], name="post_date_idx"),
+            models.Index(
+                fields=["user", "-publication_date", "-id"], name="post_user_date_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.text}"
@@ -169,7 +466,10 @@ class Comment(models.Model):
     parent_comment_id: int
     replies: RelatedManager[Comment]
 
-    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="comments")
+    # Indexed by comment_post_date_idx
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="comments", db_index=False
+    )
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="comments"
     )
@@ -180,8 +480,15 @@ class Comment(models.Model):
         "self", on_delete=models.CASCADE, null=True, blank=True, related_name="replies"
     )
 
+    objects: CommentManager = CommentManager()
+
     class Meta:
         ordering = ["-publication_date"]
+        indexes = [
+            models.Index(
+                fields=["post", "-publication_date"], name="comment_post_date_idx"
+            )
+        ]
 
     def save(self, *args, **kwargs):
         self.full_clean()
@@ -195,4 +502,121 @@ class Comment(models.Model):
         return f"{self.text} - reply: {self.reply}"  # type: ignore
 
 
+class TimelineEntry(models.Model):
+    """
+    A post materialized in a follower's home timeline (fan-out on write).
+    """
+
+    user_id: int
+    post_id: int
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="timeline"
+    )
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="+")
+    # Copied from the post, so the timeline can be range read by date
+    publication_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ["-publication_date"]
+        constraints = [
+            models.UniqueConstraint(fields=["user", "post"], name="unique_timeline_entry")
+        ]
+        # Timeline pages are read by date, "post" breaking ties for cursor
+        # pagination
+        indexes = [
+            models.Index(
+                fields=["user", "-publication_date", "-post"],
+                name="timeline_user_date_idx",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.post_id}"
+
+
+class Hashtag(models.Model):
+    """
+    A "#tag" found in a post, or in one of its comments, see tags.py.
+    """
+
+    post_id: int
+    comment_id: int | None
+
+    # Lowercase, without the "#"
+    name = models.CharField(max_length=64)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="hashtags")
+    # Null when the tag is in the post text
+    comment = models.ForeignKey(
+        Comment, on_delete=models.CASCADE, null=True, blank=True, related_name="+"
+    )
+
+    class Meta:
+        indexes = [models.Index(fields=["name", "post"], name="hashtag_name_post_idx")]
+
+    def __str__(self):
+        return f"#{self.name} - {self.post_id}"
+
+
+class Mention(models.Model):
+    """
+    A "@username" of an existing user found in a post, or in one of its
+    comments, see tags.py.
+    """
+
+    user_id: int
+    post_id: int
+    comment_id: int | None
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="mentions"
+    )
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="mentions")
+    # Null when the mention is in the post text
+    comment = models.ForeignKey(
+        Comment, on_delete=models.CASCADE, null=True, blank=True, related_name="+"
+    )
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "post"], name="mention_user_post_idx")]
+
+    def __str__(self):
+        return f"@{self.user_id} - {self.post_id}"
+
+
+class Suggestion(models.Model):
+    """
+    An account suggested to follow, among the NETWORK_SUGGESTIONS_LIMIT best
+    ranked ones of "user", see suggestions.py.
+    """
+
+    user_id: int
+    suggested_id: int
+
+    # Indexed by suggestion_user_rank_idx
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="suggestions",
+        db_index=False,
+    )
+    suggested = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+"
+    )
+    # 0 for the best suggestion
+    rank = models.PositiveSmallIntegerField()
+    # Accounts followed by "user" that follow "suggested"
+    mutuals = models.PositiveIntegerField()
+    score = models.FloatField()
+
+    objects: SuggestionManager = SuggestionManager()
+
+    class Meta:
+        ordering = ["user", "rank"]
+        indexes = [models.Index(fields=["user", "rank"], name="suggestion_user_rank_idx")]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.suggested_id}"
+
+
 # endregion
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+import orjson
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db.models import Q, QuerySet
+
+from .models import Comment, Post
+
+if TYPE_CHECKING:
+    from .timeline import FollowingFeed
+
+POSTS_PER_PAGE = 10
+
+
+class InvalidCursor(ValueError):
+    """
+    Raised when a client sends a cursor that was not generated by encode_cursor.
+    """
+
+
+def encode_cursor(post: Post) -> str:
+    """
+    Build an opaque cursor pointing right after "post" in the feed ordering.
+
+    The cursor is the "(publication_date, id)" pair of the last post of a
+    page, so the next page can be fetched with an indexed range filter
+    instead of an OFFSET scan.
+    """
+    payload = orjson.dumps([post.publication_date.isoformat(), post.id])
+    return urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        # Restore the padding stripped by encode_cursor
+        payload = urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        date, post_id = orjson.loads(payload)
+        return datetime.fromisoformat(date), int(post_id)
+    except (Base64Error, orjson.JSONDecodeError, TypeError, ValueError) as error:
+        raise InvalidCursor("Invalid cursor.") from error
+
+
+def prepare_posts(posts: list[Post], request_user) -> list[Post]:
+    """
+    Attach the comment trees and the requesting user's flags to a page of posts.
+    """
+    Comment.objects.attach_trees(posts)
+    return Post.objects.attach_viewer_state(posts, request_user)
+
+
+async def aprepare_posts(posts: list[Post], request_user) -> list[Post]:
+    await Comment.objects.aattach_trees(posts)
+    return await Post.objects.aattach_viewer_state(posts, request_user)
+
+
+def posts_pager(
+    posts: QuerySet[Post] | FollowingFeed | list[Post], page: int, request_user
+):
+    p = Paginator(posts, POSTS_PER_PAGE)
+
+    p_page = p.get_page(page)
+
+    # Cast "QuerySet" to "list" to be parsed by Pydantic Model
+    posts_list = prepare_posts(list(p_page.object_list), request_user)
+    return page_data(p, p_page, posts_list)
+
+
+async def aposts_pager(posts: QuerySet[Post], page: int, request_user):
+    p = Paginator(posts, POSTS_PER_PAGE)
+    # Paginator counts synchronously, so prime its cached count
+    p.__dict__["count"] = await posts.acount()
+
+    p_page = p.get_page(page)
+
+    posts_list = [post async for post in p_page.object_list]
+    posts_list = await aprepare_posts(posts_list, request_user)
+    return page_data(p, p_page, posts_list)
+
+
+def page_data(p: Paginator, p_page: Page, posts_list: list[Post]):
+    try:
+        next_page = p_page.next_page_number()
+    except InvalidPage:
+        next_page = None
+
+    try:
+        previous_page = p_page.previous_page_number()
+    except InvalidPage:
+        previous_page = None
+
+    return {
+        "numPages": p.num_pages,
+        "nextPage": next_page,
+        "previousPage": previous_page,
+        "posts": posts_list,
+    }
+
+
+def posts_cursor_pager(
+    posts: QuerySet[Post] | FollowingFeed, request_user, cursor: str | None = None
+):
+    """
+    Keyset pagination over "(publication_date, id)".
+
+    No COUNT query is issued and every page costs the same as the first
+    one, since the database only reads POSTS_PER_PAGE + 1 rows after the
+    cursor position.
+    """
+    # Fetch one extra row to know if there is a next page
+    page = list(cursor_page_query(posts, cursor))
+    page, next_cursor = split_cursor_page(page)
+
+    return {"nextCursor": next_cursor, "posts": prepare_posts(page, request_user)}
+
+
+async def aposts_cursor_pager(
+    posts: QuerySet[Post], request_user, cursor: str | None = None
+):
+    page = [post async for post in cursor_page_query(posts, cursor)]
+    page, next_cursor = split_cursor_page(page)
+
+    return {
+        "nextCursor": next_cursor,
+        "posts": await aprepare_posts(page, request_user),
+    }
+
+
+def cursor_page_query(posts: QuerySet[Post] | FollowingFeed, cursor: str | None):
+    key = decode_cursor(cursor) if cursor else None
+    if not isinstance(posts, QuerySet):
+        # Merged from several index reads, already in feed order
+        return posts.after(key)[: POSTS_PER_PAGE + 1]
+
+    posts = posts.order_by("-publication_date", "-id")
+    if key:
+        date, post_id = key
+        posts = posts.filter(
+            Q(publication_date__lt=date) | Q(publication_date=date, id__lt=post_id)
+        )
+
+    return posts[: POSTS_PER_PAGE + 1]
+
+
+def split_cursor_page(page: list[Post]) -> tuple[list[Post], str | None]:
+    if len(page) > POSTS_PER_PAGE:
+        page = page[:POSTS_PER_PAGE]
+        return page, encode_cursor(page[-1])
+
+    return page, None
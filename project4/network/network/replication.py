@@ -0,0 +1,42 @@
+"""
+Replication stand-in for local SQLite read replicas, see
+project4/settings_replicas.py.
+
+Each replica file is overwritten with a consistent snapshot of the primary
+through SQLite's online backup API. "manage.py replicate --interval" repeats
+it, so replicas lag behind the primary like asynchronous replicas do.
+"""
+import sqlite3
+
+from django.db import connections
+
+from .routers import read_replicas
+
+
+def replicate(replicas: list[str] | None = None) -> list[str]:
+    """
+    Copy the primary database into "replicas", by default every
+    NETWORK_READ_REPLICAS alias. Return the copied aliases.
+    """
+    if replicas is None:
+        replicas = read_replicas()
+
+    primary = connections["default"]
+    if primary.in_atomic_block:
+        # SQLite can't back up a connection while it writes, and Python
+        # retries forever
+        raise ValueError("Can't replicate from inside a transaction.")
+    primary.ensure_connection()
+    for alias in replicas:
+        replica = connections[alias]
+        if primary.vendor != "sqlite" or replica.vendor != "sqlite":
+            raise ValueError("The replication stand-in only copies SQLite databases.")
+
+        target = sqlite3.connect(replica.settings_dict["NAME"])
+        try:
+            # A single step, read from one snapshot of the primary
+            primary.connection.backup(target)
+        finally:
+            target.close()
+
+    return replicas
@@ -0,0 +1,118 @@
+"""
+Read replica routing.
+
+The read-only feed operations decorated with @replica_reads query one of the
+NETWORK_READ_REPLICAS aliases, every other query and all writes go to the
+primary ("default"). Sessions and other contrib apps always stay on the
+primary, so logins don't depend on replication.
+
+Replicas lag behind the primary. When a request writes, middleware.replica_pinning
+sets a cookie that pins the client to the primary for
+NETWORK_REPLICA_PIN_SECONDS, so it reads its own writes. Pages stored in the
+anonymous feed cache are rendered from the primary too (see primary_reads),
+or a lagging replica would be cached under the generation a write just bumped.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.http import HttpRequest
+
+PIN_COOKIE = "network_primary"
+
+# Replica serving the reads of the current operation, None for the primary
+read_alias: ContextVar[str | None] = ContextVar("read_alias", default=None)
+# Set by the router when the current request writes, None outside of requests
+request_writes: ContextVar[list[bool] | None] = ContextVar("request_writes", default=None)
+
+
+def read_replicas() -> list[str]:
+    return getattr(settings, "NETWORK_READ_REPLICAS", [])
+
+
+def pin_seconds() -> int:
+    return getattr(settings, "NETWORK_REPLICA_PIN_SECONDS", 5)
+
+
+def is_pinned(request: HttpRequest) -> bool:
+    try:
+        return float(request.COOKIES[PIN_COOKIE]) > time.time()
+    except (KeyError, ValueError):
+        return False
+
+
+def choose_replica(request: HttpRequest) -> str | None:
+    replicas = read_replicas()
+    if not replicas or is_pinned(request):
+        return None
+    return random.choice(replicas)
+
+
+def replica_reads(view):
+    """
+    Run the queries of a sync or async API operation on a read replica,
+    unless the client is pinned to the primary.
+    """
+    if iscoroutinefunction(view):
+
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            token = read_alias.set(choose_replica(request))
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                read_alias.reset(token)
+
+    else:
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            token = read_alias.set(choose_replica(request))
+            try:
+                return view(request, *args, **kwargs)
+            finally:
+                read_alias.reset(token)
+
+    return wrapper
+
+
+@contextmanager
+def primary_reads():
+    """
+    Read from the primary within the block, even in a @replica_reads operation.
+    """
+    token = read_alias.set(None)
+    try:
+        yield
+    finally:
+        read_alias.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == "network":
+            return read_alias.get()
+        return None
+
+    def db_for_write(self, model, **hints):
+        writes = request_writes.get()
+        if writes is not None:
+            writes[0] = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {"default", *read_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema through replication
+        if db in read_replicas():
+            return False
+        return None
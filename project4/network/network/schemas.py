@@ -1,12 +1,14 @@
 from __future__ import annotations
 from datetime import datetime
+from typing import Literal
 
 from re import search
 
 # from django.utils import timezone
 from ninja import Field, ModelSchema, Schema
-from pydantic import constr, validator
+from pydantic import conlist, constr, root_validator, validator
 
+from .images import variant_urls
 from .models import Comment, Post, User
 
 
@@ -27,12 +29,14 @@ def must_not_be_html(string):
 
 class UserOut(ModelSchema):
     # "..." means the field is required
-    lastLogin: datetime = Field(..., alias="last_login")
+    # Null for users who never logged in
+    lastLogin: datetime | None = Field(..., alias="last_login")
     dateJoined: datetime = Field(..., alias="date_joined")
-    followingCount: int = Field(..., alias="following.count")
-    followersCount: int = Field(..., alias="followers.count")
+    followingCount: int = Field(..., alias="following_count")
+    followersCount: int = Field(..., alias="followers_count")
     isFollowing: bool = Field(..., alias="is_following")
     postsData: PaginatedPosts = Field(..., alias="posts_data")
+    photoVariants: dict[str, dict[str, str]] = Field(..., alias="photo_variants")
 
     class Config:
         model = User
@@ -43,6 +47,10 @@ class UserOut(ModelSchema):
             "email",
         ]
 
+    @staticmethod
+    def resolve_photo_variants(obj):
+        return variant_urls(obj.photo_variants)
+
 
 class UserProfileIn(Schema):
     username: constr(strip_whitespace=True, min_length=3, max_length=20)  # type: ignore
@@ -51,16 +59,35 @@ class UserProfileIn(Schema):
 
 
 class UserProfileOut(ModelSchema):
+    photoVariants: dict[str, dict[str, str]] = Field(..., alias="photo_variants")
+
     class Config:
         model = User
         model_fields = ["username", "email", "photo", "about"]
 
+    @staticmethod
+    def resolve_photo_variants(obj):
+        return variant_urls(obj.photo_variants)
+
 
 class FollowOut(Schema):
     message: str
     isFollowing: bool = Field(..., alias="is_following")
 
 
+class SuggestionOut(Schema):
+    username: str = Field(..., alias="suggested.username")
+    about: str = Field(..., alias="suggested.about")
+    followersCount: int = Field(..., alias="suggested.followers_count")
+    photoVariants: dict[str, dict[str, str]] = Field(..., alias="photo_variants")
+    # Followed accounts that follow the suggested one
+    mutuals: int
+
+    @staticmethod
+    def resolve_photo_variants(obj):
+        return variant_urls(obj.suggested.photo_variants)
+
+
 # endregion
 
 # ----------
@@ -87,7 +114,7 @@ class PostOut(ModelSchema):
     username: str = Field(..., alias="user.username")
     isFollowing: bool = Field(..., alias="is_following")
     isOwner: bool = Field(..., alias="is_owner")
-    likes: int = Field(..., alias="likes")
+    likes: int = Field(..., alias="like_count")
     likedByUser: bool = Field(False, alias="liked_by_user")
     publicationDate: datetime = Field(..., alias="publication_date")
     lastModified: datetime = Field(..., alias="last_modified")
@@ -107,9 +134,12 @@ class EditedPost(ModelSchema):
 
 
 class PaginatedPosts(Schema):
-    numPages: int
+    # Page number pagination
+    numPages: int | None = None
     previousPage: int | None = None
     nextPage: int | None = None
+    # Cursor pagination
+    nextCursor: str | None = None
     posts: list[PostOut]
 
 
@@ -137,6 +167,48 @@ class CommentOut(ModelSchema):
         model_fields = ["id", "text"]
 
 
+# endregion
+# ----------
+# region Batch
+# ----------
+
+LIKE_ACTIONS = ("like", "unlike")
+FOLLOW_ACTIONS = ("follow", "unfollow")
+
+
+class BatchAction(Schema):
+    type: Literal["like", "unlike", "follow", "unfollow"]
+    post_id: int | None = Field(None, alias="postID")
+    username: str | None = None
+
+    @root_validator(skip_on_failure=True)
+    def has_target(cls, values):
+        if values["type"] in LIKE_ACTIONS and values.get("post_id") is None:
+            raise ValueError(f"postID is required to {values['type']} a post.")
+        if values["type"] in FOLLOW_ACTIONS and not values.get("username"):
+            raise ValueError(f"username is required to {values['type']} a user.")
+        return values
+
+
+class BatchIn(Schema):
+    actions: conlist(BatchAction, min_items=1, max_items=100)  # type: ignore
+
+
+class BatchResult(Schema):
+    type: str
+    postID: int | None = None
+    username: str | None = None
+    ok: bool
+    error: str | None = None
+    likes: int | None = None
+    likedByUser: bool | None = None
+    isFollowing: bool | None = None
+
+
+class BatchOut(Schema):
+    results: list[BatchResult]
+
+
 # endregion
 
 # Self-referencing schemes
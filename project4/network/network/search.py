@@ -0,0 +1,116 @@
+"""
+Full-text search over posts and their comments.
+
+The "network_search" FTS5 table (migration 0010) holds one row per post and
+one per comment, kept in sync by triggers on the post and comment tables, so
+bulk_create and update() calls are indexed as well. A post matches when its
+text or any of its comments match, ranked by the best BM25 score among them.
+"""
+from __future__ import annotations
+
+import re
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
+
+import orjson
+from django.db import connection, transaction
+
+from .models import Post
+from .pagination import POSTS_PER_PAGE, InvalidCursor, prepare_posts
+
+TERM_PATTERN = re.compile(r"\w+")
+
+SEARCH_SQL = """
+    SELECT post_id, MIN(match_rank) AS score
+    FROM (
+        -- The hidden "rank" column is the BM25 score. bm25() itself can't be
+        -- used once the subquery is flattened into the aggregate.
+        SELECT post_id, rank AS match_rank
+        FROM network_search
+        WHERE network_search MATCH %s
+    )
+    GROUP BY post_id
+    {having}
+    ORDER BY score, post_id DESC
+    LIMIT %s
+"""
+
+
+def match_expression(query: str) -> str:
+    """
+    Turn a user query into an FTS5 expression matching posts that contain
+    every term, the last one as a prefix.
+
+    Terms are quoted, so FTS5 operators and syntax in the query are searched
+    as plain words instead of raising errors.
+    """
+    terms = [f'"{term}"' for term in TERM_PATTERN.findall(query)]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+def encode_cursor(score: float, post_id: int) -> str:
+    payload = orjson.dumps([score, post_id])
+    return urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[float, int]:
+    try:
+        payload = urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        score, post_id = orjson.loads(payload)
+        return float(score), int(post_id)
+    except (Base64Error, orjson.JSONDecodeError, TypeError, ValueError) as error:
+        raise InvalidCursor("Invalid cursor.") from error
+
+
+def search_posts(query: str, request_user, cursor: str | None = None):
+    """
+    Return a page of the posts matching "query", best matches first.
+
+    Pages follow the (score, post id) order. Scores depend on the whole
+    index, so a write between two pages can shift results slightly.
+    """
+    expression = match_expression(query)
+    if not expression:
+        return {"nextCursor": None, "posts": []}
+
+    having, params = "", [expression]
+    if cursor:
+        score, post_id = decode_cursor(cursor)
+        having = "HAVING score > %s OR (score = %s AND post_id < %s)"
+        params += [score, score, post_id]
+
+    with connection.cursor() as db:
+        db.execute(SEARCH_SQL.format(having=having), params + [POSTS_PER_PAGE + 1])
+        ranking = db.fetchall()
+
+    next_cursor = None
+    if len(ranking) > POSTS_PER_PAGE:
+        ranking = ranking[:POSTS_PER_PAGE]
+        next_cursor = encode_cursor(ranking[-1][1], ranking[-1][0])
+
+    posts = Post.objects.fetch_all_posts().in_bulk([post_id for post_id, _ in ranking])
+    # Rows of posts deleted since the ranking query are skipped
+    page = [posts[post_id] for post_id, _ in ranking if post_id in posts]
+
+    return {"nextCursor": next_cursor, "posts": prepare_posts(page, request_user)}
+
+
+def rebuild():
+    """
+    Refill the search table from the post and comment tables, then merge its
+    segments. Use after loading data behind Django's back, e.g. restoring a
+    dump taken before the table existed.
+    """
+    with transaction.atomic(), connection.cursor() as db:
+        db.execute("DELETE FROM network_search")
+        db.execute(
+            "INSERT INTO network_search (rowid, text, post_id) "
+            "SELECT id * 2, text, id FROM network_post"
+        )
+        db.execute(
+            "INSERT INTO network_search (rowid, text, post_id) "
+            "SELECT id * 2 + 1, text, post_id FROM network_comment"
+        )
+        db.execute("INSERT INTO network_search (network_search) VALUES ('optimize')")
@@ -0,0 +1,116 @@
+"""
+Schema-free serialization of post pages.
+
+Building the PaginatedPosts, PostOut and CommentOut Pydantic models, with
+their alias lookups through Django templates' Variable, costs more than the
+SQL of a page. Pages are already assembled in memory (comment trees and
+viewer flags, see pagination.prepare_posts), so the functions below read
+them straight into plain dicts for ORJSONRenderer, with the same keys, order
+and values the schemas produce.
+
+NETWORK_SERIALIZATION_CHECK also builds the schema output and raises
+SerializationMismatch when they differ. The test suite enables it for every
+test (network/tests/conftest.py).
+"""
+from __future__ import annotations
+
+import orjson
+from django.conf import settings
+
+from .images import variant_urls
+from .models import Comment, Post, User
+from .schemas import PaginatedPosts, UserOut
+
+
+class SerializationMismatch(AssertionError):
+    """
+    Raised in check mode when the fast path output differs from the schema's.
+    """
+
+
+def fast_serialization() -> bool:
+    return getattr(settings, "NETWORK_FAST_SERIALIZATION", True)
+
+
+def dump_posts_page(data: dict) -> dict:
+    """
+    Serialize a page built by the pagination functions like PaginatedPosts.
+    """
+    page = {
+        "numPages": data.get("numPages"),
+        "previousPage": data.get("previousPage"),
+        "nextPage": data.get("nextPage"),
+        "nextCursor": data.get("nextCursor"),
+        "posts": [dump_post(post) for post in data["posts"]],
+    }
+
+    if getattr(settings, "NETWORK_SERIALIZATION_CHECK", False):
+        check(page, PaginatedPosts.from_orm(data).dict())
+    return page
+
+
+def dump_profile(user: User) -> dict:
+    """
+    Serialize a profile with its "posts_data" page like UserOut.
+    """
+    profile = {
+        "username": user.username,
+        "about": user.about,
+        "photo": user.photo.url if user.photo else None,
+        "email": user.email,
+        "lastLogin": user.last_login,
+        "dateJoined": user.date_joined,
+        "followingCount": user.following_count,
+        "followersCount": user.followers_count,
+        "isFollowing": user.is_following,
+        "postsData": dump_posts_page(user.posts_data),
+        "photoVariants": variant_urls(user.photo_variants),
+    }
+
+    if getattr(settings, "NETWORK_SERIALIZATION_CHECK", False):
+        check(profile, UserOut.from_orm(user).dict())
+    return profile
+
+
+def dump_post(post: Post) -> dict:
+    return {
+        "id": post.id,
+        "text": post.text,
+        "edited": post.edited,
+        "username": post.user.username,
+        "isFollowing": post.is_following,
+        "isOwner": post.is_owner,
+        "likes": post.like_count,
+        "likedByUser": getattr(post, "liked_by_user", False),
+        "publicationDate": post.publication_date,
+        "lastModified": post.last_modified,
+        "comments": [dump_comment(comment) for comment in _related(post, "comments")],
+    }
+
+
+def dump_comment(comment: Comment) -> dict:
+    return {
+        "id": comment.id,
+        "text": comment.text,
+        "username": comment.user.username,
+        "publicationDate": comment.publication_date,
+        "replies": [dump_comment(reply) for reply in _related(comment, "replies")],
+    }
+
+
+def check(fast: dict, expected: dict):
+    # Compare the encoded documents, as True == 1 and 1 == 1.0 in Python
+    if orjson.dumps(fast) != orjson.dumps(expected):
+        raise SerializationMismatch(
+            f"Fast serialization differs from the schema output:\n"
+            f"{orjson.dumps(fast).decode()}\n{orjson.dumps(expected).decode()}"
+        )
+
+
+def _related(obj, name: str) -> list:
+    # Trees attached by Comment.objects.attach_trees, without going through
+    # the related manager
+    prefetched = getattr(obj, "_prefetched_objects_cache", {})
+    if name in prefetched:
+        return prefetched[name]
+    return list(getattr(obj, name).all())
@@ -1,14 +1,143 @@
-from django.db.models.signals import m2m_changed
+from django.core.signals import request_started
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_save
 from django.dispatch import receiver
-from .models import User
+from .models import Comment, Post, TimelineEntry, User
+from . import events, graph, sqlite, suggestions, timeline
+from .tasks import run_in_background
+
+
+@receiver(m2m_changed, sender=User.following.through, dispatch_uid="user_follow_counts")
+def update_follow_counts(sender, instance, action, reverse, pk_set, **kwargs):
+    # Connected first, so counts are updated before block_self_follow removes
+    # a self follow. Signals are sent inside the transaction that changes the
+    # follow table.
+    if action == "post_add":
+        # Only the rows that were actually inserted are in pk_set
+        User.objects.update_follow_counts(instance, pk_set, reverse, 1)
+
+    elif action == "pre_remove":
+        # pk_set holds every requested id, keep only existing follows
+        user_field, other_field = "from_user_id", "to_user_id"
+        if reverse:
+            user_field, other_field = other_field, user_field
+        removed = set(
+            sender.objects.filter(
+                **{user_field: instance.id, f"{other_field}__in": pk_set}
+            ).values_list(other_field, flat=True)
+        )
+        User.objects.update_follow_counts(instance, removed, reverse, -1)
+
+    elif action == "pre_clear":
+        user_field, other_field = "from_user_id", "to_user_id"
+        if reverse:
+            user_field, other_field = other_field, user_field
+        removed = set(
+            sender.objects.filter(**{user_field: instance.id}).values_list(
+                other_field, flat=True
+            )
+        )
+        User.objects.update_follow_counts(instance, removed, reverse, -1)
 
 
 @receiver(
     m2m_changed, sender=User.following.through, dispatch_uid="user_following_changed"
 )
-def block_self_follow(sender, instance, action, **kwargs):
+def block_self_follow(sender, instance, action, pk_set, **kwargs):
+    # Self follows are the same row whichever side they were added from
+    if action == "post_add" and instance.id in pk_set:
+        instance.following.remove(instance)
+
+
+@receiver(m2m_changed, sender=User.following.through, dispatch_uid="user_timeline_sync")
+def sync_timelines(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "post_clear":
+        if reverse:
+            TimelineEntry.objects.filter(post__user=instance).delete()
+        else:
+            TimelineEntry.objects.filter(user=instance).delete()
+        return
+
+    if action not in ("post_add", "post_remove"):
+        return
+
+    # "reverse" means the change was made through the "followers" side
+    pairs = [
+        (pk, instance.id) if reverse else (instance.id, pk)
+        for pk in pk_set
+        if pk != instance.id
+    ]
+
+    if action == "post_add":
+        timeline.follows_added(pairs)
+    else:
+        timeline.follows_removed(pairs)
+
+
+@receiver(m2m_changed, sender=User.following.through, dispatch_uid="user_follow_graph")
+def update_follow_graph(sender, instance, action, reverse, pk_set, **kwargs):
+    if not graph.enabled():
+        return
+
+    if action == "pre_clear":
+        user_field, other_field = "from_user_id", "to_user_id"
+        if reverse:
+            user_field, other_field = other_field, user_field
+        pk_set = set(
+            sender.objects.filter(**{user_field: instance.id}).values_list(
+                other_field, flat=True
+            )
+        )
+    elif action not in ("post_add", "post_remove"):
+        return
+
+    pairs = [(pk, instance.id) if reverse else (instance.id, pk) for pk in pk_set]
+    # Applied once committed, rolled back follows never reach the graph
     if action == "post_add":
-        if instance in instance.following.all():
-            instance.following.remove(instance)
-        if instance in instance.followers.all():
-            instance.followers.remove(instance)
+        transaction.on_commit(lambda: graph.graph.add(pairs))
+    else:
+        transaction.on_commit(lambda: graph.graph.remove(pairs))
+
+
+@receiver(
+    m2m_changed, sender=User.following.through, dispatch_uid="user_suggestions_sync"
+)
+def sync_suggestions(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove"):
+        return
+    changed = pk_set - {instance.id}
+    if not changed:
+        return
+
+    # "reverse" means the change was made through the "followers" side
+    suggestions.follows_changed(list(changed) if reverse else [instance.id])
+
+
+@receiver(post_save, sender=Post, dispatch_uid="post_fan_out")
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        run_in_background(timeline.fan_out_post, instance.id)
+
+
+@receiver(post_save, sender=Post, dispatch_uid="post_created_event")
+def post_created_event(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        events.publish("post", id=instance.id, username=instance.user.username)
+
+
+@receiver(post_save, sender=Comment, dispatch_uid="comment_created_event")
+def comment_created_event(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        events.publish("comment", id=instance.id, postID=instance.post_id)
+
+
+@receiver(request_started, dispatch_uid="follow_graph_warm_up")
+def warm_up_follow_graph(sender, **kwargs):
+    # Loaded on the task pool, the first requests query the follow table
+    graph.current()
+
+
+@receiver(connection_created, dispatch_uid="sqlite_pragmas")
+def tune_sqlite(sender, connection, **kwargs):
+    sqlite.apply_pragmas(connection)
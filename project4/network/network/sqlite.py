@@ -0,0 +1,47 @@
+"""
+SQLite tuning for concurrent requests, applied to every new connection by the
+connection_created receiver in signals.py.
+
+The default rollback journal locks the whole database while a write commits,
+so feed reads wait on every like. In WAL mode readers keep reading the last
+committed state while a single writer appends to the log, and with
+"synchronous = NORMAL" a commit no longer waits for an fsync (the log is
+synced at checkpoints instead, a crash only loses the latest transactions).
+"busy_timeout" makes a transaction that starts by writing wait for the lock
+instead of failing with "database is locked". It doesn't help one that reads
+first, like m2m add() and remove(): Django's transactions are deferred, and
+SQLite fails a reader that tries to write while another connection writes
+right away, as waiting could deadlock. Keep such writes off background threads
+(see the follow operation of "manage.py benchmark_sqlite"). Together with
+CONN_MAX_AGE, connections and their page cache are kept across requests.
+
+WAL mode is persistent, it's written to the database file by the first
+connection that asks for it. The default settings leave it out, so running
+"manage.py" doesn't rewrite the committed db.sqlite3, and
+project4/settings_production.py adds it.
+"""
+from django.conf import settings
+from django.db.backends.base.base import BaseDatabaseWrapper
+
+
+def sqlite_pragmas() -> dict:
+    return getattr(settings, "NETWORK_SQLITE_PRAGMAS", {})
+
+
+def apply_pragmas(connection: BaseDatabaseWrapper, pragmas: dict | None = None):
+    if connection.vendor != "sqlite":
+        return
+
+    if pragmas is None:
+        pragmas = sqlite_pragmas()
+    # On the raw connection, so they aren't logged or counted as request queries
+    for name, value in pragmas.items():
+        connection.connection.execute(f"PRAGMA {name} = {value}")
+
+
+def read_pragmas(connection: BaseDatabaseWrapper, names) -> dict:
+    connection.ensure_connection()
+    return {
+        name: connection.connection.execute(f"PRAGMA {name}").fetchone()[0]
+        for name in names
+    }
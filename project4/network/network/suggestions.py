@@ -0,0 +1,229 @@
+"""
+"Who to follow" suggestions.
+
+Accounts are ranked for each user by how many of the accounts they follow
+follow them too (friends of friends), boosted by how much they posted
+recently. Finding them at request time would join the follow table with
+itself, so the NETWORK_SUGGESTIONS_LIMIT best candidates of every user are
+precomputed into Suggestion rows instead:
+
+- "manage.py rebuild_suggestions" recomputes every user's, meant to run
+  periodically (see its --interval option),
+- following or unfollowing someone marks the follower's suggestions stale,
+  in the follow's transaction, and "manage.py rebuild_suggestions --stale"
+  recomputes only those. The suggestions of their own followers, who now have
+  one more (or less) friend of a friend, wait for the next full rebuild.
+
+Follow requests never wait for the recomputation: SQLite fails a transaction
+that reads then writes, like a follow, when another connection is writing,
+so the suggestions aren't written from the task pool of the web process.
+
+The "suggestions" API operation then reads a single index range.
+"""
+import heapq
+import math
+from collections import Counter
+from collections.abc import Callable, Iterable
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .graph import FollowGraph
+from .models import Post, Suggestion, User
+
+Follow = User.following.through
+
+# Accounts following more than this many users say little about each of them,
+# and expanding them would make the walk quadratic
+MAX_FOLLOWING = 1_000
+# Weight of log(1 + recent posts) in the score, relative to one mutual follow
+ACTIVITY_WEIGHT = 0.25
+# Candidates with the most mutual follows kept before looking up activity, per
+# suggestion shown
+CANDIDATES_PER_SUGGESTION = 10
+BATCH_SIZE = 500
+
+
+def suggestions_limit() -> int:
+    return getattr(settings, "NETWORK_SUGGESTIONS_LIMIT", 20)
+
+
+def activity_days() -> int:
+    return getattr(settings, "NETWORK_SUGGESTIONS_ACTIVITY_DAYS", 7)
+
+
+def recent_posts(user_ids: Iterable[int] | None = None) -> dict[int, int]:
+    """
+    Number of posts published by every user (or those in "user_ids") within
+    NETWORK_SUGGESTIONS_ACTIVITY_DAYS.
+    """
+    since = timezone.now() - timedelta(days=activity_days())
+    posts = Post.objects.filter(publication_date__gte=since)
+    if user_ids is not None:
+        posts = posts.filter(user_id__in=user_ids)
+
+    return dict(
+        posts.order_by()
+        .values("user_id")
+        .annotate(total=Count("id"))
+        .values_list("user_id", "total")
+    )
+
+
+def rank(
+    user_id: int,
+    following: Iterable[int],
+    following_of: Callable[[int], Iterable[int]],
+    activity_of: Callable[[list[int]], dict[int, int]],
+) -> list[Suggestion]:
+    """
+    Build the unsaved Suggestion rows of "user_id", who follows "following".
+    """
+    following = set(following)
+    mutuals: Counter[int] = Counter()
+    for followed_id in following:
+        mutuals.update(following_of(followed_id))
+    for followed_id in following | {user_id}:
+        mutuals.pop(followed_id, None)
+
+    limit = suggestions_limit()
+    candidates = [
+        candidate_id
+        for candidate_id, _ in heapq.nlargest(
+            limit * CANDIDATES_PER_SUGGESTION,
+            mutuals.items(),
+            key=lambda item: (item[1], -item[0]),
+        )
+    ]
+    activity = activity_of(candidates) if candidates else {}
+
+    scores = {
+        candidate_id: mutuals[candidate_id]
+        + ACTIVITY_WEIGHT * math.log1p(activity.get(candidate_id, 0))
+        for candidate_id in candidates
+    }
+    best = sorted(
+        candidates, key=lambda candidate_id: (-scores[candidate_id], candidate_id)
+    )
+
+    return [
+        Suggestion(
+            user_id=user_id,
+            suggested_id=candidate_id,
+            rank=i,
+            mutuals=mutuals[candidate_id],
+            score=scores[candidate_id],
+        )
+        for i, candidate_id in enumerate(best[:limit])
+    ]
+
+
+def _save(user_ids: list[int], suggestions: list[Suggestion]):
+    with transaction.atomic():
+        Suggestion.objects.filter(user_id__in=user_ids).delete()
+        Suggestion.objects.bulk_create(suggestions)
+
+
+def _graph_following_of(follow_graph: FollowGraph) -> Callable[[int], list[int]]:
+    def following_of(user_id: int) -> list[int]:
+        if follow_graph.following_count(user_id) > MAX_FOLLOWING:
+            return []
+        return follow_graph.following_ids(user_id)
+
+    return following_of
+
+
+def rebuild_suggestions() -> int:
+    """
+    Recompute the suggestions of every user from the whole follow table.
+    Return the number of saved suggestions.
+    """
+    started = timezone.now()
+    # Read once for the whole batch. Not the in-process graph, which can be
+    # NETWORK_FOLLOW_GRAPH_MAX_AGE old in this process
+    follow_graph = FollowGraph()
+    follow_graph.load()
+
+    following_of = _graph_following_of(follow_graph)
+    activity = recent_posts()
+
+    user_ids = list(User.objects.order_by("id").values_list("id", flat=True))
+    saved = 0
+    for start in range(0, len(user_ids), BATCH_SIZE):
+        batch = user_ids[start : start + BATCH_SIZE]
+        suggestions = [
+            suggestion
+            for user_id in batch
+            for suggestion in rank(
+                user_id,
+                follow_graph.following_ids(user_id),
+                following_of,
+                lambda candidates: activity,
+            )
+        ]
+        _save(batch, suggestions)
+        saved += len(suggestions)
+
+    # Follows changed since were maybe not read, they stay stale
+    User.objects.filter(suggestions_stale_at__lte=started).update(
+        suggestions_stale_at=None
+    )
+    return saved
+
+
+def refresh_suggestions(user_id: int):
+    """
+    Recompute the suggestions of a single user, after they followed or
+    unfollowed someone.
+
+    Reads the follow table rather than the in-process follow graph, which
+    can miss the follows made by other processes.
+    """
+    # The user's follows and those of the accounts they follow, at once
+    followed = Follow.objects.filter(from_user_id=user_id).values("to_user_id")
+    follows: dict[int, list[int]] = {}
+    for from_user_id, to_user_id in Follow.objects.filter(
+        Q(from_user_id=user_id)
+        | Q(
+            from_user_id__in=followed,
+            from_user__following_count__lte=MAX_FOLLOWING,
+        )
+    ).values_list("from_user_id", "to_user_id"):
+        follows.setdefault(from_user_id, []).append(to_user_id)
+    following = follows.pop(user_id, [])
+
+    def following_of(followed_id: int) -> list[int]:
+        return follows.get(followed_id, [])
+
+    _save([user_id], rank(user_id, following, following_of, recent_posts))
+
+
+def refresh_stale_suggestions() -> int:
+    """
+    Recompute the suggestions of the users whose follows changed since theirs
+    were saved. Return the number of refreshed users.
+    """
+    stale = list(
+        User.objects.filter(suggestions_stale_at__isnull=False).values_list(
+            "id", "suggestions_stale_at"
+        )
+    )
+    for user_id, stale_at in stale:
+        refresh_suggestions(user_id)
+        # Unless they followed someone again meanwhile
+        User.objects.filter(id=user_id, suggestions_stale_at=stale_at).update(
+            suggestions_stale_at=None
+        )
+
+    return len(stale)
+
+
+def follows_changed(follower_ids: list[int]):
+    """
+    Mark the suggestions of "follower_ids" stale, called inside the
+    transaction that changed their follows.
+    """
+    User.objects.filter(id__in=follower_ids).update(suggestions_stale_at=timezone.now())
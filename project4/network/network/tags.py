@@ -0,0 +1,84 @@
+"""
+Hashtag and mention index.
+
+The API operations that write posts and comments call index_post and
+index_comment in the same transaction, so tag and mention feeds are a
+semi-join on an indexed table instead of a LIKE scan over every post. Edits
+only insert and delete the rows that changed.
+"""
+from __future__ import annotations
+
+import re
+
+from django.db import transaction
+
+from .models import Comment, Hashtag, Mention, Post, User
+
+HASHTAG_PATTERN = re.compile(r"(?<![\w#])#(\w{1,64})")
+MENTION_PATTERN = re.compile(r"(?<![\w@])@([\w.+-]{1,150})")
+
+
+def extract_hashtags(text: str) -> set[str]:
+    return {name.lower() for name in HASHTAG_PATTERN.findall(text)}
+
+
+def extract_mentions(text: str) -> set[str]:
+    # A mention at the end of a sentence isn't part of the username
+    return {username.rstrip(".") for username in MENTION_PATTERN.findall(text)}
+
+
+def index_post(post: Post, created: bool = False):
+    """
+    Index the hashtags and mentions of the post text. Pass "created" for new
+    posts, which have nothing to diff against.
+    """
+    _index(post.id, None, post.text, created)
+
+
+def index_comment(comment: Comment, created: bool = False):
+    _index(comment.post_id, comment.id, comment.text, created)
+
+
+def _index(post_id: int, comment_id: int | None, text: str, created: bool):
+    hashtags = extract_hashtags(text)
+    usernames = extract_mentions(text)
+    mentioned_ids = set()
+    if usernames:
+        mentioned_ids = set(
+            User.objects.filter(username__in=usernames).values_list("id", flat=True)
+        )
+
+    _sync(Hashtag, "name", post_id, comment_id, hashtags, created)
+    _sync(Mention, "user_id", post_id, comment_id, mentioned_ids, created)
+
+
+def _sync(model, field: str, post_id: int, comment_id: int | None, values: set, created):
+    rows = model.objects.filter(post_id=post_id, comment_id=comment_id)
+
+    existing = set()
+    if not created:
+        existing = set(rows.values_list(field, flat=True))
+        if existing - values:
+            rows.filter(**{f"{field}__in": existing - values}).delete()
+
+    if values - existing:
+        model.objects.bulk_create(
+            [
+                model(post_id=post_id, comment_id=comment_id, **{field: value})
+                for value in values - existing
+            ]
+        )
+
+
+def rebuild():
+    """
+    Index every post and comment from scratch.
+    """
+    with transaction.atomic():
+        Hashtag.objects.all().delete()
+        Mention.objects.all().delete()
+
+        for post in Post.objects.only("id", "text").iterator():
+            index_post(post, created=True)
+        for comment in Comment.objects.only("id", "post_id", "text").iterator():
+            index_comment(comment, created=True)
@@ -0,0 +1,51 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+# Local worker pool for work that doesn't need to block the request, like
+# timeline fan-out. Jobs are lost if the process dies, so anything submitted
+# here must be rebuildable by a management command.
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "NETWORK_TASK_WORKERS", 2),
+    thread_name_prefix="network-task",
+)
+
+
+def _run(func, args, kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception("Background task %s failed", func.__name__)
+    finally:
+        # Database connections are per thread, don't leak the worker's ones
+        connections.close_all()
+
+
+def run_in_background(func, *args, **kwargs):
+    """
+    Run "func" on the worker pool once the current transaction commits.
+
+    With NETWORK_TASKS_EAGER enabled (e.g. in tests) the function runs
+    immediately in the caller's thread.
+    """
+    if getattr(settings, "NETWORK_TASKS_EAGER", False):
+        func(*args, **kwargs)
+        return
+
+    transaction.on_commit(lambda: _executor.submit(_run, func, args, kwargs))
+
+
+def submit(func, *args, **kwargs):
+    """
+    Run "func" on the worker pool right away, for work that doesn't depend on
+    the current transaction, like reloading a cache from committed rows.
+    """
+    if getattr(settings, "NETWORK_TASKS_EAGER", False):
+        func(*args, **kwargs)
+        return
+
+    _executor.submit(_run, func, args, kwargs)
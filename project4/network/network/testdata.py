@@ -0,0 +1,399 @@
+"""
+Synthetic networks for benchmarks and profiling, see "manage.py generate_testdata".
+
+Follower counts, likes, posts and comments follow power laws. A few accounts
+gather most followers and likes, and a few users write most posts, so
+celebrity accounts and busy threads show up as they do in production. The
+same seed always generates the same network.
+
+Rows get their primary keys up front. Replies, likes, timelines and the
+hashtag index can then point at them without reading anything back. Users
+are written with bulk_create, and the other tables, through tables included,
+with direct executemany inserts of plain tuples. Denormalized counters,
+celebrity flags, home timelines and their backfill horizons (as
+rebuild_timelines builds them) and the hashtag and mention index are filled
+in directly. The search table is filled by its triggers.
+"""
+from __future__ import annotations
+
+import random
+from collections.abc import Iterable
+from datetime import datetime, timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Comment, Hashtag, Mention, Post, TimelineEntry, User
+from .timeline import backfill_size, celebrity_threshold
+
+Follow = User.following.through
+Like = Post.liked_by.through
+
+WORDS = (
+    "the a of and to in is it on for with at this that we you they was just "
+    "today really never always new old good great bad day night week city "
+    "coffee music movie book game code bug release weekend trip photo food "
+    "friends work home rain sun summer winter idea plan team launch learn"
+).split()
+# Hashtags are drawn from "topic0" to "topic199", following the same power law
+TOPICS = 200
+
+
+class Generator:
+    """
+    Build a network of "users" accounts with the given average volumes.
+    "alpha" is the power-law exponent: the lower, the more skewed.
+    """
+
+    def __init__(
+        self,
+        *,
+        users: int = 1000,
+        posts_per_user: float = 10,
+        follows_per_user: float = 20,
+        likes_per_post: float = 5,
+        comments_per_post: float = 2,
+        reply_ratio: float = 0.5,
+        alpha: float = 1.5,
+        days: int = 365,
+        seed: int = 0,
+        prefix: str = "user",
+        batch_size: int = 5000,
+    ):
+        if alpha <= 1:
+            raise ValueError("alpha must be greater than 1.")
+        if users < 2:
+            raise ValueError("At least 2 users are needed.")
+
+        self.users = users
+        self.posts_per_user = posts_per_user
+        self.follows_per_user = follows_per_user
+        self.likes_per_post = likes_per_post
+        self.comments_per_post = comments_per_post
+        self.reply_ratio = reply_ratio
+        self.alpha = alpha
+        self.days = days
+        self.seed = seed
+        self.prefix = prefix
+        self.batch_size = batch_size
+
+        self.rng = random.Random(seed)
+        self.cum_topic_weights = list(
+            accumulate(rank**-alpha for rank in range(1, TOPICS + 1))
+        )
+        # Dates only depend on the day the network is generated
+        self.end = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def generate(self) -> dict[str, int]:
+        """
+        Insert the network in a single transaction and return the number of
+        rows written per table.
+        """
+        if User.objects.filter(username__regex=rf"^{self.prefix}[0-9]+$").exists():
+            raise ValueError(f'Users named "{self.prefix}<n>" already exist.')
+
+        with transaction.atomic():
+            self.user_ids = self._id_range(User, self.users)
+            # Popularity drives followers and likes, activity drives posts and
+            # comments. Ranks are shuffled so both don't match the user order.
+            self.popularity = self._power_law_weights(self.users)
+            self.activity = self._power_law_weights(self.users)
+
+            self._generate_follows()
+            self._generate_posts()
+            self._generate_likes()
+
+            self.hashtags: list[tuple] = []
+            self.mentions: list[tuple] = []
+            counts = {
+                "users": self._bulk_create(User, self._users()),
+                "follows": self._insert(
+                    Follow, ["from_user", "to_user"], self._follows()
+                ),
+                "posts": self._insert(
+                    Post,
+                    [
+                        "id",
+                        "user",
+                        "text",
+                        "publication_date",
+                        "edited",
+                        "last_modified",
+                        "like_count",
+                    ],
+                    self._posts(),
+                ),
+                "likes": self._insert(Like, ["post", "user"], self._likes()),
+                "comments": self._insert(
+                    Comment,
+                    [
+                        "id",
+                        "post",
+                        "user",
+                        "text",
+                        "publication_date",
+                        "reply",
+                        "parent_comment",
+                    ],
+                    self._comments(),
+                ),
+            }
+            # Filled while generating the post and comment texts
+            counts["hashtags"] = self._insert(
+                Hashtag, ["name", "post", "comment"], self.hashtags
+            )
+            counts["mentions"] = self._insert(
+                Mention, ["user", "post", "comment"], self.mentions
+            )
+            counts["timeline entries"] = self._insert(
+                TimelineEntry, ["user", "post", "publication_date"], self._timelines()
+            )
+
+        return counts
+
+    # -------
+    # Network
+    # -------
+
+    def _generate_follows(self):
+        cum_popularity = list(accumulate(self.popularity))
+        self.following: list[list[int]] = []
+        self.followers_count = [0] * self.users
+
+        for index in range(self.users):
+            degree = self._heavy_tail(self.follows_per_user, self.users - 1)
+            targets = self.rng.choices(
+                range(self.users), cum_weights=cum_popularity, k=degree
+            )
+            # Sorted, so sets don't make the order depend on hashing
+            followed = sorted(set(targets) - {index})
+            self.following.append(followed)
+            for target in followed:
+                self.followers_count[target] += 1
+
+    def _generate_posts(self):
+        count = round(self.users * self.posts_per_user)
+        self.post_ids = self._id_range(Post, count)
+        self.post_authors = self.rng.choices(
+            range(self.users), cum_weights=list(accumulate(self.activity)), k=count
+        )
+        # Ids follow publication dates, as if the posts were written live
+        self.post_dates = sorted(
+            self.end - timedelta(seconds=self.rng.uniform(0, self.days * 86400))
+            for _ in range(count)
+        )
+        self.db_dates = [self._db_date(date) for date in self.post_dates]
+        self.author_posts: list[list[int]] = [[] for _ in range(self.users)]
+        for post, author in enumerate(self.post_authors):
+            self.author_posts[author].append(post)
+
+    def _generate_likes(self):
+        posts = len(self.post_ids)
+        self.like_count = [0] * posts
+        self.like_pairs: list[tuple[int, int]] = []
+        if not posts:
+            return
+
+        # Posts of popular accounts get most likes
+        cum_weights = list(
+            accumulate(self.popularity[author] for author in self.post_authors)
+        )
+        liked = self.rng.choices(
+            range(posts), cum_weights=cum_weights, k=round(posts * self.likes_per_post)
+        )
+        seen = set()
+        for post in liked:
+            user = self.rng.randrange(self.users)
+            if (post, user) not in seen:
+                seen.add((post, user))
+                self.like_pairs.append((post, user))
+                self.like_count[post] += 1
+
+    # ----
+    # Rows
+    # ----
+
+    def _users(self):
+        password = make_password("password", salt=f"testdata{self.seed}")
+        threshold = celebrity_threshold()
+
+        for index, user_id in enumerate(self.user_ids):
+            joined = self.end - timedelta(
+                days=self.days, seconds=self.rng.uniform(0, self.days * 86400)
+            )
+            yield User(
+                id=user_id,
+                username=f"{self.prefix}{index}",
+                email=f"{self.prefix}{index}@example.com",
+                password=password,
+                date_joined=joined,
+                last_login=self.end,
+                following_count=len(self.following[index]),
+                followers_count=self.followers_count[index],
+                celebrity=self.followers_count[index] > threshold,
+                timeline_complete_since=self._timeline_horizon(index),
+            )
+
+    def _follows(self):
+        for index, followed in enumerate(self.following):
+            for target in followed:
+                yield self.user_ids[index], self.user_ids[target]
+
+    def _posts(self):
+        for post, (post_id, author) in enumerate(zip(self.post_ids, self.post_authors)):
+            mentioned = None
+            if self.following[author] and self.rng.random() < 0.1:
+                mentioned = self.rng.choice(self.following[author])
+            text = self._text(post_id, None, mentioned)
+            date = self.db_dates[post]
+
+            yield (
+                post_id,
+                self.user_ids[author],
+                text,
+                date,
+                False,
+                date,
+                self.like_count[post],
+            )
+
+    def _likes(self):
+        for post, user in self.like_pairs:
+            yield self.post_ids[post], self.user_ids[user]
+
+    def _comments(self):
+        cum_activity = list(accumulate(self.activity))
+        comment_id = self._next_id(Comment)
+
+        for post_id, date in zip(self.post_ids, self.post_dates):
+            count = 0
+            if self.comments_per_post:
+                count = int(self.rng.expovariate(1 / self.comments_per_post))
+            thread: list[int] = []
+
+            for _ in range(count):
+                parent = None
+                if thread and self.rng.random() < self.reply_ratio:
+                    parent = self.rng.choice(thread)
+                date = min(date + timedelta(minutes=self.rng.uniform(1, 120)), self.end)
+                (author,) = self.rng.choices(range(self.users), cum_weights=cum_activity)
+                text = self._text(post_id, comment_id, None)
+
+                yield (
+                    comment_id,
+                    post_id,
+                    self.user_ids[author],
+                    text,
+                    self._db_date(date),
+                    parent is not None,
+                    parent,
+                )
+                thread.append(comment_id)
+                comment_id += 1
+
+    def _timelines(self):
+        # Same entries as timeline.rebuild_timelines: the latest posts of every
+        # followed account that isn't a celebrity
+        threshold = celebrity_threshold()
+        latest = backfill_size()
+        if not latest:
+            return
+
+        for index, followed in enumerate(self.following):
+            for target in followed:
+                if self.followers_count[target] > threshold:
+                    continue
+                for post in self.author_posts[target][-latest:]:
+                    yield self.user_ids[index], self.post_ids[post], self.db_dates[post]
+
+    def _timeline_horizon(self, index: int) -> datetime | None:
+        # Same as timeline.backfill_follow: the latest date of the oldest post
+        # copied from a followed account with more posts than the backfill
+        threshold = celebrity_threshold()
+        latest = backfill_size()
+        horizon = None
+
+        for target in self.following[index]:
+            posts = self.author_posts[target]
+            if self.followers_count[target] > threshold or len(posts) <= latest:
+                continue
+            date = self.post_dates[posts[-latest] if latest else posts[-1]]
+            if horizon is None or date > horizon:
+                horizon = date
+
+        return horizon
+
+    def _text(self, post_id: int, comment_id: int | None, mentioned: int | None) -> str:
+        """
+        Random words, sometimes followed by a hashtag and a mention, which are
+        indexed right away.
+        """
+        suffix = ""
+        if self.rng.random() < 0.3:
+            (topic,) = self.rng.choices(range(TOPICS), cum_weights=self.cum_topic_weights)
+            suffix += f" #topic{topic}"
+            self.hashtags.append((f"topic{topic}", post_id, comment_id))
+        if mentioned is not None:
+            suffix += f" @{self.prefix}{mentioned}"
+            self.mentions.append((self.user_ids[mentioned], post_id, comment_id))
+
+        words = " ".join(self.rng.choices(WORDS, k=self.rng.randint(3, 25)))
+        return words[: Post._meta.get_field("text").max_length - len(suffix)] + suffix
+
+    # -------
+    # Helpers
+    # -------
+
+    def _power_law_weights(self, count: int) -> list[float]:
+        ranks = list(range(1, count + 1))
+        self.rng.shuffle(ranks)
+        return [rank**-self.alpha for rank in ranks]
+
+    def _heavy_tail(self, mean: float, cap: int) -> int:
+        # A Pareto variable has a mean of alpha / (alpha - 1)
+        scale = mean * (self.alpha - 1) / self.alpha
+        return min(cap, int(scale * self.rng.paretovariate(self.alpha)))
+
+    def _next_id(self, model) -> int:
+        return (model.objects.aggregate(last=Max("id"))["last"] or 0) + 1
+
+    def _id_range(self, model, count: int) -> range:
+        start = self._next_id(model)
+        return range(start, start + count)
+
+    def _db_date(self, date: datetime) -> str:
+        return connection.ops.adapt_datetimefield_value(date)
+
+    def _bulk_create(self, model, objs: Iterable) -> int:
+        objs = iter(objs)
+        total = 0
+        while batch := list(islice(objs, self.batch_size)):
+            model.objects.bulk_create(batch)
+            total += len(batch)
+        return total
+
+    def _insert(self, model, fields: list[str], rows: Iterable[tuple]) -> int:
+        """
+        Insert "rows" of "fields" values with executemany. Unlike bulk_create,
+        neither model instances nor per-row SQL compilation are involved, which
+        is most of the time spent on millions of rows.
+        """
+        columns = ", ".join(
+            connection.ops.quote_name(model._meta.get_field(field).column)
+            for field in fields
+        )
+        sql = (
+            f"INSERT INTO {connection.ops.quote_name(model._meta.db_table)} "
+            f"({columns}) VALUES ({', '.join(['%s'] * len(fields))})"
+        )
+
+        rows = iter(rows)
+        total = 0
+        with connection.cursor() as cursor:
+            while batch := list(islice(rows, self.batch_size)):
+                cursor.executemany(sql, batch)
+                total += len(batch)
+        return total
@@ -0,0 +1,10 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def serialization_check(settings):
+    """
+    Compare every post page serialized without the schemas against the schema
+    output (network/serializers.py).
+    """
+    settings.NETWORK_SERIALIZATION_CHECK = True
@@ -1,7 +1,20 @@
+from datetime import timedelta
+from io import BytesIO
+from tempfile import TemporaryDirectory
+
 import pytest
-from django.test import TestCase
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
+from PIL import Image
+from network import api_views, feed_cache
 from network.models import Comment, Post, User
 
 
@@ -22,6 +35,7 @@ def whitenoise_autorefresh(settings):
     settings.WHITENOISE_AUTOREFRESH = True
 
 
+@override_settings(NETWORK_TASKS_EAGER=True)
 class APITest(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -54,6 +68,10 @@ class APITest(TestCase):
             post=cls.post2, user=cls.user2, text="comment 1"
         )
 
+    def setUp(self):
+        # Don't serve anonymous feed pages cached by other tests
+        cache.clear()
+
     def test_all_posts(self):
         """
         Test if all posts from the database are returned
@@ -90,6 +108,199 @@ class APITest(TestCase):
         self.assertEqual(json_resp["previousPage"], 1)
         self.assertEqual(len(json_resp["posts"]), 10)
 
+    def test_all_posts_cursor(self):
+        """
+        Test if cursor pagination walks through all posts without repeating any
+        """
+        Post.objects.bulk_create(
+            [Post(user=self.user1, text=f"post {2 + i}") for i in range(20)]
+        )
+
+        url = reverse("network:api:all_posts_cursor")
+        seen_ids = []
+        cursor = None
+        for _ in range(3):
+            params = {"cursor": cursor} if cursor else {}
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, params)
+
+            # Neither a COUNT query nor an OFFSET scan
+            for query in queries.captured_queries:
+                self.assertNotIn("COUNT(*)", query["sql"])
+                self.assertNotIn("OFFSET", query["sql"])
+
+            self.assertEqual(response.status_code, 200)
+            json_resp = response.json()
+            self.assertIsNone(json_resp["numPages"])
+            seen_ids += [post["id"] for post in json_resp["posts"]]
+            cursor = json_resp["nextCursor"]
+
+        self.assertIsNone(cursor)
+        self.assertEqual(len(seen_ids), 22)
+        self.assertEqual(len(set(seen_ids)), 22)
+
+    def test_all_posts_comment_tree(self):
+        """
+        Test if nested replies are serialized without extra queries
+        """
+        url = reverse("network:api:all_posts_cursor")
+        with self.assertNumQueries(2):
+            self.client.get(url)
+
+        parent = self.comment_child
+        for i in range(5):
+            parent = Comment.objects.create(
+                post=self.post1, user=self.user2, text=f"reply {i}", parent_comment=parent
+            )
+
+        # Replies were created outside of the API
+        feed_cache.bump_generation()
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+
+        post1 = response.json()["posts"][1]
+        self.assertEqual(post1["id"], self.post1.id)
+        self.assertEqual(len(post1["comments"]), 2)
+
+        # Walk down the thread started by comment 1
+        comment = post1["comments"][1]
+        depth = 0
+        while comment["replies"]:
+            comment = comment["replies"][0]
+            depth += 1
+        self.assertEqual(depth, 6)
+        self.assertEqual(comment["text"], "reply 4")
+
+    def test_all_posts_viewer_state(self):
+        """
+        Test if the requesting user's flags are resolved with set lookups
+        """
+        self.user1.following.add(self.user2)
+        self.post2.liked_by.add(self.user1)
+        self.client.login(username="user1", password="password")
+
+        # Session, user, posts, comments, likes and follows
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse("network:api:all_posts_cursor"))
+
+        post2, post1 = response.json()["posts"]
+        self.assertEqual(
+            (post2["isOwner"], post2["likedByUser"], post2["isFollowing"]),
+            (False, True, True),
+        )
+        self.assertEqual(
+            (post1["isOwner"], post1["likedByUser"], post1["isFollowing"]),
+            (True, False, False),
+        )
+
+    def test_all_posts_anonymous_cache(self):
+        """
+        Test if anonymous pages are served from the cache until a write happens
+        """
+        url = reverse("network:api:all_posts_cursor")
+        response = self.client.get(url)
+
+        with self.assertNumQueries(0):
+            cached_response = self.client.get(url)
+        self.assertEqual(cached_response.content, response.content)
+
+        # Same body as the one rendered by Ninja for a user with no flags set
+        User.objects.create_user(  # type: ignore
+            username="user3", password="password", email="user3@email.com"
+        )
+        self.client.login(username="user3", password="password")
+        self.assertEqual(self.client.get(url).json(), response.json())
+
+        new_post = self.client.post(
+            reverse("network:api:new_post"),
+            {"text": "Hello World"},
+            content_type="application/json",
+        ).json()
+        self.client.logout()
+
+        resp_json = self.client.get(url).json()
+        self.assertEqual(resp_json["posts"][0]["id"], new_post["id"])
+
+    def test_conditional_get(self):
+        """
+        Test if unchanged pages are answered with 304 before being built
+        """
+        self.client.login(username="user1", password="password")
+        url = reverse("network:api:following_posts", args=[1])
+        self.user1.following.add(self.user2)
+
+        response = self.client.get(url)
+        etag = response.headers["ETag"]
+        self.assertEqual(len(response.json()["posts"]), 1)
+        self.assertNotIn("Last-Modified", response.headers)
+
+        # Session, user, followed celebrities, count, timeline range, posts,
+        # comments, authors, likes and follows
+        with self.assertNumQueries(10):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["ETag"], etag)
+
+        # Likes, comments and edits change the validators
+        self.client.patch(reverse("network:api:like_post", args=[self.post2.id]))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["posts"][0]["likedByUser"])
+        self.assertNotEqual(response.headers["ETag"], etag)
+        etag = response.headers["ETag"]
+
+        Comment.objects.create(post=self.post2, user=self.user1, text="comment 3")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response.headers["ETag"]
+
+        # Renamed authors are part of the body
+        User.objects.filter(id=self.user2.id).update(username="user2_renamed")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["posts"][0]["username"], "user2_renamed")
+        User.objects.filter(id=self.user2.id).update(username="user2")
+
+        # Modification dates miss likes and renames, they're never compared
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE="Thu, 01 Jan 2099 00:00:00 GMT"
+        )
+        self.assertEqual(response.status_code, 200)
+
+        # Profile changes are part of the profile validators
+        User.objects.filter(id=self.user2.id).update(last_login=timezone.now())
+        url = reverse("network:api:profile_cursor", args=["user2"])
+        etag = self.client.get(url).headers["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.user1.following.remove(self.user2)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()["isFollowing"])
+
+    def test_conditional_get_anonymous(self):
+        """
+        Test if cached anonymous pages are revalidated without queries
+        """
+        url = reverse("network:api:all_posts", args=[1])
+        etag = self.client.get(url).headers["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        feed_cache.bump_generation()
+        Post.objects.filter(id=self.post1.id).update(text="post 1 edited")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_all_posts_invalid_cursor(self):
+        url = reverse("network:api:all_posts_cursor")
+        response = self.client.get(url, {"cursor": "not-a-cursor"})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["errors"], "Invalid cursor.")
+
     def test_profile_route(self):
         url = reverse("network:api:profile", args=["user1", "1"])
         self.client.login(username="user1", password="password")
@@ -103,6 +314,42 @@ class APITest(TestCase):
 
         # raise Exception("")
 
+    def test_profile_pagination(self):
+        """
+        Test if the profile only loads the requested page of posts
+        """
+        self.client.login(username="user1", password="password")
+        url = reverse("network:api:profile", args=["user1", "1"])
+
+        with CaptureQueriesContext(connection) as small_profile:
+            self.client.get(url)
+
+        Post.objects.bulk_create(
+            [Post(user=self.user1, text=f"post {2 + i}") for i in range(30)]
+        )
+
+        # Same queries, whatever the number of posts
+        with self.assertNumQueries(len(small_profile)):
+            response = self.client.get(url)
+
+        resp_json = response.json()
+        self.assertEqual(resp_json["postsData"]["numPages"], 4)
+        self.assertEqual(len(resp_json["postsData"]["posts"]), 10)
+
+        # Cursor mode walks through every post without a COUNT query
+        url = reverse("network:api:profile_cursor", args=["user1"])
+        seen_ids = []
+        cursor = None
+        for _ in range(4):
+            params = {"cursor": cursor} if cursor else {}
+            posts_data = self.client.get(url, params).json()["postsData"]
+            self.assertIsNone(posts_data["numPages"])
+            seen_ids += [post["id"] for post in posts_data["posts"]]
+            cursor = posts_data["nextCursor"]
+
+        self.assertIsNone(cursor)
+        self.assertEqual(len(set(seen_ids)), 31)
+
     def test_following_posts(self):
 
         self.client.login(username="user1", password="password")
@@ -124,6 +371,119 @@ class APITest(TestCase):
         self.assertEqual(self.post2.text, resp_json["posts"][0]["text"])
         self.assertEqual(True, resp_json["posts"][0]["isFollowing"])
 
+    def test_following_timeline(self):
+        """
+        Test if followed posts are pushed to the timeline and removed on unfollow
+        """
+        self.client.login(username="user1", password="password")
+        follow_url = reverse("network:api:follow", args=["user2"])
+        feed_url = reverse("network:api:following_posts_cursor")
+
+        # Following backfills existing posts
+        self.client.post(follow_url)
+        self.assertTrue(self.user1.timeline.filter(post=self.post2).exists())
+
+        # New posts are fanned out to followers
+        new_post = Post.objects.create(user=self.user2, text="post 3")
+        self.assertTrue(self.user1.timeline.filter(post=new_post).exists())
+
+        resp_json = self.client.get(feed_url).json()
+        self.assertListEqual(
+            [post["id"] for post in resp_json["posts"]], [new_post.id, self.post2.id]
+        )
+
+        # Unfollowing removes the author's posts from the timeline
+        self.client.post(follow_url)
+        self.assertFalse(self.user1.timeline.exists())
+        self.assertListEqual(self.client.get(feed_url).json()["posts"], [])
+
+    @override_settings(NETWORK_TIMELINE_BACKFILL=1)
+    def test_following_capped_backfill(self):
+        """
+        Test if posts older than the capped backfill are pulled into the feed
+        """
+        older_post = Post.objects.create(user=self.user2, text="post 3")
+        Post.objects.filter(id=older_post.id).update(
+            publication_date=self.post2.publication_date - timedelta(days=1)
+        )
+        self.client.login(username="user1", password="password")
+        self.client.post(reverse("network:api:follow", args=["user2"]))
+
+        self.assertEqual(self.user1.timeline.count(), 1)
+        self.user1.refresh_from_db()
+        self.assertEqual(self.user1.timeline_complete_since, self.post2.publication_date)
+
+        feed_url = reverse("network:api:following_posts_cursor")
+        resp_json = self.client.get(feed_url).json()
+        self.assertListEqual(
+            [post["id"] for post in resp_json["posts"]], [self.post2.id, older_post.id]
+        )
+
+        # Unfollowed accounts aren't pulled either
+        self.client.post(reverse("network:api:follow", args=["user2"]))
+        self.assertListEqual(self.client.get(feed_url).json()["posts"], [])
+
+    @override_settings(NETWORK_CELEBRITY_FOLLOWERS=0)
+    def test_following_celebrity(self):
+        """
+        Test if posts from celebrity accounts are pulled instead of fanned out
+        """
+        self.client.login(username="user1", password="password")
+        self.client.post(reverse("network:api:follow", args=["user2"]))
+
+        self.user2.refresh_from_db()
+        self.assertTrue(self.user2.celebrity)
+
+        new_post = Post.objects.create(user=self.user2, text="post 3")
+        self.assertFalse(self.user1.timeline.exists())
+
+        resp_json = self.client.get(reverse("network:api:following_posts_cursor")).json()
+        self.assertListEqual(
+            [post["id"] for post in resp_json["posts"]], [new_post.id, self.post2.id]
+        )
+
+    @override_settings(NETWORK_TIMELINE_BACKFILL=3)
+    def test_following_merged_pages(self):
+        """
+        Test if pages merge timeline entries, celebrity posts and posts older
+        than a capped backfill in date order, without gaps or duplicates
+        """
+        user3 = User.objects.create_user(  # type: ignore
+            username="user3", password="password", email="user3@email.com"
+        )
+        User.objects.filter(id=user3.id).update(celebrity=True)
+        for i in range(12):
+            Post.objects.create(user=self.user2 if i % 3 else user3, text=f"post {i}")
+        self.client.login(username="user1", password="password")
+        self.client.post(reverse("network:api:follow", args=["user2"]))
+        self.client.post(reverse("network:api:follow", args=["user3"]))
+        # Fanned out after the follow
+        Post.objects.create(user=self.user2, text="post 12")
+
+        expected = list(
+            Post.objects.filter(user__in=[self.user2, user3])
+            .order_by("-publication_date", "-id")
+            .values_list("id", flat=True)
+        )
+
+        ids, cursor = [], None
+        while True:
+            params = {"cursor": cursor} if cursor else {}
+            resp_json = self.client.get(
+                reverse("network:api:following_posts_cursor"), params
+            ).json()
+            ids += [post["id"] for post in resp_json["posts"]]
+            cursor = resp_json["nextCursor"]
+            if not cursor:
+                break
+        self.assertListEqual(ids, expected)
+
+        resp_json = self.client.get(
+            reverse("network:api:following_posts", args=[2])
+        ).json()
+        self.assertEqual(resp_json["numPages"], 2)
+        self.assertListEqual([post["id"] for post in resp_json["posts"]], expected[10:])
+
     def test_new_post(self):
         """
         Test if a new post was published
@@ -201,6 +561,27 @@ class APITest(TestCase):
         self.assertEqual(resp_json["likedByUser"], False)
         self.assertNotIn(self.user1, self.post1.liked_by.all())
 
+    def test_post_like_count(self):
+        """
+        Test if the stored like counter follows likes and can be reconciled
+        """
+        self.client.login(username="user1", password="password")
+        url = reverse("network:api:like_post", args=[self.post2.id])
+
+        self.client.patch(url)
+        self.post2.refresh_from_db()
+        self.assertEqual(self.post2.like_count, 1)
+
+        # Drift introduced outside toggle_like
+        self.post2.liked_by.add(self.user2)
+        self.assertEqual(Post.objects.reconcile_like_counts(), 1)
+        self.post2.refresh_from_db()
+        self.assertEqual(self.post2.like_count, 2)
+
+        response = self.client.patch(url)
+        self.assertEqual(response.json()["likes"], 1)
+        self.assertEqual(Post.objects.reconcile_like_counts(), 0)
+
     def test_new_comment(self):
         """
         Test if a new comment was published on the correct post
@@ -275,3 +656,189 @@ class APITest(TestCase):
             resp_json["message"], f"You are no longer following {self.user2.username}"
         )
         self.assertEqual(resp_json["isFollowing"], False)
+
+    def test_batch(self):
+        """
+        Test if batched likes and follows are applied together, with one result
+        per action
+        """
+        self.client.login(username="user1", password="password")
+        url = reverse("network:api:batch")
+
+        response = self.client.post(
+            url,
+            {
+                "actions": [
+                    {"type": "like", "postID": self.post1.id},
+                    {"type": "like", "postID": self.post2.id},
+                    {"type": "unlike", "postID": self.post1.id},
+                    {"type": "like", "postID": 999},
+                    {"type": "follow", "username": "user2"},
+                    {"type": "follow", "username": "user1"},
+                    {"type": "unfollow", "username": "nobody"},
+                ]
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+
+        # The last action on a target wins
+        self.assertListEqual(
+            response.json()["results"],
+            [
+                {
+                    "type": "like",
+                    "postID": self.post1.id,
+                    "ok": True,
+                    "likes": 0,
+                    "likedByUser": False,
+                },
+                {
+                    "type": "like",
+                    "postID": self.post2.id,
+                    "ok": True,
+                    "likes": 1,
+                    "likedByUser": True,
+                },
+                {
+                    "type": "unlike",
+                    "postID": self.post1.id,
+                    "ok": True,
+                    "likes": 0,
+                    "likedByUser": False,
+                },
+                {
+                    "type": "like",
+                    "postID": 999,
+                    "ok": False,
+                    "error": "The requested post does not exist.",
+                },
+                {"type": "follow", "username": "user2", "ok": True, "isFollowing": True},
+                {
+                    "type": "follow",
+                    "username": "user1",
+                    "ok": False,
+                    "error": "You can't follow yourself.",
+                },
+                {
+                    "type": "unfollow",
+                    "username": "nobody",
+                    "ok": False,
+                    "error": "The requested user does not exist.",
+                },
+            ],
+        )
+
+        self.assertIn(self.user1, self.post2.liked_by.all())
+        self.assertNotIn(self.user1, self.post1.liked_by.all())
+        self.assertIn(self.user2, self.user1.following.all())
+        self.user2.refresh_from_db()
+        self.assertEqual(self.user2.followers_count, 1)
+        self.assertEqual(Post.objects.reconcile_like_counts(), 0)
+
+        response = self.client.post(
+            url,
+            {
+                "actions": [
+                    {"type": "unlike", "postID": self.post2.id},
+                    {"type": "unfollow", "username": "user2"},
+                ]
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(response.json()["results"][0]["likes"], 0)
+        self.assertFalse(response.json()["results"][1]["isFollowing"])
+        self.assertNotIn(self.user2, self.user1.following.all())
+        self.assertEqual(User.objects.reconcile_follow_counts(), 0)
+
+    def test_batch_invalid_action(self):
+        self.client.login(username="user1", password="password")
+
+        response = self.client.post(
+            reverse("network:api:batch"),
+            {"actions": [{"type": "like", "username": "user2"}]},
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(self.user1.liked_posts.exists())
+
+    def test_async_variants(self):
+        """
+        Test if the async operations return the same data as the sync ones
+        """
+        self.user1.following.add(self.user2)
+        Post.objects.toggle_like(self.post2, self.user1)
+        # Sets last_login, required by UserOut
+        self.client.login(username="user2", password="password")
+
+        request = RequestFactory().get("/")
+        request.user = self.user1
+
+        def run(view, *args):
+            response = view(request, HttpResponse(), *args)
+            # Same validators as well
+            return response.content, response.headers["ETag"]
+
+        for sync_view, async_view, args in [
+            (api_views.get_all_posts, api_views.get_all_posts_async, [1]),
+            (api_views.get_all_posts_cursor, api_views.get_all_posts_cursor_async, []),
+            (api_views.following_posts, api_views.following_posts_async, [1]),
+            (
+                api_views.following_posts_cursor,
+                api_views.following_posts_cursor_async,
+                [],
+            ),
+        ]:
+            self.assertEqual(run(sync_view, *args), run(async_to_sync(async_view), *args))
+
+        self.assertEqual(
+            api_views.profile(request, HttpResponse(), "user2", 1).content,
+            async_to_sync(api_views.profile_async)(
+                request, HttpResponse(), "user2", 1
+            ).content,
+        )
+
+        # Anonymous pages are served from the same cache
+        request.user = AnonymousUser()
+        self.assertEqual(
+            api_views.get_all_posts(request, HttpResponse(), 1).content,
+            async_to_sync(api_views.get_all_posts_async)(
+                request, HttpResponse(), 1
+            ).content,
+        )
+
+        request.user = self.user1
+        resp = async_to_sync(api_views.like_post_async)(request, self.post2.id)
+        self.assertEqual(resp, {"id": self.post2.id, "likes": 0, "likedByUser": False})
+
+        resp = async_to_sync(api_views.follow_async)(request, "user2")
+        self.assertEqual(resp["is_following"], False)
+        self.assertFalse(self.user1.following.exists())
+
+    def test_update_profile_photo_variants(self):
+        """
+        Test if uploading a photo schedules the variants pipeline
+        """
+        buffer = BytesIO()
+        Image.new("RGB", (300, 300), "blue").save(buffer, "JPEG")
+        self.client.login(username="user1", password="password")
+
+        with TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            response = self.client.post(
+                reverse("network:api:update_profile"),
+                {
+                    "username": "user1",
+                    "email": "user1@email.com",
+                    "about": "",
+                    "photo": SimpleUploadedFile("photo.jpg", buffer.getvalue()),
+                },
+            )
+            self.assertEqual(response.status_code, 200)
+
+            self.user1.refresh_from_db()
+            self.assertEqual(set(self.user1.photo_variants), {"48", "128", "512"})
+
+            url = reverse("network:api:profile", args=["user1", "1"])
+            photo_variants = self.client.get(url).json()["photoVariants"]
+            self.assertTrue(photo_variants["48"]["webp"].startswith("/media/"))
@@ -0,0 +1,89 @@
+import pytest
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from network.benchmark import percentile, summarize
+from network.models import Post, User
+
+
+@pytest.fixture(autouse=True)
+def whitenoise_autorefresh(settings):
+    """
+    Get rid of whitenoise "No directory at" warning, as it's not helpful when running tests.
+
+    Related:
+        - https://github.com/evansd/whitenoise/issues/215
+        - https://github.com/evansd/whitenoise/issues/191
+        - https://github.com/evansd/whitenoise/commit/4204494d44213f7a51229de8bc224cf6d84c01eb
+    """
+    settings.WHITENOISE_AUTOREFRESH = True
+
+
+class SummaryTest(SimpleTestCase):
+    def test_percentile(self):
+        latencies = [float(ms) for ms in range(1, 101)]
+
+        self.assertEqual(percentile(latencies, 50), 50)
+        self.assertEqual(percentile(latencies, 99), 99)
+        self.assertEqual(percentile(latencies, 100), 100)
+        self.assertEqual(percentile([7.0], 95), 7)
+        self.assertIsNone(percentile([], 50))
+
+    def test_summarize(self):
+        samples = [
+            ("all_posts", 0.010, False, 6),
+            ("all_posts", 0.030, False, 8),
+            ("all_posts", 0.020, True, None),
+            ("all_posts", 0.040, True, None),
+        ]
+        summary = summarize(samples, duration=2)
+
+        self.assertEqual(summary["requests"], 4)
+        self.assertEqual(summary["errors"], 2)
+        self.assertEqual(summary["requests_per_second"], 2)
+        self.assertEqual(summary["latency_ms"]["p50"], 20)
+        self.assertEqual(summary["latency_ms"]["max"], 40)
+        self.assertEqual(summary["latency_ms"]["mean"], 25)
+        self.assertEqual(summary["queries_per_request"], 7)
+
+        self.assertIsNone(summarize([], duration=1)["latency_ms"]["p50"])
+
+
+class QueryCountTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(  # type: ignore
+            username="user1", password="password", email="user1@email.com"
+        )
+        Post.objects.create(user=cls.user, text="post 1")
+
+    def test_header(self):
+        """
+        Test if the header counts every query of the request, session and user included
+        """
+        self.client.force_login(self.user)
+        url = reverse("network:api:all_posts", args=[1])
+
+        response = self.client.get(url)
+        self.assertNotIn("X-Query-Count", response)
+
+        with override_settings(
+            MIDDLEWARE=["network.middleware.query_count"] + settings.MIDDLEWARE,
+            NETWORK_QUERY_COUNT_HEADER=True,
+        ):
+            # A new client loads the middleware again
+            client = self.client_class()
+            client.force_login(self.user)
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(int(response["X-Query-Count"]), len(queries))
+
+    def test_command_needs_benchmark_settings(self):
+        with self.assertRaisesMessage(CommandError, "settings_benchmark"):
+            call_command("benchmark_api")
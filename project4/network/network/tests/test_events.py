@@ -0,0 +1,113 @@
+import asyncio
+from unittest import mock
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from network import events
+from network.models import Post, User
+
+
+@pytest.fixture(autouse=True)
+def whitenoise_autorefresh(settings):
+    """
+    Get rid of whitenoise "No directory at" warning, as it's not helpful when running tests.
+
+    Related:
+        - https://github.com/evansd/whitenoise/issues/215
+        - https://github.com/evansd/whitenoise/issues/191
+        - https://github.com/evansd/whitenoise/commit/4204494d44213f7a51229de8bc224cf6d84c01eb
+    """
+    settings.WHITENOISE_AUTOREFRESH = True
+
+
+@override_settings(NETWORK_TASKS_EAGER=True)
+class EventsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user1 = User.objects.create_user(  # type: ignore
+            username="user1", password="password", email="user1@email.com"
+        )
+        cls.post1 = Post.objects.create(user=cls.user1, text="post 1")
+
+    def test_broker(self):
+        """
+        Test if events published from another thread reach the subscribers
+        """
+
+        async def subscribe():
+            async with events.get_broker().subscribe() as queue:
+                # Like sync views run by the ASGI handler
+                await asyncio.get_running_loop().run_in_executor(
+                    None, events.get_broker().publish, {"type": "likes", "id": 1}
+                )
+                return await asyncio.wait_for(queue.get(), 1)
+
+        self.assertEqual(async_to_sync(subscribe)(), {"type": "likes", "id": 1})
+
+    def test_incomplete_broker(self):
+        class PublishOnlyBroker(events.Broker):
+            def publish(self, event: dict):
+                pass
+
+        with self.assertRaisesMessage(TypeError, "subscribe"):
+            PublishOnlyBroker()
+
+    def test_published_on_commit(self):
+        self.client.login(username="user1", password="password")
+
+        with mock.patch.object(events.get_broker(), "publish") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    reverse("network:api:new_post"),
+                    {"text": "post 2"},
+                    content_type="application/json",
+                )
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.patch(reverse("network:api:like_post", args=[self.post1.id]))
+
+        self.assertListEqual(
+            [call.args[0] for call in publish.call_args_list],
+            [
+                {"type": "post", "id": response.json()["id"], "username": "user1"},
+                {"type": "likes", "id": self.post1.id, "likes": 1},
+            ],
+        )
+
+    def test_not_published_before_commit(self):
+        with mock.patch.object(events.get_broker(), "publish") as publish:
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                Post.objects.create(user=self.user1, text="post 2")
+
+        self.assertEqual(len(callbacks), 1)
+        publish.assert_not_called()
+
+    def test_stream(self):
+        async def read_stream():
+            response = await self.async_client.get(reverse("network:events"))
+            self.assertEqual(response["Content-Type"], "text/event-stream")
+            stream = aiter(response.streaming_content)
+
+            retry = await anext(stream)
+            events.get_broker().publish({"type": "comment", "id": 1, "postID": 2})
+            event = await anext(stream)
+            await stream.aclose()
+            return retry, event
+
+        retry, event = async_to_sync(read_stream)()
+        self.assertEqual(retry, b"retry: 3000\n\n")
+        self.assertEqual(event, b'event: comment\ndata: {"id":1,"postID":2}\n\n')
+
+    @override_settings(NETWORK_EVENTS_KEEPALIVE=0.01, NETWORK_EVENTS_MAX_AGE=0.05)
+    def test_stream_keepalive(self):
+        async def read_stream():
+            return [chunk async for chunk in events.stream()]
+
+        chunks = async_to_sync(read_stream)()
+        self.assertIn(": keepalive\n\n", chunks)
+
+    def test_stream_requires_asgi(self):
+        response = self.client.get(reverse("network:events"))
+        self.assertEqual(response.status_code, 501)
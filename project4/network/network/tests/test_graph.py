@@ -0,0 +1,205 @@
+from unittest import mock
+
+import pytest
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from network.graph import Adjacency, FollowGraph, graph
+from network.models import Post, User
+
+
+@pytest.fixture(autouse=True)
+def whitenoise_autorefresh(settings):
+    """
+    Get rid of whitenoise "No directory at" warning, as it's not helpful when running tests.
+
+    Related:
+        - https://github.com/evansd/whitenoise/issues/215
+        - https://github.com/evansd/whitenoise/issues/191
+        - https://github.com/evansd/whitenoise/commit/4204494d44213f7a51229de8bc224cf6d84c01eb
+    """
+    settings.WHITENOISE_AUTOREFRESH = True
+
+
+class AdjacencyTest(SimpleTestCase):
+    def test_sorted_arrays(self):
+        adjacency = Adjacency({}, {})
+        adjacency.add([(1, 5), (1, 3), (2, 3), (1, 4), (1, 3)])
+
+        self.assertEqual(adjacency.following[1].tolist(), [3, 4, 5])
+        self.assertEqual(adjacency.followers[3].tolist(), [1, 2])
+
+        adjacency.remove([(1, 4), (2, 3), (2, 9)])
+        self.assertEqual(adjacency.following[1].tolist(), [3, 5])
+        self.assertEqual(adjacency.followers[3].tolist(), [1])
+        # Emptied users are dropped
+        self.assertNotIn(2, adjacency.following)
+
+    def test_self_follow(self):
+        adjacency = Adjacency({}, {})
+        adjacency.add([(1, 1)])
+        self.assertEqual(adjacency.following, {})
+
+    @override_settings(NETWORK_CELEBRITY_FOLLOWERS=1)
+    def test_celebrities(self):
+        adjacency = Adjacency({}, {})
+        adjacency.add([(1, 3), (2, 3), (1, 4)])
+        self.assertEqual(adjacency.celebrities, {3})
+
+        # Like the stored flag, never cleared by unfollows
+        adjacency.remove([(1, 3)])
+        self.assertEqual(adjacency.celebrities, {3})
+
+    def test_reads_before_load(self):
+        follow_graph = FollowGraph()
+        self.assertFalse(follow_graph.loaded)
+        self.assertFalse(follow_graph.is_following(1, 2))
+        self.assertEqual(follow_graph.following_ids(1), [])
+        self.assertEqual(follow_graph.following_count(1), 0)
+
+
+@override_settings(NETWORK_FOLLOW_GRAPH=True, NETWORK_TASKS_EAGER=True)
+class FollowGraphTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user1, cls.user2, cls.user3 = [
+            User.objects.create_user(  # type: ignore
+                username=f"user{i}", password="password", email=f"user{i}@email.com"
+            )
+            for i in range(1, 4)
+        ]
+        cls.user1.following.add(cls.user2)
+        cls.user3.following.add(cls.user2)
+
+    def setUp(self):
+        # The graph outlives the test transactions
+        graph.reset()
+        self.addCleanup(graph.reset)
+
+    def test_load(self):
+        graph.load()
+
+        self.assertTrue(graph.is_following(self.user1.id, self.user2.id))
+        self.assertFalse(graph.is_following(self.user2.id, self.user1.id))
+        self.assertEqual(graph.following_ids(self.user1.id), [self.user2.id])
+        self.assertEqual(
+            graph._adjacency.followers[self.user2.id].tolist(),
+            sorted([self.user1.id, self.user3.id]),
+        )
+        self.assertEqual(graph.following_count(self.user2.id), 0)
+
+    def test_warm_up(self):
+        """
+        Test if the first request loads the graph
+        """
+        self.client.get(reverse("network:index"))
+        self.assertTrue(graph.loaded)
+
+    @override_settings(NETWORK_FOLLOW_GRAPH_MAX_AGE=0)
+    def test_reload(self):
+        graph.load()
+        # Made by another process, without signals
+        User.following.through.objects.create(
+            from_user_id=self.user2.id, to_user_id=self.user1.id
+        )
+
+        self.assertTrue(User.objects.is_following(self.user2, self.user1))
+
+    def test_stale_follow_toggle(self):
+        """
+        Test if the follow operation decides from the follow table, not from a
+        graph missing the follows made by other processes
+        """
+        graph.load()
+        # Made by another process, this process' graph never sees it
+        with mock.patch.object(graph, "add"):
+            self.user2.following.add(self.user1)
+        self.assertFalse(graph.is_following(self.user2.id, self.user1.id))
+        self.client.force_login(self.user2)
+
+        response = self.client.post(reverse("network:api:follow", args=["user1"]))
+        self.assertFalse(response.json()["isFollowing"])
+        self.assertFalse(User.objects.has_follow(self.user2, self.user1))
+
+    def test_follow_changes(self):
+        graph.load()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user2.following.add(self.user1, self.user3)
+        self.assertEqual(
+            graph.following_ids(self.user2.id), sorted([self.user1.id, self.user3.id])
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user2.following.remove(self.user3)
+        self.assertEqual(graph.following_ids(self.user2.id), [self.user1.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user2.followers.clear()
+        self.assertNotIn(self.user2.id, graph._adjacency.followers)
+        self.assertFalse(graph.is_following(self.user1.id, self.user2.id))
+
+    def test_rolled_back_follow(self):
+        graph.load()
+
+        try:
+            with transaction.atomic():
+                self.user2.following.add(self.user1)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+
+        self.assertFalse(graph.is_following(self.user2.id, self.user1.id))
+
+    def test_changes_while_loading(self):
+        def committed_while_loading(following, followers):
+            graph.add([(self.user2.id, self.user3.id)])
+            return Adjacency(following, followers)
+
+        # The follow table was read without the change, it's replayed
+        with mock.patch("network.graph.Adjacency", committed_while_loading):
+            graph.load()
+        self.assertTrue(graph.is_following(self.user2.id, self.user3.id))
+
+    def test_hot_paths(self):
+        """
+        Test if follow flags and the following feed don't query the follow table
+        """
+        Post.objects.create(user=self.user2, text="post")
+        graph.load()
+        self.client.force_login(self.user1)
+
+        urls = [
+            reverse("network:api:following_posts", args=[1]),
+            reverse("network:api:profile", args=["user2", 1]),
+            reverse("network:api:all_posts", args=[1]),
+        ]
+        for url in urls:
+            with self.subTest(url), CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+
+            self.assertEqual(response.status_code, 200)
+            sql = " ".join(query["sql"] for query in queries)
+            self.assertNotIn("network_user_following", sql)
+
+        response = self.client.get(reverse("network:api:profile", args=["user2", 1]))
+        self.assertTrue(response.json()["isFollowing"])
+        response = self.client.get(reverse("network:api:following_posts", args=[1]))
+        self.assertEqual(response.json()["posts"][0]["isFollowing"], True)
+
+    @override_settings(NETWORK_CELEBRITY_FOLLOWERS=1)
+    def test_celebrity_posts(self):
+        """
+        Test if posts of followed celebrities are pulled into the following feed
+        """
+        User.objects.filter(id=self.user2.id).update(celebrity=True)
+        Post.objects.create(user=self.user2, text="not fanned out")
+        graph.load()
+        self.client.force_login(self.user1)
+
+        response = self.client.get(reverse("network:api:following_posts", args=[1]))
+        self.assertEqual(
+            [post["text"] for post in response.json()["posts"]], ["not fanned out"]
+        )
@@ -0,0 +1,242 @@
+import pytest
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from network import tags
+from network.models import Comment, Post, TimelineEntry, User
+
+# Number of posts seeded before running every operation, each one with a
+# comment thread three levels deep
+SIZES = (1, 10, 100)
+
+
+@pytest.fixture(autouse=True)
+def whitenoise_autorefresh(settings):
+    """
+    Get rid of whitenoise "No directory at" warning, as it's not helpful when running tests.
+
+    Related:
+        - https://github.com/evansd/whitenoise/issues/215
+        - https://github.com/evansd/whitenoise/issues/191
+        - https://github.com/evansd/whitenoise/commit/4204494d44213f7a51229de8bc224cf6d84c01eb
+    """
+    settings.WHITENOISE_AUTOREFRESH = True
+
+
+@override_settings(NETWORK_TASKS_EAGER=True)
+class QueryBudgetTest(TestCase):
+    """
+    Every API operation must run a fixed number of queries, whatever the
+    number of posts, comments and likes. An N+1 query shows up as a count
+    growing with the seeded size.
+
+    Budgets include the session and user lookups of the authenticated client.
+    Update them when an operation legitimately needs more queries, never to
+    absorb a count that depends on the size.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user1 = User.objects.create_user(  # type: ignore
+            username="user1", password="password", email="user1@email.com"
+        )
+        cls.user2 = User.objects.create_user(  # type: ignore
+            username="user2", password="password", email="user2@email.com"
+        )
+        cls.user3 = User.objects.create_user(  # type: ignore
+            username="user3", password="password", email="user3@email.com"
+        )
+        cls.user1.following.add(cls.user2)
+        cls.own_post = Post.objects.create(user=cls.user1, text="Post by user1")
+
+    def setUp(self):
+        self.client.login(username="user1", password="password")
+
+    def seed(self, size: int):
+        """
+        Add posts by user2 until there are "size" of them. Every other post is
+        liked by user1.
+
+        The like and follow toggles find the same state at every size: the
+        liked post is the latest one not liked yet, and user3 isn't followed.
+        """
+        start = Post.objects.filter(user=self.user2).count()
+        posts = Post.objects.bulk_create(
+            [
+                Post(user=self.user2, text=f"Post {i} #budget @user1", like_count=i % 2)
+                for i in range(start, size)
+            ]
+        )
+        Post.liked_by.through.objects.bulk_create(
+            [
+                Post.liked_by.through(post_id=post.id, user_id=self.user1.id)
+                for post in posts
+                if post.like_count
+            ]
+        )
+        TimelineEntry.objects.bulk_create(
+            [
+                TimelineEntry(
+                    user=self.user1, post=post, publication_date=post.publication_date
+                )
+                for post in posts
+            ]
+        )
+
+        parents: list = [None] * len(posts)
+        for depth, user in enumerate([self.user1, self.user2, self.user1]):
+            parents = Comment.objects.bulk_create(
+                [
+                    Comment(
+                        post=post,
+                        user=user,
+                        text=f"Comment #budget {depth}",
+                        parent_comment=parent,
+                        reply=parent is not None,
+                    )
+                    for post, parent in zip(posts, parents)
+                ]
+            )
+
+        tags.rebuild()
+        self.user1.following.remove(self.user3)
+        self.post = (
+            Post.objects.filter(user=self.user2)
+            .exclude(liked_by=self.user1)
+            .latest("publication_date")
+        )
+
+    def operations(self):
+        """
+        (name, budget, operation) of every API operation.
+        """
+        post_id, own_post_id = self.post.id, self.own_post.id
+        get, post = self.client.get, self.client.post
+
+        def json_post(name, data):
+            return post(reverse(name), data, content_type="application/json")
+
+        return [
+            ("all_posts", 8, lambda: get(reverse("network:api:all_posts", args=[1]))),
+            ("all_posts_cursor", 6, lambda: get(reverse("network:api:all_posts_cursor"))),
+            # Followed celebrities and the timeline range are read before the
+            # posts, see timeline.FollowingFeed
+            (
+                "following_posts",
+                9,
+                lambda: get(reverse("network:api:following_posts", args=[1])),
+            ),
+            (
+                "following_posts_cursor",
+                8,
+                lambda: get(reverse("network:api:following_posts_cursor")),
+            ),
+            (
+                "profile",
+                9,
+                lambda: get(reverse("network:api:profile", args=["user2", 1])),
+            ),
+            (
+                "profile_cursor",
+                8,
+                lambda: get(reverse("network:api:profile_cursor", args=["user2"])),
+            ),
+            (
+                "search",
+                7,
+                lambda: get(reverse("network:api:search"), {"q": "budget"}),
+            ),
+            (
+                "tag_posts",
+                6,
+                lambda: get(reverse("network:api:tag_posts", args=["budget"])),
+            ),
+            ("mention_posts", 6, lambda: get(reverse("network:api:mention_posts"))),
+            (
+                "new_post",
+                10,
+                lambda: json_post("network:api:new_post", {"text": "New #budget post"}),
+            ),
+            (
+                "edit_post",
+                8,
+                lambda: json_post(
+                    "network:api:edit_post",
+                    {"postID": own_post_id, "text": "Edited post"},
+                ),
+            ),
+            (
+                "new_comment",
+                14,
+                lambda: json_post(
+                    "network:api:new_comment", {"postID": post_id, "text": "New comment"}
+                ),
+            ),
+            (
+                "like_post",
+                9,
+                lambda: self.client.patch(
+                    reverse("network:api:like_post", args=[post_id])
+                ),
+            ),
+            # With the follower's suggestions refresh, run eagerly
+            ("follow", 15, lambda: post(reverse("network:api:follow", args=["user3"]))),
+            ("suggestions", 3, lambda: get(reverse("network:api:suggestions"))),
+            (
+                "batch",
+                12,
+                lambda: json_post(
+                    "network:api:batch",
+                    {
+                        "actions": [
+                            {"type": "like", "postID": post_id},
+                            {"type": "follow", "username": "user3"},
+                        ]
+                    },
+                ),
+            ),
+            (
+                "update_profile",
+                5,
+                lambda: post(
+                    reverse("network:api:update_profile"),
+                    {"username": "user1", "email": "user1@email.com", "about": "Hi"},
+                ),
+            ),
+        ]
+
+    def test_query_budgets(self):
+        counts: dict[str, dict[int, int]] = {}
+
+        for size in SIZES:
+            self.seed(size)
+
+            for name, budget, operation in self.operations():
+                with CaptureQueriesContext(connection) as queries:
+                    response = operation()
+
+                self.assertEqual(response.status_code, 200, f"{name}: {response.content}")
+                counts.setdefault(name, {})[size] = len(queries)
+
+                with self.subTest(operation=name, size=size):
+                    if len(queries) > budget:
+                        self.fail(
+                            f"{name} ran {len(queries)} queries with {size} posts, "
+                            f"over its budget of {budget}:\n{captured_sql(queries)}"
+                        )
+
+        for name, by_size in counts.items():
+            with self.subTest(operation=name):
+                self.assertEqual(
+                    len(set(by_size.values())),
+                    1,
+                    f"{name} query count depends on the number of posts: {by_size}",
+                )
+
+
+def captured_sql(queries: CaptureQueriesContext) -> str:
+    return "\n".join(
+        f"{i}. {query['sql']}" for i, query in enumerate(queries.captured_queries, 1)
+    )
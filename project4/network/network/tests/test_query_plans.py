@@ -0,0 +1,166 @@
+import re
+
+import pytest
+from django.test import TestCase
+
+from network.models import Comment, Post, Suggestion, User
+from network.pagination import cursor_page_query, encode_cursor
+
+Follow = User.following.through
+Like = Post.liked_by.through
+
+# Tables read in full, instead of through an index
+FULL_SCAN = re.compile(r"SCAN \w+( AS \w+)?")
+
+
+@pytest.fixture(autouse=True)
+def whitenoise_autorefresh(settings):
+    """
+    Get rid of whitenoise "No directory at" warning, as it's not helpful when running tests.
+
+    Related:
+        - https://github.com/evansd/whitenoise/issues/215
+        - https://github.com/evansd/whitenoise/issues/191
+        - https://github.com/evansd/whitenoise/commit/4204494d44213f7a51229de8bc224cf6d84c01eb
+    """
+    settings.WHITENOISE_AUTOREFRESH = True
+
+
+def plan(queryset) -> list[str]:
+    # EXPLAIN QUERY PLAN rows are "<id> <parent> <notused> <detail>"
+    return [row.split(" ", 3)[3] for row in queryset.explain().splitlines()]
+
+
+class QueryPlanTest(TestCase):
+    """
+    Check the plans of the manager queries, so a changed query or a dropped
+    index doesn't silently bring back full scans and sorts.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user1 = User.objects.create_user(  # type: ignore
+            username="user1", password="password", email="user1@email.com"
+        )
+        cls.user2 = User.objects.create_user(  # type: ignore
+            username="user2", password="password", email="user2@email.com"
+        )
+        cls.post1 = Post.objects.create(user=cls.user1, text="post 1")
+        cls.post2 = Post.objects.create(user=cls.user2, text="post 2")
+
+    def assertPlan(self, queryset, index: str, sorted_by_index: bool = True):
+        """
+        Assert the query reads "index" and no table in full. With
+        "sorted_by_index", the index order must also spare any sort.
+        """
+        details = plan(queryset)
+        message = "\n".join(details)
+
+        self.assertFalse(
+            [detail for detail in details if FULL_SCAN.fullmatch(detail)], message
+        )
+        self.assertTrue(any(index in detail for detail in details), message)
+        if sorted_by_index:
+            self.assertFalse(
+                [detail for detail in details if "USE TEMP B-TREE" in detail], message
+            )
+
+    def test_feeds(self):
+        cursor = encode_cursor(self.post2)
+        key = (self.post2.publication_date, self.post2.id)
+        following = Post.objects.fetch_following_posts(self.user1)
+        cases = {
+            "all_posts": (Post.objects.fetch_all_posts()[:10], "post_date_idx"),
+            "all_posts_cursor": (
+                cursor_page_query(Post.objects.fetch_all_posts(), cursor),
+                "post_date_idx",
+            ),
+            "profile": (
+                Post.objects.fetch_user_posts(self.user1)[:10],
+                "post_user_date_idx",
+            ),
+            "profile_cursor": (
+                cursor_page_query(Post.objects.fetch_user_posts(self.user1), cursor),
+                "post_user_date_idx",
+            ),
+            # The reads merged by following_posts, see timeline.FollowingFeed
+            "following_timeline": (following._timeline(11), "timeline_user_date_idx"),
+            "following_timeline_cursor": (
+                following.after(key)._timeline(11),
+                "timeline_user_date_idx",
+            ),
+            # Counted for page number pagination, without sorting
+            "following_count": (following._matching(), "timelineentry"),
+            "following_pulls": (
+                following.after(key)._pulled([self.user1.id, self.user2.id], 11),
+                "post_user_date_idx",
+            ),
+            "suggestions": (
+                Suggestion.objects.fetch_suggestions(self.user1),
+                "suggestion_user_rank_idx",
+            ),
+        }
+
+        for name, (queryset, index) in cases.items():
+            with self.subTest(name):
+                self.assertPlan(queryset, index)
+
+    def test_id_set_feeds(self):
+        """
+        These feeds collect the ids of matching posts first, then sort them by
+        date. The sort is bounded by the matches, unlike a walk of the date index.
+        """
+        cases = {
+            "tag_posts": (
+                Post.objects.fetch_tag_posts("tag")[:10],
+                "hashtag_name_post_idx",
+            ),
+            "mention_posts": (
+                Post.objects.fetch_mention_posts(self.user1)[:10],
+                "mention_user_post_idx",
+            ),
+        }
+
+        for name, (queryset, index) in cases.items():
+            with self.subTest(name):
+                self.assertPlan(queryset, index, sorted_by_index=False)
+
+    def test_comments(self):
+        comments = Comment.objects._posts_comments([self.post1, self.post2])
+        self.assertPlan(comments, "comment_post_date_idx")
+
+    def test_through_tables(self):
+        user_ids = [self.user1.id, self.user2.id]
+        cases = {
+            "viewer_likes": (
+                Post.objects._viewer_likes([self.post1, self.post2], self.user1),
+                "COVERING INDEX network_post_liked_by_post_id_user_id",
+            ),
+            "viewer_follows": (
+                User.objects._followed_among(self.user1, set(user_ids)),
+                "COVERING INDEX network_user_following_from_user_id_to_user_id",
+            ),
+            "user_likes": (
+                Like.objects.filter(user_id=self.user1.id).values_list(
+                    "post_id", flat=True
+                ),
+                "COVERING INDEX post_liked_by_user_post_idx",
+            ),
+            # Follower ids read by timeline.fan_out_post
+            "followers": (
+                Follow.objects.filter(to_user_id=self.user1.id).values_list(
+                    "from_user_id", flat=True
+                ),
+                "COVERING INDEX user_following_to_from_idx",
+            ),
+            "is_following": (
+                Follow.objects.filter(
+                    from_user_id=self.user1.id, to_user_id__in=user_ids
+                ),
+                "network_user_following_from_user_id_to_user_id",
+            ),
+        }
+
+        for name, (queryset, index) in cases.items():
+            with self.subTest(name):
+                self.assertPlan(queryset, index)
@@ -0,0 +1,148 @@
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import connections, router
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from network.models import Post, User
+from network.replication import replicate
+from network.routers import PIN_COOKIE, replica_reads
+
+
+@pytest.fixture(autouse=True)
+def whitenoise_autorefresh(settings):
+    """
+    Get rid of whitenoise "No directory at" warning, as it's not helpful when running tests.
+
+    Related:
+        - https://github.com/evansd/whitenoise/issues/215
+        - https://github.com/evansd/whitenoise/issues/191
+        - https://github.com/evansd/whitenoise/commit/4204494d44213f7a51229de8bc224cf6d84c01eb
+    """
+    settings.WHITENOISE_AUTOREFRESH = True
+
+
+@replica_reads
+def read_databases(request):
+    return router.db_for_read(Post), router.db_for_read(Session)
+
+
+@replica_reads
+async def aread_databases(request):
+    return router.db_for_read(Post), router.db_for_read(Session)
+
+
+@override_settings(NETWORK_READ_REPLICAS=["replica1", "replica2"])
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        self.request = RequestFactory().get("/")
+
+    def test_replica_reads(self):
+        """
+        Test if only the network models of decorated operations read from a replica
+        """
+        views = {"sync": read_databases, "async": async_to_sync(aread_databases)}
+        for name, view in views.items():
+            with self.subTest(name):
+                network_db, session_db = view(self.request)
+                self.assertIn(network_db, ["replica1", "replica2"])
+                self.assertEqual(session_db, "default")
+
+        self.assertEqual(router.db_for_read(Post), "default")
+        self.assertEqual(router.db_for_write(Post), "default")
+
+    def test_pinned(self):
+        self.request.COOKIES[PIN_COOKIE] = str(time.time() + 5)
+        self.assertEqual(read_databases(self.request), ("default", "default"))
+
+        # Expired
+        self.request.COOKIES[PIN_COOKIE] = str(time.time() - 1)
+        self.assertIn(read_databases(self.request)[0], ["replica1", "replica2"])
+
+    @override_settings(NETWORK_READ_REPLICAS=[])
+    def test_no_replicas(self):
+        self.assertEqual(read_databases(self.request), ("default", "default"))
+
+
+class ReplicaTest(TransactionTestCase):
+    """
+    Reads against a replica file, copied from the test database by the
+    replication stand-in. Not a TestCase, as SQLite can't back up a database
+    from inside a transaction.
+    """
+
+    databases = {"default", "replica"}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        connections.settings["replica"] = {
+            **connections["default"].settings_dict,
+            "NAME": str(Path(cls.directory.name) / "replica.sqlite3"),
+        }
+        cls.enterClassContext(override_settings(NETWORK_READ_REPLICAS=["replica"]))
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections["replica"].close()
+        del connections["replica"]
+        del connections.settings["replica"]
+        cls.directory.cleanup()
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(  # type: ignore
+            username="user1", password="password", email="user1@email.com"
+        )
+        Post.objects.create(user=self.user, text="replicated post")
+        replicate()
+        self.client.force_login(self.user)
+
+    def feed(self, client):
+        response = client.get(reverse("network:api:all_posts", args=[1]))
+        return [post["text"] for post in response.json()["posts"]]
+
+    def test_reads_from_replica(self):
+        Post.objects.create(user=self.user, text="not replicated yet")
+
+        self.assertEqual(self.feed(self.client), ["replicated post"])
+        # Writes go to the primary
+        self.assertEqual(Post.objects.using("default").count(), 2)
+
+    def test_anonymous_feed_cache(self):
+        """
+        Test if anonymous cache misses are built from the primary, so a lagging
+        replica isn't cached under the generation the write bumped
+        """
+        Post.objects.create(user=self.user, text="not replicated yet")
+        self.assertEqual(
+            self.feed(self.client_class()), ["not replicated yet", "replicated post"]
+        )
+
+    def test_read_your_writes(self):
+        response = self.client.post(
+            reverse("network:api:new_post"),
+            {"text": "my new post"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        self.assertEqual(self.feed(self.client), ["my new post", "replicated post"])
+        # Other clients read from the replica until it catches up
+        other = self.client_class()
+        other.force_login(self.user)
+        self.assertEqual(self.feed(other), ["replicated post"])
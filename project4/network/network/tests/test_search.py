@@ -0,0 +1,103 @@
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from network.models import Comment, Post, User
+
+
+@pytest.fixture(autouse=True)
+def whitenoise_autorefresh(settings):
+    """
+    Get rid of whitenoise "No directory at" warning, as it's not helpful when running tests.
+
+    Related:
+        - https://github.com/evansd/whitenoise/issues/215
+        - https://github.com/evansd/whitenoise/issues/191
+        - https://github.com/evansd/whitenoise/commit/4204494d44213f7a51229de8bc224cf6d84c01eb
+    """
+    settings.WHITENOISE_AUTOREFRESH = True
+
+
+@override_settings(NETWORK_TASKS_EAGER=True)
+class SearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user1 = User.objects.create_user(  # type: ignore
+            username="user1", password="password", email="user1@email.com"
+        )
+        cls.post1 = Post.objects.create(user=cls.user1, text="Mountains, more mountains")
+        cls.post2 = Post.objects.create(user=cls.user1, text="A day at the beach")
+        cls.comment = Comment.objects.create(
+            post=cls.post2, user=cls.user1, text="Next time, the mountains!"
+        )
+
+    def search(self, q, cursor=None):
+        params = {"q": q, "cursor": cursor} if cursor else {"q": q}
+        response = self.client.get(reverse("network:api:search"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_search(self):
+        """
+        Test if posts match by their text or their comments, best match first
+        """
+        resp_json = self.search("mountain")
+
+        self.assertListEqual(
+            [post["id"] for post in resp_json["posts"]], [self.post1.id, self.post2.id]
+        )
+        self.assertEqual(resp_json["posts"][1]["comments"][0]["id"], self.comment.id)
+        self.assertIsNone(resp_json["nextCursor"])
+
+        # Every term must match, the last one as a prefix
+        self.assertListEqual(
+            [post["id"] for post in self.search("beach da")["posts"]], [self.post2.id]
+        )
+        # FTS5 syntax is searched as plain words
+        self.assertListEqual(self.search('beach" OR (')["posts"], [])
+        self.assertListEqual(self.search("  ")["posts"], [])
+
+    def test_search_index_sync(self):
+        """
+        Test if edits and deletions are reflected in the search table
+        """
+        Post.objects.filter(id=self.post1.id).update(text="Walking in the forest")
+        self.comment.delete()
+        self.assertListEqual(self.search("mountains")["posts"], [])
+
+        Post.objects.bulk_create([Post(user=self.user1, text="Mountains again")])
+        self.assertEqual(len(self.search("mountains")["posts"]), 1)
+
+        self.post2.delete()
+        self.assertListEqual(self.search("beach")["posts"], [])
+
+    def test_search_cursor(self):
+        Post.objects.bulk_create(
+            [Post(user=self.user1, text=f"mountains {i}") for i in range(20)]
+        )
+
+        seen_ids = []
+        cursor = None
+        for _ in range(3):
+            resp_json = self.search("mountains", cursor)
+            seen_ids += [post["id"] for post in resp_json["posts"]]
+            cursor = resp_json["nextCursor"]
+
+        self.assertIsNone(cursor)
+        self.assertEqual(len(seen_ids), 22)
+        self.assertEqual(len(set(seen_ids)), 22)
+
+        response = self.client.get(
+            reverse("network:api:search"), {"q": "mountains", "cursor": "invalid"}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_rebuild_command(self):
+        with connection.cursor() as db:
+            db.execute("DELETE FROM network_search")
+        self.assertListEqual(self.search("mountains")["posts"], [])
+
+        call_command("rebuild_search_index", verbosity=0)
+        self.assertEqual(len(self.search("mountains")["posts"]), 2)
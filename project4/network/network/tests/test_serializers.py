@@ -0,0 +1,112 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from network import api_views
+from network.models import Comment, Post, User
+from network.serializers import SerializationMismatch, check
+
+
+@pytest.fixture(autouse=True)
+def whitenoise_autorefresh(settings):
+    """
+    Get rid of whitenoise "No directory at" warning, as it's not helpful when running tests.
+
+    Related:
+        - https://github.com/evansd/whitenoise/issues/215
+        - https://github.com/evansd/whitenoise/issues/191
+        - https://github.com/evansd/whitenoise/commit/4204494d44213f7a51229de8bc224cf6d84c01eb
+    """
+    settings.WHITENOISE_AUTOREFRESH = True
+
+
+@override_settings(NETWORK_TASKS_EAGER=True, NETWORK_SERIALIZATION_CHECK=True)
+class SerializersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user1 = User.objects.create_user(  # type: ignore
+            username="user1", password="password", email="user1@email.com"
+        )
+        cls.user2 = User.objects.create_user(  # type: ignore
+            username="user2",
+            password="password",
+            email="user2@email.com",
+            about="About me",
+        )
+        # Skips the photo validation done on save. Sets last_login, required by
+        # UserOut as well
+        User.objects.filter(id=cls.user2.id).update(
+            last_login=timezone.now(),
+            photo="profile_pics/user2.png",
+            photo_variants={"48": {"webp": "profile_pics/user2-48.webp"}},
+        )
+        cls.user1.following.add(cls.user2)
+
+        post1 = Post.objects.create(user=cls.user1, text="Hello #django @user2")
+        cls.post2 = Post.objects.create(user=cls.user2, text="Mountains", edited=True)
+        Post.objects.toggle_like(cls.post2, cls.user1)
+        comment = Comment.objects.create(post=cls.post2, user=cls.user1, text="Nice one")
+        Comment.objects.create(
+            post=cls.post2, user=cls.user2, text="Thanks", parent_comment=comment
+        )
+        Comment.objects.create(post=post1, user=cls.user2, text="#django indeed")
+
+    def setUp(self):
+        self.client.login(username="user1", password="password")
+
+    def urls(self):
+        return [
+            reverse("network:api:all_posts", args=[1]),
+            reverse("network:api:all_posts_cursor"),
+            reverse("network:api:following_posts", args=[1]),
+            reverse("network:api:following_posts_cursor"),
+            reverse("network:api:profile", args=["user2", 1]),
+            reverse("network:api:profile_cursor", args=["user2"]),
+            reverse("network:api:search") + "?q=mountains",
+            reverse("network:api:tag_posts", args=["django"]),
+            reverse("network:api:mention_posts"),
+        ]
+
+    def test_schema_equivalence(self):
+        """
+        Test if every fast path endpoint renders the same document as the schemas
+        """
+        for url in self.urls():
+            with self.subTest(url=url):
+                fast = self.client.get(url)
+                with override_settings(NETWORK_FAST_SERIALIZATION=False):
+                    expected = self.client.get(url)
+
+                self.assertEqual(fast.status_code, 200)
+                self.assertEqual(fast.content, expected.content)
+                self.assertEqual(fast.get("ETag"), expected.get("ETag"))
+
+        self.client.logout()
+        response = self.client.get(reverse("network:api:all_posts", args=[1]))
+        self.assertEqual(len(response.json()["posts"]), 2)
+
+    def test_async_equivalence(self):
+        request = RequestFactory().get("/")
+        request.user = self.user1
+
+        for view, args in [
+            (api_views.get_all_posts_async, [1]),
+            (api_views.following_posts_cursor_async, []),
+            (api_views.profile_cursor_async, ["user2"]),
+            (api_views.tag_posts_async, ["django"]),
+        ]:
+            with self.subTest(view=view.__name__):
+                fast = async_to_sync(view)(request, HttpResponse(), *args)
+                with override_settings(NETWORK_FAST_SERIALIZATION=False):
+                    data = async_to_sync(view)(request, HttpResponse(), *args)
+                self.assertNotIsInstance(data, HttpResponse)
+                self.assertEqual(fast.status_code, 200)
+
+    def test_check(self):
+        check({"likes": 1, "posts": []}, {"likes": 1, "posts": []})
+        # Equal in Python, not once encoded
+        with self.assertRaises(SerializationMismatch):
+            check({"edited": 1}, {"edited": True})
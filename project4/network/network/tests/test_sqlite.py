@@ -0,0 +1,75 @@
+import tempfile
+from pathlib import Path
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import TestCase, override_settings
+
+from network.sqlite import read_pragmas
+from project4 import settings_production
+
+
+@pytest.fixture(autouse=True)
+def whitenoise_autorefresh(settings):
+    """
+    Get rid of whitenoise "No directory at" warning, as it's not helpful when running tests.
+
+    Related:
+        - https://github.com/evansd/whitenoise/issues/215
+        - https://github.com/evansd/whitenoise/issues/191
+        - https://github.com/evansd/whitenoise/commit/4204494d44213f7a51229de8bc224cf6d84c01eb
+    """
+    settings.WHITENOISE_AUTOREFRESH = True
+
+
+class SQLitePragmaTest(TestCase):
+    def file_database_pragmas(self, names: list[str]) -> dict:
+        with tempfile.TemporaryDirectory() as directory:
+            file_connection = DatabaseWrapper(
+                {**connection.settings_dict, "NAME": str(Path(directory) / "db.sqlite3")},
+                alias="pragma_test",
+            )
+            try:
+                return read_pragmas(file_connection, names)
+            finally:
+                file_connection.close()
+
+    def test_connection_pragmas(self):
+        """
+        Test if new connections are tuned, the test database included
+        """
+        pragmas = read_pragmas(connection, ["synchronous", "busy_timeout", "temp_store"])
+        # NORMAL and MEMORY
+        self.assertDictEqual(
+            pragmas, {"synchronous": 1, "busy_timeout": 5000, "temp_store": 2}
+        )
+
+    def test_file_database(self):
+        """
+        Test if a database file is tuned, without switching it to WAL mode
+        """
+        pragmas = self.file_database_pragmas(["journal_mode", "mmap_size"])
+
+        self.assertDictEqual(
+            pragmas, {"journal_mode": "delete", "mmap_size": 256 * 1024 * 1024}
+        )
+
+    def test_production_wal(self):
+        with override_settings(
+            NETWORK_SQLITE_PRAGMAS=settings_production.NETWORK_SQLITE_PRAGMAS
+        ):
+            pragmas = self.file_database_pragmas(["journal_mode", "synchronous"])
+
+        self.assertDictEqual(pragmas, {"journal_mode": "wal", "synchronous": 1})
+
+    @override_settings(NETWORK_SQLITE_PRAGMAS={})
+    def test_disabled(self):
+        pragmas = self.file_database_pragmas(["journal_mode"])
+
+        self.assertEqual(pragmas["journal_mode"], "delete")
+
+    def test_benchmark_needs_benchmark_settings(self):
+        with self.assertRaisesMessage(CommandError, "settings_benchmark"):
+            call_command("benchmark_sqlite")
@@ -0,0 +1,169 @@
+from io import StringIO
+from unittest import mock
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from network.models import Post, Suggestion, User
+from network.suggestions import (
+    rebuild_suggestions,
+    refresh_stale_suggestions,
+    refresh_suggestions,
+)
+
+
+@pytest.fixture(autouse=True)
+def whitenoise_autorefresh(settings):
+    """
+    Get rid of whitenoise "No directory at" warning, as it's not helpful when running tests.
+
+    Related:
+        - https://github.com/evansd/whitenoise/issues/215
+        - https://github.com/evansd/whitenoise/issues/191
+        - https://github.com/evansd/whitenoise/commit/4204494d44213f7a51229de8bc224cf6d84c01eb
+    """
+    settings.WHITENOISE_AUTOREFRESH = True
+
+
+@override_settings(NETWORK_TASKS_EAGER=True)
+class SuggestionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user1, cls.user2, cls.user3, cls.user4, cls.user5, cls.user6 = [
+            User.objects.create_user(  # type: ignore
+                username=f"user{i}", password="password", email=f"user{i}@email.com"
+            )
+            for i in range(1, 7)
+        ]
+        # user1 follows user2 and user3, who both follow user4, and user2
+        # follows user5 and user6
+        cls.user1.following.add(cls.user2, cls.user3)
+        cls.user2.following.add(cls.user4, cls.user5, cls.user6)
+        cls.user3.following.add(cls.user4, cls.user1)
+        Post.objects.create(user=cls.user6, text="recent post")
+
+    def suggested(self, user: User) -> list[tuple[str, int]]:
+        return [
+            (suggestion.suggested.username, suggestion.mutuals)
+            for suggestion in Suggestion.objects.fetch_suggestions(user)
+        ]
+
+    def test_rebuild(self):
+        """
+        Test if accounts are ranked by mutual follows, then recent posts
+        """
+        rebuild_suggestions()
+
+        self.assertEqual(
+            self.suggested(self.user1), [("user4", 2), ("user6", 1), ("user5", 1)]
+        )
+        # Followed accounts and the user themselves are never suggested
+        self.assertEqual(self.suggested(self.user3), [("user2", 1)])
+        self.assertEqual(self.suggested(self.user4), [])
+
+    @override_settings(NETWORK_SUGGESTIONS_LIMIT=2)
+    def test_limit(self):
+        rebuild_suggestions()
+        self.assertEqual(self.suggested(self.user1), [("user4", 2), ("user6", 1)])
+
+    def test_refresh(self):
+        """
+        Test if following someone marks the follower's suggestions stale, until
+        they are refreshed
+        """
+        rebuild_suggestions()
+        self.user1.following.add(self.user4)
+        self.assertIsNotNone(User.objects.get(id=self.user1.id).suggestions_stale_at)
+        self.assertEqual(refresh_stale_suggestions(), 1)
+        self.assertNotIn("user4", dict(self.suggested(self.user1)))
+        self.assertIsNone(User.objects.get(id=self.user1.id).suggestions_stale_at)
+
+        self.user1.following.remove(self.user2)
+        refresh_stale_suggestions()
+        self.assertEqual(self.suggested(self.user1), [])
+
+        # Same as a rebuild
+        self.user1.following.add(self.user2)
+        self.user1.following.remove(self.user4)
+        self.assertEqual(refresh_stale_suggestions(), 1)
+        refreshed = self.suggested(self.user1)
+        rebuild_suggestions()
+        self.assertEqual(refreshed, self.suggested(self.user1))
+        self.assertEqual(refresh_stale_suggestions(), 0)
+
+    @override_settings(NETWORK_FOLLOW_GRAPH=True)
+    def test_refresh_ignores_graph(self):
+        """
+        Test if refreshes read the follow table, not a stale in-process graph
+        """
+        from network.graph import graph
+
+        graph.load()
+        self.addCleanup(graph.reset)
+        # Made by another process, without signals
+        User.following.through.objects.create(
+            from_user_id=self.user3.id, to_user_id=self.user5.id
+        )
+
+        refresh_suggestions(self.user1.id)
+        self.assertEqual(
+            self.suggested(self.user1), [("user4", 2), ("user5", 2), ("user6", 1)]
+        )
+
+    @override_settings(NETWORK_TASKS_EAGER=False)
+    def test_follow_toggles(self):
+        """
+        Test if follow requests don't leave suggestion writes to the task pool,
+        which would fail the next follow with "database is locked"
+        """
+        rebuild_suggestions()
+        self.client.force_login(self.user1)
+        url = reverse("network:api:follow", args=["user4"])
+
+        with mock.patch("network.tasks._executor") as executor:
+            for _ in range(10):
+                with self.captureOnCommitCallbacks(execute=True):
+                    response = self.client.post(url)
+                self.assertEqual(response.status_code, 200)
+
+        submitted = [call.args[1] for call in executor.submit.call_args_list]
+        self.assertNotIn(refresh_suggestions, submitted)
+        self.assertEqual(refresh_stale_suggestions(), 1)
+
+    def test_api(self):
+        """
+        Test if the suggestions are served from a single query on their table
+        """
+        rebuild_suggestions()
+        self.client.force_login(self.user1)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("network:api:suggestions"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(user["username"], user["mutuals"]) for user in response.json()],
+            [("user4", 2), ("user6", 1), ("user5", 1)],
+        )
+        self.assertEqual(response.json()[0]["followersCount"], 2)
+        suggestion_queries = [
+            query for query in queries if "network_suggestion" in query["sql"]
+        ]
+        self.assertEqual(len(suggestion_queries), 1)
+
+    def test_api_requires_login(self):
+        response = self.client.get(reverse("network:api:suggestions"))
+        self.assertEqual(response.status_code, 401)
+
+    def test_command(self):
+        out = StringIO()
+        call_command("rebuild_suggestions", stdout=out)
+        self.assertIn(f"Saved {Suggestion.objects.count()} suggestions.", out.getvalue())
+
+        self.user1.following.add(self.user4)
+        call_command("rebuild_suggestions", "--stale", stdout=out)
+        self.assertIn("Refreshed the suggestions of 1 users.", out.getvalue())
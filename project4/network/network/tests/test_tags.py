@@ -0,0 +1,127 @@
+import pytest
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from network.models import Hashtag, Mention, Post, User
+from network.tags import extract_hashtags, extract_mentions
+
+
+@pytest.fixture(autouse=True)
+def whitenoise_autorefresh(settings):
+    """
+    Get rid of whitenoise "No directory at" warning, as it's not helpful when running tests.
+
+    Related:
+        - https://github.com/evansd/whitenoise/issues/215
+        - https://github.com/evansd/whitenoise/issues/191
+        - https://github.com/evansd/whitenoise/commit/4204494d44213f7a51229de8bc224cf6d84c01eb
+    """
+    settings.WHITENOISE_AUTOREFRESH = True
+
+
+@override_settings(NETWORK_TASKS_EAGER=True)
+class TagsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user1 = User.objects.create_user(  # type: ignore
+            username="user1", password="password", email="user1@email.com"
+        )
+        cls.user2 = User.objects.create_user(  # type: ignore
+            username="user2", password="password", email="user2@email.com"
+        )
+
+    def setUp(self):
+        self.client.login(username="user1", password="password")
+
+    def new_post(self, text):
+        response = self.client.post(
+            reverse("network:api:new_post"),
+            {"text": text},
+            content_type="application/json",
+        )
+        return Post.objects.get(id=response.json()["id"])
+
+    def test_extract(self):
+        self.assertSetEqual(
+            extract_hashtags("#Django and #python, not a#tag nor ##twice #django"),
+            {"django", "python"},
+        )
+        self.assertSetEqual(
+            extract_mentions("Thanks @user2. Mail me at user1@email.com, @user.name"),
+            {"user2", "user.name"},
+        )
+
+    def test_index_edit(self):
+        """
+        Test if edits only replace the hashtags and mentions that changed
+        """
+        post = self.new_post("Hello #Django #python @user2 @nobody")
+        self.assertSetEqual(
+            set(post.hashtags.values_list("name", flat=True)), {"django", "python"}
+        )
+        self.assertListEqual(
+            list(post.mentions.values_list("user__username", flat=True)), ["user2"]
+        )
+        django_tag = post.hashtags.get(name="django")
+
+        self.client.post(
+            reverse("network:api:edit_post"),
+            {"postID": post.id, "text": "Hello #django #ninja"},
+            content_type="application/json",
+        )
+
+        self.assertSetEqual(
+            set(post.hashtags.values_list("name", flat=True)), {"django", "ninja"}
+        )
+        # Unchanged rows are kept
+        self.assertTrue(Hashtag.objects.filter(id=django_tag.id).exists())
+        self.assertFalse(post.mentions.exists())
+
+    def test_tag_feed(self):
+        post1 = self.new_post("First #django post")
+        post2 = self.new_post("Second post")
+        self.new_post("Third post #python")
+        self.client.post(
+            reverse("network:api:new_comment"),
+            {"text": "Also #Django", "postID": post2.id},
+            content_type="application/json",
+        )
+
+        self.client.logout()
+        response = self.client.get(reverse("network:api:tag_posts", args=["Django"]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertListEqual(
+            [post["id"] for post in response.json()["posts"]], [post2.id, post1.id]
+        )
+
+    def test_mention_feed(self):
+        Post.objects.bulk_create(
+            [Post(user=self.user2, text=f"post {i}") for i in range(12)]
+        )
+        for i in range(12):
+            self.new_post(f"Hello @user2 {i}")
+        self.new_post("Hello @user1")
+
+        self.client.login(username="user2", password="password")
+        url = reverse("network:api:mention_posts")
+        resp_json = self.client.get(url).json()
+        self.assertEqual(len(resp_json["posts"]), 10)
+
+        resp_json = self.client.get(url, {"cursor": resp_json["nextCursor"]}).json()
+        self.assertEqual(len(resp_json["posts"]), 2)
+        self.assertIsNone(resp_json["nextCursor"])
+        self.assertEqual(resp_json["posts"][-1]["text"], "Hello @user2 0")
+
+    def test_rebuild_command(self):
+        self.new_post("#django @user2")
+        Post.objects.create(user=self.user1, text="Created outside the API #python")
+        Hashtag.objects.filter(name="django").delete()
+
+        call_command("rebuild_tag_index", verbosity=0)
+
+        self.assertSetEqual(
+            set(Hashtag.objects.values_list("name", flat=True)), {"django", "python"}
+        )
+        self.assertEqual(Mention.objects.count(), 1)
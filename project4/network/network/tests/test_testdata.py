@@ -0,0 +1,101 @@
+import pytest
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from network import tags
+from network.models import Comment, Hashtag, Post, TimelineEntry, User
+from network.testdata import Generator
+from network.timeline import rebuild_timelines
+
+
+@pytest.fixture(autouse=True)
+def whitenoise_autorefresh(settings):
+    """
+    Get rid of whitenoise "No directory at" warning, as it's not helpful when running tests.
+
+    Related:
+        - https://github.com/evansd/whitenoise/issues/215
+        - https://github.com/evansd/whitenoise/issues/191
+        - https://github.com/evansd/whitenoise/commit/4204494d44213f7a51229de8bc224cf6d84c01eb
+    """
+    settings.WHITENOISE_AUTOREFRESH = True
+
+
+@override_settings(NETWORK_CELEBRITY_FOLLOWERS=20)
+class TestDataTest(TestCase):
+    def snapshot(self):
+        return (
+            list(User.objects.order_by("id").values_list("username", "followers_count")),
+            list(
+                Post.objects.order_by("id").values_list("user_id", "text", "like_count")
+            ),
+            list(Comment.objects.order_by("id").values_list("parent_comment_id", "text")),
+        )
+
+    def test_generate(self):
+        """
+        Test if the generated network is consistent with what the app maintains
+        """
+        counts = Generator(users=100, seed=1).generate()
+
+        self.assertEqual(counts["users"], User.objects.count())
+        self.assertEqual(counts["posts"], 1000)
+        self.assertTrue(Comment.objects.filter(reply=True).exists())
+        # Power-law followers make celebrities
+        self.assertTrue(User.objects.filter(celebrity=True).exists())
+
+        # Denormalized counters
+        self.assertEqual(Post.objects.reconcile_like_counts(), 0)
+        self.assertEqual(User.objects.reconcile_follow_counts(), 0)
+
+        # Timelines and hashtag index
+        timelines = set(TimelineEntry.objects.values_list("user_id", "post_id"))
+        hashtags = set(Hashtag.objects.values_list("name", "post_id", "comment_id"))
+        rebuild_timelines()
+        tags.rebuild()
+        self.assertSetEqual(
+            timelines, set(TimelineEntry.objects.values_list("user_id", "post_id"))
+        )
+        self.assertSetEqual(
+            hashtags, set(Hashtag.objects.values_list("name", "post_id", "comment_id"))
+        )
+
+    @override_settings(NETWORK_TIMELINE_BACKFILL=5)
+    def test_timelines(self):
+        """
+        Test if capped timelines get the backfill horizon rebuild_timelines sets
+        """
+
+        def timelines():
+            return (
+                set(TimelineEntry.objects.values_list("user_id", "post_id")),
+                list(
+                    User.objects.order_by("id").values_list(
+                        "id", "timeline_complete_since"
+                    )
+                ),
+            )
+
+        Generator(users=100, seed=1).generate()
+        generated = timelines()
+        self.assertTrue(
+            User.objects.filter(timeline_complete_since__isnull=False).exists()
+        )
+
+        rebuild_timelines()
+        self.assertEqual(generated, timelines())
+
+    def test_deterministic(self):
+        Generator(users=50, seed=7).generate()
+        first = self.snapshot()
+        User.objects.all().delete()
+
+        Generator(users=50, seed=7).generate()
+        self.assertEqual(self.snapshot(), first)
+
+    def test_command(self):
+        call_command("generate_testdata", users=20, seed=2, verbosity=0)
+        self.assertEqual(User.objects.filter(username__startswith="user").count(), 20)
+
+        with self.assertRaisesMessage(CommandError, "already exist"):
+            call_command("generate_testdata", users=20)
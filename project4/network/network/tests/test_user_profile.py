@@ -1,6 +1,13 @@
+from io import BytesIO
+from tempfile import TemporaryDirectory
+
 import pytest
-from django.test import TestCase
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
 from django.utils import timezone
+from network import images
 from network.models import User
 
 
@@ -61,3 +68,81 @@ class UserProfileTests(TestCase):
         self.assertNotIn(self.user1, self.user2.followers.all())
         self.assertIn(self.user1, self.user3.following.all())
         self.assertNotIn(self.user1, self.user3.followers.all())
+
+    def test_follow_counts(self):
+        """
+        Test if the stored follow counters follow every kind of change
+        """
+
+        def counts(user):
+            user.refresh_from_db()
+            return user.following_count, user.followers_count
+
+        self.user1.following.add(self.user2, self.user3)
+        self.user1.following.add(self.user2)
+        self.assertEqual(counts(self.user1), (2, 0))
+        self.assertEqual(counts(self.user2), (0, 1))
+
+        self.user1.followers.add(self.user2)
+        self.assertEqual(counts(self.user1), (2, 1))
+        self.assertEqual(counts(self.user2), (1, 1))
+
+        # Removing a follow that doesn't exist changes nothing
+        self.user1.following.remove(self.user2, self.user1)
+        self.user3.following.remove(self.user2)
+        self.assertEqual(counts(self.user1), (1, 1))
+        self.assertEqual(counts(self.user2), (1, 0))
+        self.assertEqual(counts(self.user3), (0, 1))
+
+        # Blocked self follows don't count
+        self.user1.following.add(self.user1)
+        self.assertEqual(counts(self.user1), (1, 1))
+
+        self.user1.following.clear()
+        self.user1.followers.clear()
+        for user in (self.user1, self.user2, self.user3):
+            self.assertEqual(counts(user), (0, 0))
+
+    def test_reconcile_follow_counts(self):
+        self.user1.following.add(self.user2)
+        User.objects.filter(id=self.user2.id).update(followers_count=5)
+
+        self.assertEqual(User.objects.reconcile_follow_counts(), 1)
+        self.user2.refresh_from_db()
+        self.assertEqual(self.user2.followers_count, 1)
+        self.assertEqual(User.objects.reconcile_follow_counts(), 0)
+
+    def test_is_following(self):
+        self.user1.following.add(self.user2)
+
+        with self.assertNumQueries(1):
+            self.assertTrue(User.objects.is_following(self.user1, self.user2))
+        self.assertFalse(User.objects.is_following(self.user2, self.user1))
+
+    def test_photo_variants(self):
+        """
+        Test if resized variants are generated once per distinct photo
+        """
+        buffer = BytesIO()
+        Image.new("RGB", (800, 600), "red").save(buffer, "PNG")
+
+        with TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            for user in (self.user1, self.user2):
+                user.photo = SimpleUploadedFile("photo.png", buffer.getvalue())
+                user.save()
+                images.build_variants(user.id)
+                user.refresh_from_db()
+
+            self.assertEqual(set(self.user1.photo_variants), {"48", "128", "512"})
+            # Same picture, same files
+            self.assertEqual(self.user1.photo_variants, self.user2.photo_variants)
+
+            for size, paths in self.user1.photo_variants.items():
+                self.assertEqual(set(paths), {"webp", "jpeg"})
+                with default_storage.open(paths["webp"]) as variant:
+                    self.assertEqual(Image.open(variant).size, (int(size), int(size)))
+
+            _, variant_files = default_storage.listdir(
+                self.user1.photo_variants["48"]["webp"].rsplit("/", 1)[0]
+            )
+            self.assertEqual(len(variant_files), 6)
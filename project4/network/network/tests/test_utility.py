@@ -0,0 +1,129 @@
+from io import BytesIO
+from unittest import mock
+
+import magic
+import pytest
+from django.core.exceptions import ValidationError
+from django.core.files.base import File
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from network.models import User
+from network.utility import FileValidator
+
+
+@pytest.fixture(autouse=True)
+def whitenoise_autorefresh(settings):
+    """
+    Get rid of whitenoise "No directory at" warning, as it's not helpful when running tests.
+
+    Related:
+        - https://github.com/evansd/whitenoise/issues/215
+        - https://github.com/evansd/whitenoise/issues/191
+        - https://github.com/evansd/whitenoise/commit/4204494d44213f7a51229de8bc224cf6d84c01eb
+    """
+    settings.WHITENOISE_AUTOREFRESH = True
+
+
+class CountingBytesIO(BytesIO):
+    """
+    Keep track of how many bytes were read from the file.
+    """
+
+    bytes_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+def png_bytes(width=1000, height=1000):
+    buffer = BytesIO()
+    # Noise doesn't compress, so the file is bigger than the header window
+    Image.effect_noise((width, height), 100).convert("RGB").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class FileValidatorTests(TestCase):
+    def test_reads_header_only(self):
+        data = png_bytes()
+        stream = CountingBytesIO(data)
+        validator = FileValidator(max_size=5, content_types=("image/png",))
+
+        validator(File(stream, name="photo.png"))
+
+        self.assertLessEqual(stream.bytes_read, FileValidator.header_size)
+        self.assertGreater(len(data), FileValidator.header_size)
+        # Left ready to be saved
+        self.assertEqual(stream.tell(), 0)
+
+    def test_in_memory_upload_header(self):
+        """
+        Test if in-memory uploads, whose chunks() ignore the chunk size, are
+        only read up to the header too
+        """
+        upload = SimpleUploadedFile("photo.png", png_bytes(), content_type="image/png")
+        validator = FileValidator(max_size=5, content_types=("image/png",))
+
+        with mock.patch(
+            "network.utility.magic.from_buffer", wraps=magic.from_buffer
+        ) as from_buffer:
+            validator(upload)
+
+        self.assertEqual(len(from_buffer.call_args.args[0]), FileValidator.header_size)
+        self.assertEqual(upload.tell(), 0)
+
+    def test_content_type(self):
+        validator = FileValidator(content_types=("image/jpeg",))
+
+        with self.assertRaises(ValidationError) as error:
+            validator(SimpleUploadedFile("photo.jpg", png_bytes(10, 10)))
+        self.assertEqual(error.exception.code, "content_type")
+
+    def test_size_without_reported_size(self):
+        """
+        Test if the size is counted while streaming when the file doesn't report it
+        """
+
+        class UnsizedFile(File):
+            size = None
+
+        data = png_bytes()
+        validator = FileValidator(max_size=len(data) / 2 / 1024 / 1024)
+
+        with self.assertRaises(ValidationError) as error:
+            validator(UnsizedFile(BytesIO(data), name="photo.png"))
+        self.assertEqual(error.exception.code, "max_size")
+
+
+class MaxSizeUploadHandlerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user1 = User.objects.create_user(  # type: ignore
+            username="user1", password="password", email="user1@email.com"
+        )
+
+    @override_settings(NETWORK_MAX_UPLOAD_SIZE=1024)
+    def test_oversized_upload_skipped(self):
+        self.client.login(username="user1", password="password")
+
+        response = self.client.post(
+            reverse("network:api:update_profile"),
+            {
+                "username": "user1",
+                "email": "user1@email.com",
+                "about": "",
+                "photo": SimpleUploadedFile("photo.png", png_bytes()),
+            },
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["errors"]["photo"],
+            "File size must not be greater than 1.0\xa0KB.",
+        )
+        self.user1.refresh_from_db()
+        self.assertFalse(self.user1.photo)
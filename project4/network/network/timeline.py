@@ -0,0 +1,265 @@
+"""
+Fan-out on write home timelines.
+
+When a post is published it is pushed to the timeline of every follower of
+its author, so "following_posts" reads a range of the requesting user's rows
+from TimelineEntry. Authors with more than NETWORK_CELEBRITY_FOLLOWERS
+followers are flagged as celebrities: their posts are not pushed, and
+followers pull them at read time instead (see FollowingFeed).
+
+Following someone copies only their latest NETWORK_TIMELINE_BACKFILL posts.
+When there were more, the follower's User.timeline_complete_since is set to
+the date of the oldest copied post, and the following feed pulls the older
+posts of followed accounts from the post table, so it doesn't end early.
+"""
+from __future__ import annotations
+
+import heapq
+from datetime import datetime
+from functools import cached_property
+
+from django.conf import settings
+from django.db.models import Q, QuerySet
+
+from . import graph
+from .models import Post, TimelineEntry, User
+from .tasks import run_in_background
+
+Follow = User.following.through
+
+# Accounts pulled per query, each one is an OR'ed subquery
+PULL_BATCH_SIZE = 100
+
+
+def celebrity_threshold() -> int:
+    return getattr(settings, "NETWORK_CELEBRITY_FOLLOWERS", 10_000)
+
+
+def backfill_size() -> int:
+    return getattr(settings, "NETWORK_TIMELINE_BACKFILL", 200)
+
+
+def fan_out_post(post_id: int):
+    """
+    Push a post to the timelines of its author's followers.
+    """
+    post = Post.objects.select_related("user").get(id=post_id)
+    if post.user.celebrity:
+        return
+
+    follower_ids = Follow.objects.filter(to_user_id=post.user_id).values_list(
+        "from_user_id", flat=True
+    )
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=follower_id,
+                post_id=post.id,
+                publication_date=post.publication_date,
+            )
+            for follower_id in follower_ids.iterator()
+        ),
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+
+def backfill_follow(follower_id: int, followed_id: int):
+    """
+    Copy the latest posts of a newly followed account into the follower's
+    timeline.
+    """
+    if User.objects.filter(id=followed_id, celebrity=True).exists():
+        return
+
+    posts = Post.objects.filter(user_id=followed_id).order_by("-publication_date")
+    # One more than copied, to know if the backfill is capped
+    rows = list(posts.values_list("id", "publication_date")[: backfill_size() + 1])
+    copied = rows[: backfill_size()]
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=follower_id, post_id=post_id, publication_date=date)
+            for post_id, date in copied
+        ],
+        ignore_conflicts=True,
+    )
+
+    if len(rows) > len(copied):
+        horizon = copied[-1][1] if copied else rows[0][1]
+        User.objects.filter(id=follower_id).filter(
+            Q(timeline_complete_since__isnull=True)
+            | Q(timeline_complete_since__lt=horizon)
+        ).update(timeline_complete_since=horizon)
+
+
+def remove_follow(follower_id: int, followed_id: int):
+    TimelineEntry.objects.filter(user_id=follower_id, post__user_id=followed_id).delete()
+
+
+def update_celebrities(user_ids):
+    """
+    Flag accounts that crossed the celebrity threshold.
+
+    The flag is never cleared here, since their older posts were never fanned
+    out. "manage.py rebuild_timelines" recomputes it from scratch.
+    """
+    User.objects.filter(
+        id__in=user_ids, celebrity=False, followers_count__gt=celebrity_threshold()
+    ).update(celebrity=True)
+
+
+def follows_added(pairs: list[tuple[int, int]]):
+    update_celebrities({followed_id for _, followed_id in pairs})
+    for follower_id, followed_id in pairs:
+        run_in_background(backfill_follow, follower_id, followed_id)
+
+
+def follows_removed(pairs: list[tuple[int, int]]):
+    for follower_id, followed_id in pairs:
+        remove_follow(follower_id, followed_id)
+
+
+class FollowingFeed:
+    """
+    The posts of the accounts "user" follows, newest first.
+
+    Slices merge index range reads instead of sorting every followed post,
+    reading at most "stop" rows from each of:
+
+    - the user's TimelineEntry rows, by timeline_user_date_idx,
+    - every followed celebrity's posts, by post_user_date_idx,
+    - past User.timeline_complete_since, every followed account's posts.
+
+    Sliced like a QuerySet by Paginator and pagination.cursor_page_query,
+    which narrows it to the posts after a cursor with after().
+    """
+
+    def __init__(
+        self,
+        user: User,
+        key: tuple[datetime, int] | None = None,
+        fields: tuple[str, ...] = (),
+    ):
+        self.user = user
+        # "(publication_date, id)" of the post before the feed's first one
+        self.key = key
+        self.fields = fields
+
+    def after(self, key: tuple[datetime, int] | None) -> FollowingFeed:
+        return FollowingFeed(self.user, key, self.fields)
+
+    def values_list(self, *fields: str) -> FollowingFeed:
+        return FollowingFeed(self.user, self.key, fields)
+
+    def count(self) -> int:
+        return self._matching().count()
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __getitem__(self, item: slice) -> list:
+        if not isinstance(item, slice) or item.stop is None:
+            raise TypeError("Following feeds are read by bounded slices.")
+
+        ids = [post_id for _, post_id in self._keys(item.stop)[item]]
+        if self.fields:
+            rows = Post.objects.order_by().filter(id__in=ids)
+            found = {row[0]: row[1:] for row in rows.values_list("id", *self.fields)}
+        else:
+            found = Post.objects.fetch_all_posts().order_by().in_bulk(ids)
+        # Posts deleted meanwhile are skipped
+        return [found[post_id] for post_id in ids if post_id in found]
+
+    def _keys(self, limit: int) -> list[tuple[datetime, int]]:
+        timeline = list(self._timeline(limit))
+        keys = set(timeline)
+        keys.update(self._pull(self._celebrity_ids, limit))
+
+        # Posts older than a capped backfill only make it once the timeline
+        # reaches the horizon
+        horizon = self.user.timeline_complete_since
+        if horizon is not None and (len(timeline) < limit or timeline[-1][0] <= horizon):
+            keys.update(
+                self._pull(self._following_ids, limit, publication_date__lte=horizon)
+            )
+
+        return heapq.nlargest(limit, keys)
+
+    def _timeline(self, limit: int) -> QuerySet:
+        entries = self._after(
+            TimelineEntry.objects.filter(user_id=self.user.id), "post_id"
+        )
+        return entries.order_by("-publication_date", "-post_id").values_list(
+            "publication_date", "post_id"
+        )[:limit]
+
+    def _pull(self, user_ids: list[int], limit: int, **filters) -> list[tuple]:
+        keys = []
+        for start in range(0, len(user_ids), PULL_BATCH_SIZE):
+            batch = user_ids[start : start + PULL_BATCH_SIZE]
+            keys += self._pulled(batch, limit, **filters)
+        return keys
+
+    def _pulled(self, user_ids: list[int], limit: int, **filters) -> QuerySet:
+        # The latest posts of each account, a bounded range of its
+        # post_user_date_idx entries
+        latest = Q()
+        for user_id in user_ids:
+            posts = self._after(Post.objects.filter(user_id=user_id, **filters), "id")
+            latest |= Q(
+                id__in=posts.order_by("-publication_date", "-id").values("id")[:limit]
+            )
+        return (
+            Post.objects.order_by().filter(latest).values_list("publication_date", "id")
+        )
+
+    def _matching(self) -> QuerySet[Post]:
+        timeline = TimelineEntry.objects.filter(user_id=self.user.id).values("post_id")
+        followed = Q(id__in=timeline) | Q(user_id__in=self._celebrity_ids)
+        horizon = self.user.timeline_complete_since
+        if horizon is not None:
+            followed |= Q(user_id__in=self._following_ids, publication_date__lte=horizon)
+        return self._after(Post.objects.order_by().filter(followed), "id")
+
+    def _after(self, queryset: QuerySet, id_field: str) -> QuerySet:
+        if self.key is None:
+            return queryset
+        date, post_id = self.key
+        return queryset.filter(
+            Q(publication_date__lt=date)
+            | Q(publication_date=date, **{f"{id_field}__lt": post_id})
+        )
+
+    @cached_property
+    def _celebrity_ids(self) -> list[int]:
+        follow_graph = graph.current()
+        if follow_graph is not None:
+            return follow_graph.followed_celebrities(self.user.id)
+        return list(
+            self.user.following.filter(celebrity=True).values_list("id", flat=True)
+        )
+
+    @cached_property
+    def _following_ids(self) -> list[int]:
+        follow_graph = graph.current()
+        if follow_graph is not None:
+            return follow_graph.following_ids(self.user.id)
+        return list(
+            Follow.objects.filter(from_user_id=self.user.id).values_list(
+                "to_user_id", flat=True
+            )
+        )
+
+
+def rebuild_timelines():
+    """
+    Recompute celebrity flags and every timeline from the follow graph.
+    """
+    User.objects.update(celebrity=False, timeline_complete_since=None)
+    update_celebrities(User.objects.values_list("id", flat=True))
+
+    TimelineEntry.objects.all().delete()
+    for follower_id, followed_id in Follow.objects.filter(
+        to_user__celebrity=False
+    ).values_list("from_user_id", "to_user_id"):
+        backfill_follow(follower_id, followed_id)
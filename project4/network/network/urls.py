@@ -13,6 +13,7 @@ urlpatterns = [
     path("logout", views.logout_view, name="logout"),
     path("register", views.register, name="register"),
     path("api/", api.urls),
+    path("events", views.events_stream, name="events"),
     # re_path(r"^.*", views.index, name="react_root"),
     re_path(rf"{('|').join(react_routes)}", views.index, name="react_root"),
 ]
@@ -2,7 +2,9 @@ import magic
 from os import path
 from uuid import uuid4
 
+from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
 from django.utils.translation import gettext_lazy as _
 from django.utils.deconstruct import deconstructible
 from django.template.defaultfilters import filesizeformat
@@ -48,16 +50,21 @@ class FileValidator:
         "content_type": _("File of type %(content_type)s are not supported."),
     }
 
+    # libmagic only needs the first bytes of a file to detect its type
+    header_size = 2048
+
     def __init__(self, max_size=None, min_size=None, content_types=None):
         self.max_size = max_size * 1024 * 1024 if max_size is not None else None
         self.min_size = min_size * 1024 * 1024 if min_size is not None else None
         self.content_types = content_types
 
     def __call__(self, file):
-        if self.max_size is not None and file.size > self.max_size:
+        size = self.file_size(file)
+
+        if self.max_size is not None and size > self.max_size:
             params = {
                 "max_size": filesizeformat(self.max_size),
-                "size": filesizeformat(file.size),
+                "size": filesizeformat(size),
             }
             raise ValidationError(
                 message=self.error_messages["max_size"],
@@ -65,18 +72,17 @@ class FileValidator:
                 params=params,
             )
 
-        if self.min_size is not None and file.size < self.min_size:
+        if self.min_size is not None and size < self.min_size:
             params = {
                 "min_size": filesizeformat(self.min_size),
-                "size": filesizeformat(file.size),
+                "size": filesizeformat(size),
             }
             raise ValidationError(
                 message=self.error_messages["min_size"], code="min_size", params=params
             )
 
         if self.content_types is not None:
-            content_type = magic.from_buffer(file.read(), mime=True)
-            file.seek(0)
+            content_type = magic.from_buffer(self.read_header(file), mime=True)
 
             if content_type not in self.content_types:
                 params = {"content_type": content_type}
@@ -88,6 +94,34 @@ class FileValidator:
 
         return file
 
+    def file_size(self, file) -> int:
+        """
+        Use the size reported by the upload when available. Otherwise count it
+        chunk by chunk, stopping as soon as max_size is exceeded.
+        """
+        size = getattr(file, "size", None)
+        if size is not None:
+            return size
+
+        size = 0
+        for chunk in file.chunks():
+            size += len(chunk)
+            if self.max_size is not None and size > self.max_size:
+                break
+        file.seek(0)
+        return size
+
+    def read_header(self, file) -> bytes:
+        """
+        Read only the first header_size bytes of the file, instead of loading
+        the whole upload in memory. Not through chunks(), which yields in-memory
+        uploads whole whatever the chunk size.
+        """
+        file.seek(0)
+        header = file.read(self.header_size)
+        file.seek(0)
+        return header
+
     def __eq__(self, other):
         return (
             isinstance(other, FileValidator)
@@ -95,3 +129,37 @@ class FileValidator:
             and self.min_size == other.min_size
             and self.content_types == other.content_types
         )
+
+
+class MaxSizeUploadHandler(FileUploadHandler):
+    """
+    Stop receiving a file as soon as it grows past NETWORK_MAX_UPLOAD_SIZE
+    bytes, instead of spooling it to disk and rejecting it afterwards.
+
+    The file is skipped and its field name added to "request.oversized_files",
+    so views can report the error. Per field limits are still enforced by
+    FileValidator, this is the ceiling for every upload endpoint.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_size = getattr(settings, "NETWORK_MAX_UPLOAD_SIZE", None)
+        self.received = 0
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.max_size is not None and self.received > self.max_size:
+            oversized_files = getattr(self.request, "oversized_files", set())
+            oversized_files.add(self.field_name)
+            self.request.oversized_files = oversized_files
+            raise SkipFile()
+
+        return raw_data
+
+    def file_complete(self, file_size):
+        # Let the next handlers build the uploaded file
+        return None
@@ -1,8 +1,15 @@
 from django.contrib.auth import authenticate, login, logout
+from django.core.handlers.asgi import ASGIRequest
 from django.forms import ValidationError
-from django.http import HttpRequest
+from django.http import (
+    HttpRequest,
+    HttpResponse,
+    HttpResponseNotAllowed,
+    StreamingHttpResponse,
+)
 from django.shortcuts import redirect, render
 from django.views.decorators.http import require_POST, require_GET, require_http_methods
+from . import events
 from .models import User
 
 
@@ -17,6 +24,26 @@ def index(request: HttpRequest):
     return render(request, "network/index.html", context)
 
 
+async def events_stream(request: HttpRequest):
+    """
+    Server-sent events with new posts, new comments and like counts. Streams
+    wait on the event loop, so they need an ASGI server.
+    """
+    # require_GET doesn't support async views
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+
+    if not isinstance(request, ASGIRequest):
+        # A WSGI worker would be held for as long as the stream stays open
+        return HttpResponse("Event streams require an ASGI server.", status=501)
+
+    response = StreamingHttpResponse(events.stream(), content_type="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    # Don't let nginx buffer the stream
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
 @require_http_methods(["GET", "POST"])
 def login_view(request: HttpRequest):
     if request.method == "POST":
@@ -55,6 +55,8 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "network.middleware.load_user",
+    "network.middleware.replica_pinning",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     # "django_browser_reload.middleware.BrowserReloadMiddleware",
@@ -89,9 +91,15 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Keep connections across requests, see network/sqlite.py
+        "CONN_MAX_AGE": 60,
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
+# Sends the read-only feed operations to NETWORK_READ_REPLICAS
+DATABASE_ROUTERS = ["network.routers.ReplicaRouter"]
+
 AUTH_USER_MODEL = "network.User"
 
 # Password validation
@@ -148,3 +156,66 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # https://docs.djangoproject.com/en/4.0/ref/settings/#csrf-cookie-samesite
 CSRF_COOKIE_SAMESITE = "Strict"
+
+# Network app
+# Register the async variants of the read and toggle API operations (ASGI)
+NETWORK_ASYNC_API = False
+# Run background tasks inline instead of on the worker pool (network/tasks.py)
+NETWORK_TASKS_EAGER = False
+NETWORK_TASK_WORKERS = 2
+# Accounts with more followers than this don't fan out their posts
+NETWORK_CELEBRITY_FOLLOWERS = 10_000
+# Number of posts copied to a timeline when following someone. Older posts of
+# the followed account are pulled at read time (network/timeline.py).
+NETWORK_TIMELINE_BACKFILL = 200
+# Anonymous feed response cache (network/feed_cache.py), in seconds
+NETWORK_FEED_CACHE_TTL = 30
+NETWORK_FEED_CACHE_LOCK_TIMEOUT = 5
+# Serialize post pages without the Pydantic schemas (network/serializers.py).
+# The check mode also builds the schema output and raises when they differ.
+NETWORK_FAST_SERIALIZATION = True
+NETWORK_SERIALIZATION_CHECK = False
+# Pragmas run on every new SQLite connection (network/sqlite.py). The journal
+# mode is stored in the database file, so WAL is only enabled by
+# project4/settings_production.py: here it would rewrite the committed db.sqlite3.
+NETWORK_SQLITE_PRAGMAS = {
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    # Negative sizes are in KiB: 32 MiB page cache per connection
+    "cache_size": -32000,
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+# Aliases of DATABASES serving the read-only feed operations (network/routers.py),
+# see project4/settings_replicas.py. Clients that wrote read from the primary
+# for NETWORK_REPLICA_PIN_SECONDS.
+NETWORK_READ_REPLICAS = []
+NETWORK_REPLICA_PIN_SECONDS = 5
+# Answer follow checks and following lists from an in-process copy of the follow
+# table (network/graph.py). Only exact with a single server process: each process
+# sees its own follows at once, but those made by other workers only when its copy
+# is reloaded after NETWORK_FOLLOW_GRAPH_MAX_AGE seconds. Until then follow
+# buttons, counts and the celebrity posts of the following feed can be stale, so
+# keep it disabled when running several workers and that matters.
+NETWORK_FOLLOW_GRAPH = False
+NETWORK_FOLLOW_GRAPH_MAX_AGE = 300
+# "Who to follow" suggestions kept per user (network/suggestions.py), and the
+# period of the recent posts boosting their score
+NETWORK_SUGGESTIONS_LIMIT = 20
+NETWORK_SUGGESTIONS_ACTIVITY_DAYS = 7
+# Add an "X-Query-Count" header to responses (network.middleware.query_count)
+NETWORK_QUERY_COUNT_HEADER = False
+# Live feed events (network/events.py). Use "network.events.RedisBroker" and
+# set NETWORK_EVENTS_REDIS_URL when running several ASGI workers.
+NETWORK_EVENTS_BROKER = "network.events.InProcessBroker"
+NETWORK_EVENTS_KEEPALIVE = 15
+NETWORK_EVENTS_MAX_AGE = 300
+# Square profile photo variants generated after upload (network/images.py)
+NETWORK_PHOTO_VARIANT_SIZES = (48, 128, 512)
+# Uploads bigger than this are dropped while streaming (network/utility.py)
+NETWORK_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+FILE_UPLOAD_HANDLERS = [
+    "network.utility.MaxSizeUploadHandler",
+    "django.core.files.uploadhandler.MemoryFileUploadHandler",
+    "django.core.files.uploadhandler.TemporaryFileUploadHandler",
+]
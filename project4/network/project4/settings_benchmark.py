@@ -0,0 +1,30 @@
+"""
+Settings for "manage.py benchmark_api", which seeds and serves its own database
+instead of db.sqlite3:
+
+    DJANGO_SETTINGS_MODULE=project4.settings_benchmark python manage.py benchmark_api
+
+Set NETWORK_BENCHMARK_DB to use another database file.
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES, MIDDLEWARE, NETWORK_SQLITE_PRAGMAS
+
+DEBUG = False
+
+DATABASES = {
+    "default": {
+        **DATABASES["default"],
+        "NAME": os.environ.get("NETWORK_BENCHMARK_DB", BASE_DIR / "benchmark.sqlite3"),
+    }
+}
+
+# First, so session and user lookups are counted as well
+MIDDLEWARE = ["network.middleware.query_count"] + MIDDLEWARE
+
+# Like project4/settings_production.py, the benchmark database isn't committed
+NETWORK_SQLITE_PRAGMAS = {"journal_mode": "WAL", **NETWORK_SQLITE_PRAGMAS}
+
+NETWORK_BENCHMARK = True
+NETWORK_QUERY_COUNT_HEADER = True
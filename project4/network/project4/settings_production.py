@@ -0,0 +1,13 @@
+"""
+Settings for deployments, where the database file isn't the committed
+db.sqlite3:
+
+    DJANGO_SETTINGS_MODULE=project4.settings_production gunicorn project4.wsgi
+
+Switches SQLite to WAL mode (see network/sqlite.py). The mode is stored in the
+database file and leaves -wal and -shm files next to it.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import NETWORK_SQLITE_PRAGMAS
+
+NETWORK_SQLITE_PRAGMAS = {"journal_mode": "WAL", **NETWORK_SQLITE_PRAGMAS}
@@ -0,0 +1,25 @@
+"""
+Settings with two local read replicas, SQLite files refreshed from db.sqlite3
+by the replication stand-in (network/replication.py):
+
+    python manage.py replicate --interval 2 --settings project4.settings_replicas
+    python manage.py runserver --settings project4.settings_replicas
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES
+
+REPLICAS = ["replica1", "replica2"]
+
+DATABASES = {
+    **DATABASES,
+    **{
+        alias: {
+            **DATABASES["default"],
+            "NAME": BASE_DIR / f"{alias}.sqlite3",
+            "TEST": {"MIRROR": "default"},
+        }
+        for alias in REPLICAS
+    },
+}
+
+NETWORK_READ_REPLICAS = REPLICAS